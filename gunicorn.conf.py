@@ -0,0 +1,8 @@
+# Read by gunicorn from the working directory (see Procfile).
+
+
+def post_worker_init(worker):
+    # each worker, after loading the application and before taking
+    # requests; see pokedata/warmup.py
+    from pokedata.warmup import warm_up
+    warm_up()
@@ -1,31 +1,106 @@
 from django.http import HttpResponse
+from django.db import transaction
 from django.db.models import Q
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
 from rest_framework import status
 
-from .models      import Pokemon
-from .serializers import PokemonSerializer
+from .cache       import cached_response, single_version_bump
+from .encoders    import js_safe, row_encoder
+from .filters     import filter_pokemon, order_pokemon, parse_common_filters, parse_int
+from .models      import Pokemon, PokemonChange, PokemonSummary, batched_summaries, canonical_type
+from .pagination  import KeysetPagination
+from .search      import name_index
+from .serializers import PokemonSerializer, is_pk, parse_fieldset
+from .similar     import similar_index
+from . import stats, typechart
+from .streaming   import (CSVRenderer, ColumnarRenderer, NDJSONRenderer, export_response,
+                          stream_response, wants_stream)
 
+
+def _list_response(request, qs):
+    """
+    Serialize a list queryset, paginated by keyset when the client asks
+    for it with ?limit= / ?cursor=, otherwise as the full plain list.
+    ?stream=1 (or Accept: application/x-ndjson) streams the full list
+    row by row instead of building it in memory, and so cannot be
+    combined with ?limit= / ?cursor= (400).
+
+    Every list also takes the filters and ?ordering= from filters.py, and
+    ?fields= / ?exclude= to fetch and render only some columns.
+
+    Rows are read with values_list() and written by PokemonRowEncoder, so
+    no model instance or serializer field is involved per row.
+    """
+    qs = filter_pokemon(qs, request.query_params)
+    qs = order_pokemon(qs, request.query_params)
+    encoder = row_encoder(parse_fieldset(request.query_params))
+    # the ordering columns come along for the pagination cursors
+    ordering = [f.lstrip('-') for f in qs.query.order_by or Pokemon._meta.ordering]
+    qs = qs.values_list(*dict.fromkeys(encoder.fields + tuple(ordering)))
+
+    paginator = KeysetPagination()
+    if wants_stream(request):
+        paged = {paginator.limit_query_param, paginator.cursor_query_param} & set(request.query_params)
+        if paged:
+            return Response({'stream': [f'Cannot be combined with ?{param}=.' for param in sorted(paged)]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return stream_response(request, qs, encoder)
+
+    page = paginator.paginate_queryset(qs, request)
+    rows = qs if page is None else page
+    if not _plain_json(request):
+        # anything but plain JSON (browsable API, ; indent=4) goes through
+        # the regular renderers
+        data = [encoder.to_representation(row) for row in rows]
+        return Response(data) if page is None else paginator.get_paginated_response(data)
+
+    body = encoder.encode_list(rows)
+    if page is not None:
+        body = paginator.get_paginated_json(body)
+    return HttpResponse(js_safe(body).encode('utf-8'), content_type='application/json')
+
+
+def _plain_json(request):
+    """True when the response is going to JSONRenderer's default output."""
+    renderer = request.accepted_renderer
+    return (
+        type(renderer) is JSONRenderer
+        and renderer.compact and not renderer.ensure_ascii
+        and renderer.get_indent(request.accepted_media_type, {}) is None
+    )
+
+
+def _written(request, serializer):
+    """A saved serializer's output, narrowed by ?fields= / ?exclude=."""
+    fields = parse_fieldset(request.query_params)
+    if fields is None:
+        return serializer.data
+    many = isinstance(serializer, ListSerializer)
+    return PokemonSerializer(serializer.instance, many=many, fields=fields).data
+
+@cached_response
 @api_view(['GET', 'POST'])
 def pokemon_list(request):
     """
-    GET  /api/pokemon       → list all Pokémon
+    GET  /api/pokemon       → list all Pokémon (?limit=&cursor= to paginate)
     POST /api/pokemon       → create a new Pokémon
     """
     if request.method == 'POST':
         serializer = PokemonSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            return Response(_written(request, serializer), status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     # GET
     qs = Pokemon.objects.all()
-    serializer = PokemonSerializer(qs, many=True)
-    return Response(serializer.data)
+    return _list_response(request, qs)
 
 
+@cached_response
 @api_view(['GET', 'PUT', 'DELETE'])
 def pokemon_detail(request, pk):
     """
@@ -33,20 +108,24 @@ def pokemon_detail(request, pk):
     PUT    /api/pokemon/<pk>   → update it
     DELETE /api/pokemon/<pk>   → delete it
     """
+    if request.method == 'GET':
+        fields = parse_fieldset(request.query_params)
+        qs = Pokemon.objects.filter(pk=pk)
+        pokemon = (qs if fields is None else qs.values(*fields)).first()
+        if pokemon is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(PokemonSerializer(pokemon, fields=fields).data)
+
     try:
         pokemon = Pokemon.objects.get(pk=pk)
     except Pokemon.DoesNotExist:
         return Response(status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == 'GET':
-        serializer = PokemonSerializer(pokemon)
-        return Response(serializer.data)
-
     if request.method == 'PUT':
         serializer = PokemonSerializer(pokemon, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response(serializer.data)
+            return Response(_written(request, serializer))
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     # DELETE
@@ -54,26 +133,27 @@ def pokemon_detail(request, pk):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@cached_response
 @api_view(['GET'])
 def pokemon_by_generation(request, gen):
     """
     GET /api/pokemon/gen/<gen> → list all Pokémon in generation <gen>
     """
     qs = Pokemon.objects.filter(generation=gen)
-    serializer = PokemonSerializer(qs, many=True)
-    return Response(serializer.data)
+    return _list_response(request, qs)
 
 
+@cached_response
 @api_view(['GET'])
 def pokemon_legendary(request):
     """
     GET /api/pokemon/legendary → list all legendary Pokémon
     """
     qs = Pokemon.objects.filter(legendary=True)
-    serializer = PokemonSerializer(qs, many=True)
-    return Response(serializer.data)
+    return _list_response(request, qs)
 
 
+@cached_response
 @api_view(['GET'])
 def pokemon_by_type(request, type1, type2=None):
     """
@@ -86,20 +166,24 @@ def pokemon_by_type(request, type1, type2=None):
          OR
         (primary == type2 AND secondary == type1)
     """
+    # types are stored in canonical case, so plain equality can use the indexes
+    type1 = canonical_type(type1)
+    type2 = canonical_type(type2)
+
     # start with an empty QuerySet
     qs = Pokemon.objects.none()
 
     if type2:
         # Case A: primary matches type1 AND secondary matches type2
         qs_a = Pokemon.objects.filter(
-            pokemon_type1__iexact=type1,
-            pokemon_type2__iexact=type2
+            pokemon_type1=type1,
+            pokemon_type2=type2
         )
 
         # Case B: primary matches type2 AND secondary matches type1
         qs_b = Pokemon.objects.filter(
-            pokemon_type1__iexact=type2,
-            pokemon_type2__iexact=type1
+            pokemon_type1=type2,
+            pokemon_type2=type1
         )
 
         # combine both cases
@@ -108,12 +192,114 @@ def pokemon_by_type(request, type1, type2=None):
     else:
         # only one type → match either slot
         qs = Pokemon.objects.filter(
-            Q(pokemon_type1__iexact=type1) |
-            Q(pokemon_type2__iexact=type1)
+            Q(pokemon_type1=type1) |
+            Q(pokemon_type2=type1)
         )
 
-    serializer = PokemonSerializer(qs.distinct(), many=True)
-    return Response(serializer.data)
+    return _list_response(request, qs.distinct())
+
+@api_view(['GET'])
+def pokemon_search(request):
+    """
+    GET /api/pokemon/search/?q=pika&limit=10 → name autocomplete
+
+    Prefix matches first, then substring matches, then typo-tolerant
+    (trigram) matches, answered from the in-memory NameIndex.
+    """
+    try:
+        limit = max(1, min(int(request.query_params.get('limit', 10)), 50))
+    except ValueError:
+        return Response({'limit': ['Must be an integer.']}, status=status.HTTP_400_BAD_REQUEST)
+    results = name_index.current().search(request.query_params.get('q', ''), limit)
+    return Response([
+        {'id': pk, 'pokemon_name': name, 'match': match}
+        for pk, name, match in results
+    ])
+
+
+@cached_response
+@api_view(['GET'])
+def pokemon_similar(request, pk):
+    """
+    GET /api/pokemon/<pk>/similar/?k=10 → the k Pokémon whose six base
+    stats are closest (Euclidean) to this one's, nearest first
+
+    Takes the usual ?generation= / ?type= / ?legendary= constraints, and
+    ?fields= / ?exclude=.
+    """
+    try:
+        k = max(1, min(int(request.query_params.get('k', 10)), 100))
+    except ValueError:
+        return Response({'k': ['Must be an integer.']}, status=status.HTTP_400_BAD_REQUEST)
+    filters = parse_common_filters(request.query_params)
+    fields = parse_fieldset(request.query_params)
+    nearest = similar_index.current().similar(pk, k, **filters)
+    if nearest is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    columns = dict.fromkeys(['id', *(fields or PokemonSerializer.Meta.fields)])
+    rows = {
+        row['id']: row
+        for row in Pokemon.objects.filter(pk__in=[other for other, _ in nearest]).values(*columns)
+    }
+    serializer = PokemonSerializer(fields=fields)
+    return Response([
+        {**serializer.to_representation(rows[other]), 'distance': round(distance, 4)}
+        for other, distance in nearest
+        if other in rows
+    ])
+
+
+# upper bound on items per bulk request
+BULK_MAX_ITEMS = 10000
+
+
+@api_view(['POST', 'PUT', 'DELETE'])
+def pokemon_bulk(request):
+    """
+    POST   /api/pokemon/bulk   → create every Pokémon in a JSON array
+    PUT    /api/pokemon/bulk   → update every Pokémon in a JSON array (each with "id")
+    DELETE /api/pokemon/bulk   → delete a JSON array of ids
+
+    All items are validated first; if any fails nothing is written and the
+    response is a 400 with a list of errors aligned with the input ({} for
+    valid items). Otherwise everything is applied in one transaction.
+    """
+    items = request.data
+    if not isinstance(items, list):
+        return Response({'non_field_errors': ['Expected a list of items.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > BULK_MAX_ITEMS:
+        return Response({'non_field_errors': [f'At most {BULK_MAX_ITEMS} items per request.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if request.method == 'DELETE':
+        existing = set(Pokemon.objects.filter(
+            pk__in=[pk for pk in items if is_pk(pk)]
+        ).values_list('pk', flat=True))
+        errors = [{} if is_pk(pk) and pk in existing else {'id': ['No Pokémon with this id.']}
+                  for pk in items]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            Pokemon.objects.filter(pk__in=existing).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    if request.method == 'PUT':
+        ids = [item.get('id') for item in items if isinstance(item, dict)]
+        instances = Pokemon.objects.in_bulk([pk for pk in ids if is_pk(pk)])
+        serializer = PokemonSerializer(instances, data=items, many=True)
+        success = status.HTTP_200_OK
+    else:
+        serializer = PokemonSerializer(data=items, many=True)
+        success = status.HTTP_201_CREATED
+
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    with transaction.atomic(), single_version_bump(), batched_summaries():
+        serializer.save()
+    return Response(_written(request, serializer), status=success)
+
 
 @api_view(['POST'])
 def create_pokemon(request):
@@ -123,8 +309,286 @@ def create_pokemon(request):
     serializer = PokemonSerializer(data=request.data)
     if serializer.is_valid():
         serializer.save()
-        return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(_written(request, serializer), status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@renderer_classes([CSVRenderer, NDJSONRenderer, ColumnarRenderer])
+def pokemon_export(request):
+    """
+    GET /api/pokemon/export?format=csv|ndjson|columnar → the whole table as a download
+
+    Takes the list filters, ?ordering= (by id otherwise) and ?fields= /
+    ?exclude=. Streamed in constant memory and gzipped on the fly when
+    Accept-Encoding allows (see streaming.export_response); `columnar`
+    is described at ColumnarRenderer.
+    """
+    fields = parse_fieldset(request.query_params) or tuple(PokemonSerializer.Meta.fields)
+    qs = filter_pokemon(Pokemon.objects.order_by('pk'), request.query_params)
+    qs = order_pokemon(qs, request.query_params)
+    return export_response(request, qs.values_list(*fields), fields)
+
+
+# upper bound on log entries per change feed page
+CHANGES_MAX_LIMIT = 10000
+
+
+@cached_response
+@api_view(['GET'])
+def pokemon_changes(request):
+    """
+    GET /api/pokemon/changes?since=<seq>&limit=1000 → what changed since `seq`
+
+    {"since": 12, "next": 15, "horizon": 0, "more": false,
+     "upserts": [{...current row...}], "deleted": [4]}
+
+    Each Pokémon appears once, as its current row or as a tombstone id,
+    however many times it changed. Ask again with ?since=<next> while
+    "more" is true, and later to poll. ?since=0 (the default) is a full
+    copy. A 410 means compaction dropped deletions the client has not
+    seen: start over from ?since=0.
 
+    A full copy's pages may end below the compaction horizon: pass
+    ?horizon=<horizon> with their `next`, which is accepted as long as
+    no compaction has moved the horizon since.
+    """
+    params = {'since': 0, 'limit': 1000, 'horizon': 0}
+    for name in params:
+        if name in request.query_params:
+            params[name] = parse_int(request.query_params, name)
+    since = max(0, params['since'])
+    limit = max(1, min(params['limit'], CHANGES_MAX_LIMIT))
+    horizon = PokemonChange.objects.horizon()
+    # a cursor below the horizon is only good within the full copy it
+    # came from, under the same horizon
+    if 0 < since < horizon and params['horizon'] != horizon:
+        return Response({'detail': 'Changes since this point were compacted away; resync from since=0.'},
+                        status=status.HTTP_410_GONE)
+
+    changes = PokemonChange.objects.filter(seq__gt=since).order_by('seq')
+    entries = list(changes.values_list('seq', 'pokemon_id', 'deleted')[:limit + 1])
+    more = len(entries) > limit
+    entries = entries[:limit]
+    last = entries[-1][0] if entries else since
+    # the last entry per Pokémon wins
+    latest = {pokemon_id: deleted for _, pokemon_id, deleted in entries}
+    encoder = row_encoder()
+    rows = list(Pokemon.objects.filter(pk__in=[pk for pk, deleted in latest.items() if not deleted])
+                .order_by('pk').values_list(*encoder.fields))
+    found = {row[0] for row in rows}
+    return Response({
+        'since':   since,
+        # nothing is left below the horizon once the log is read through
+        'next':    last if more else max(last, horizon),
+        'horizon': horizon,
+        'more':    more,
+        'upserts': [encoder.to_representation(row) for row in rows],
+        # rows deleted after their upsert was logged have a tombstone
+        # further on; reporting them now is the same
+        'deleted': sorted(pk for pk, deleted in latest.items() if deleted or pk not in found),
+    })
+
+
+# ---------------------------------------------------------------------------
+# Analytics, answered from the in-memory NumPy snapshot (see stats.py).
+# All of them accept the ?generation=&type=&legendary= filters.
+# ---------------------------------------------------------------------------
+
+@cached_response
+@api_view(['GET'])
+def stats_percentiles(request):
+    """
+    GET /api/pokemon/stats/percentiles/?stat=attack&q=25,50,75
+    """
+    stat = stats.parse_stat(request.query_params)
+    try:
+        qs = [float(q) for q in request.query_params.get('q', '5,25,50,75,95').split(',')]
+    except ValueError:
+        return Response({'q': ['Must be a comma separated list of numbers.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if not all(0 <= q <= 100 for q in qs):
+        return Response({'q': ['Percentiles must be between 0 and 100.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    snapshot = stats.get_snapshot()
+    keep = snapshot.mask(**parse_common_filters(request.query_params))
+    return Response({
+        'stat': stat,
+        'count': int(keep.sum()),
+        'percentiles': stats.percentiles(snapshot, stat, qs, keep),
+    })
+
+
+@cached_response
+@api_view(['GET'])
+def stats_summary(request):
+    """
+    GET /api/pokemon/stats/summary/?group_by=generation|type1|type|legendary
+
+    count, mean and standard deviation of every stat per group.
+    """
+    group_by = request.query_params.get('group_by', 'generation')
+    if group_by not in stats.GROUPS:
+        return Response({'group_by': [f'Must be one of {", ".join(stats.GROUPS)}.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+    snapshot = stats.get_snapshot()
+    keep = snapshot.mask(**parse_common_filters(request.query_params))
+    return Response(stats.summary(snapshot, group_by, keep))
+
+
+@cached_response
+@api_view(['GET'])
+def pokemon_aggregates(request):
+    """
+    GET /api/pokemon/aggregates/?by=generation|type
+
+    count, legendary count, average and maximum of every stat per
+    generation or per type, read from the PokemonSummary rows.
+    """
+    by = request.query_params.get('by', 'generation')
+    if by not in ('generation', 'type'):
+        return Response({'by': ['Must be one of generation, type.']},
+                        status=status.HTTP_400_BAD_REQUEST)
+    summaries = PokemonSummary.objects.filter(group=by, count__gt=0).order_by('key')
+    return Response([summary.as_dict() for summary in summaries])
+
+
+@cached_response
+@api_view(['GET'])
+def stats_zscores(request, pk):
+    """
+    GET /api/pokemon/<pk>/zscores/ → how many standard deviations each of
+    this Pokémon's stats is from the mean of the (filtered) population
+    """
+    snapshot = stats.get_snapshot()
+    row = snapshot.row_of(pk)
+    if row is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    keep = snapshot.mask(**parse_common_filters(request.query_params))
+    return Response({
+        'id': pk,
+        'pokemon_name': snapshot.names[row],
+        'population': int(keep.sum()),
+        'zscores': stats.zscores(snapshot, row, keep),
+    })
+
+
+@cached_response
+@api_view(['GET'])
+def stats_top(request):
+    """
+    GET /api/pokemon/stats/top/?stat=speed&n=10
+    GET /api/pokemon/stats/top/?weights=attack:1,special_attack:1,speed:0.5&n=10
+    """
+    try:
+        n = max(1, min(int(request.query_params.get('n', 10)), 1000))
+    except ValueError:
+        return Response({'n': ['Must be an integer.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    snapshot = stats.get_snapshot()
+    weights = stats.parse_weights(request.query_params)
+    if weights is None:
+        stat = stats.parse_stat(request.query_params, default='total_stats')
+        score = snapshot.column(stat)
+    else:
+        score = snapshot.stats @ weights
+    keep = snapshot.mask(**parse_common_filters(request.query_params))
+
+    return Response([
+        {'id': int(snapshot.ids[row]), 'pokemon_name': snapshot.names[row], 'score': value}
+        for row, value in stats.top(snapshot, score, n, keep)
+    ])
+
+
+@cached_response
+@api_view(['GET'])
+def type_chart(request):
+    """
+    GET /api/pokemon/types/chart/ → the 18x18 effectiveness matrix,
+    matrix[attacking][defending] in `types` order
+    """
+    return Response({'types': typechart.TYPES, 'matrix': typechart.CHART.tolist()})
+
+
+def _matchup_response(request, snapshot, opponents, exclude=None):
+    """The n best-scoring rows against `opponents` (see typechart.matchups)."""
+    try:
+        n = max(1, min(int(request.query_params.get('n', 10)), 1000))
+    except ValueError:
+        return Response({'n': ['Must be an integer.']}, status=status.HTTP_400_BAD_REQUEST)
+    keep = snapshot.mask(**parse_common_filters(request.query_params))
+    if exclude is not None:
+        keep[exclude] = False
+
+    offense, defense, score = typechart.matchups(snapshot, opponents)
+    # ties go to the stronger Pokémon: total_stats / 1e5 stays below the
+    # smallest gap between two distinct scores against one opponent
+    rank = score + snapshot.column('total_stats') / 100_000
+    return Response([
+        {
+            'id':            int(snapshot.ids[row]),
+            'pokemon_name':  snapshot.names[row],
+            'pokemon_type1': typechart.TYPES[snapshot.type1[row]],
+            'pokemon_type2': typechart.TYPES[snapshot.type2[row]] if snapshot.type2[row] >= 0 else None,
+            'offense':       float(offense[row]),
+            'defense':       float(defense[row]),
+            'score':         round(float(score[row]), 4),
+        }
+        for row, _ in stats.top(snapshot, rank, n, keep)
+    ])
+
+
+@cached_response
+@api_view(['GET'])
+def pokemon_matchups(request):
+    """
+    GET /api/pokemon/matchups/?attacker=fire,flying&n=10
+    GET /api/pokemon/matchups/?defenders=6,149,150&n=10
+
+    Scores every Pokémon against an attacking type combination or a list
+    of opposing Pokémon: `offense` is the best multiplier its types deal,
+    `defense` the worst it takes (averaged over the opponents), `score`
+    their ratio. Takes the usual ?generation= / ?type= / ?legendary=.
+    """
+    snapshot = stats.get_snapshot()
+    params = request.query_params
+    if params.get('attacker'):
+        codes = []
+        for value in params['attacker'].split(',')[:2]:
+            t = canonical_type(value)
+            if t not in typechart.TYPES:
+                return Response({'attacker': [f'Unknown type "{value}".']},
+                                status=status.HTTP_400_BAD_REQUEST)
+            codes.append(typechart.type_code(t))
+        opponents = [(codes[0], codes[1] if len(codes) > 1 else -1)]
+    elif params.get('defenders'):
+        try:
+            rows = [snapshot.row_of(int(pk)) for pk in params['defenders'].split(',')]
+        except ValueError:
+            return Response({'defenders': ['Must be a list of ids.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if None in rows:
+            return Response({'defenders': ['Unknown Pokémon id.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        opponents = [(snapshot.type1[row], snapshot.type2[row]) for row in rows]
+    else:
+        return Response({'detail': 'Give ?attacker=<types> or ?defenders=<ids>.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    return _matchup_response(request, snapshot, opponents)
+
+
+@cached_response
+@api_view(['GET'])
+def pokemon_counters(request, pk):
+    """
+    GET /api/pokemon/<pk>/counters/?n=10 → the best counters to this
+    Pokémon across the whole table (matchups against it alone)
+    """
+    snapshot = stats.get_snapshot()
+    row = snapshot.row_of(pk)
+    if row is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+    return _matchup_response(
+        request, snapshot, [(snapshot.type1[row], snapshot.type2[row])], exclude=row,
+    )
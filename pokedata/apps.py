@@ -2,3 +2,6 @@ from django.apps import AppConfig
 
 class PokedataConfig(AppConfig):
     name = "pokedata"
+
+    def ready(self):
+        from . import checks  # noqa: F401 (registers the system checks)
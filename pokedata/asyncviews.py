@@ -0,0 +1,136 @@
+"""
+Async variants of the read endpoints in api.py, routed instead of them
+when the project runs under ASGI (settings.POKEDATA_ASYNC_VIEWS, set by
+pokeweb/asgi.py).
+
+Under ASGI, Django 3.2 runs a sync view in the one thread it keeps for
+thread-sensitive code, so every request waits on the database in turn.
+These views run the GET work (cache lookup, queries, serialization,
+rendering) in a bounded pool of POKEDATA_ASYNC_DB_THREADS threads
+instead, while the event loop keeps accepting and feeding connections.
+Writes go to the sync view as before. Streamed responses are sent by
+ASGIHandler, which pulls their chunks in a thread rather than on the
+event loop.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers import asgi
+from django.db import close_old_connections, connections
+
+from . import api
+from .middleware import instrument_connections
+
+READ_METHODS = ('GET', 'HEAD')
+
+_pool = None
+
+
+def db_pool():
+    """The executor read views run their database work in."""
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'POKEDATA_ASYNC_DB_THREADS', 16),
+            thread_name_prefix='pokedata-db',
+        )
+    return _pool
+
+
+async def run_in_pool(fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs) run in db_pool(), with the caller's context
+    variables (e.g. the request's query stats).
+    """
+    context = contextvars.copy_context()
+    job = functools.partial(context.run, _job, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(db_pool(), job)
+
+
+def _job(fn, *args, **kwargs):
+    instrument_connections()
+    try:
+        response = fn(*args, **kwargs)
+        # render here rather than on the event loop, which Django would
+        # otherwise render in (a stream is iterated by ASGIHandler)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+    finally:
+        # the pool's threads live on: honour CONN_MAX_AGE like a request would
+        close_old_connections()
+
+
+class ASGIHandler(asgi.ASGIHandler):
+    """
+    Django's ASGI handler, sending a streamed response chunk by chunk as
+    a thread of its own pulls them from the iterator. Django 3.2 iterates
+    a stream synchronously on the event loop, where the database cannot
+    be used. The thread is the stream's alone (rather than one of
+    db_pool()'s), as a chunked queryset iterator must keep to the
+    connection it started on.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        stream = iter(response)
+        response.streaming_content = ()
+        loop = asyncio.get_running_loop()
+        thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pokedata-stream')
+
+        async def send_stream_first(message):
+            # super() sends the headers, then the empty stream's closing
+            # message: send the real stream in between
+            if message['type'] == 'http.response.body' and not message.get('more_body'):
+                await loop.run_in_executor(thread, instrument_connections)
+                while True:
+                    part = await loop.run_in_executor(thread, next, stream, None)
+                    if part is None:
+                        break
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send(message)
+
+        try:
+            await super().send_response(response, send_stream_first)
+        finally:
+            # the thread ends with the stream: so do its connections
+            await loop.run_in_executor(thread, connections.close_all)
+            thread.shutdown(wait=False)
+
+
+def read_endpoint(view):
+    """An async view running `view`'s GETs in db_pool()."""
+    write = sync_to_async(view)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await run_in_pool(view, request, *args, **kwargs)
+        return await write(request, *args, **kwargs)
+
+    return wrapper
+
+
+pokemon_list          = read_endpoint(api.pokemon_list)
+pokemon_detail        = read_endpoint(api.pokemon_detail)
+pokemon_by_generation = read_endpoint(api.pokemon_by_generation)
+pokemon_legendary     = read_endpoint(api.pokemon_legendary)
+pokemon_by_type       = read_endpoint(api.pokemon_by_type)
+pokemon_changes       = read_endpoint(api.pokemon_changes)
+pokemon_export        = read_endpoint(api.pokemon_export)
+pokemon_search        = read_endpoint(api.pokemon_search)
+pokemon_similar       = read_endpoint(api.pokemon_similar)
+pokemon_counters      = read_endpoint(api.pokemon_counters)
+pokemon_matchups      = read_endpoint(api.pokemon_matchups)
+pokemon_aggregates    = read_endpoint(api.pokemon_aggregates)
+type_chart            = read_endpoint(api.type_chart)
+stats_percentiles     = read_endpoint(api.stats_percentiles)
+stats_summary         = read_endpoint(api.stats_summary)
+stats_zscores         = read_endpoint(api.stats_zscores)
+stats_top             = read_endpoint(api.stats_top)
@@ -0,0 +1,456 @@
+import contextlib
+import functools
+import gzip
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+VERSION_KEY = 'pokedata:dataset-version'
+
+
+def get_cache():
+    """The Django cache backing pokedata (settings.POKEDATA_CACHE_ALIAS)."""
+    return caches[getattr(settings, 'POKEDATA_CACHE_ALIAS', 'default')]
+
+
+def cache_timeout():
+    """Seconds a versioned entry may live (settings.POKEDATA_CACHE_TIMEOUT)."""
+    return getattr(settings, 'POKEDATA_CACHE_TIMEOUT', 3600)
+
+
+# ---------------------------------------------------------------------------
+# Dataset version
+#
+# Every write to the Pokemon table bumps a single counter. Cached data is
+# keyed by that counter, so a write invalidates everything at once without
+# having to know which keys exist.
+# ---------------------------------------------------------------------------
+
+def dataset_version():
+    _drop_rolled_back()
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # start from the clock, so a lost key can never reuse an old version
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def dataset_modified(version):
+    """
+    Unix time the dataset reached `version`, for Last-Modified; first
+    recorded by whichever process bumps to (or first sees) that version.
+    """
+    cache = get_cache()
+    key = f'{VERSION_KEY}:modified:{version}'
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, int(time.time()), cache_timeout())
+        modified = cache.get(key, int(time.time()))
+    return modified
+
+
+def versioned_key(prefix, *parts):
+    """A cache key that goes stale with the next write to the Pokemon table."""
+    digest = hashlib.md5(repr(parts).encode('utf-8')).hexdigest()
+    return f'pokedata:{prefix}:{dataset_version()}:{digest}'
+
+
+def _bump():
+    """Increment the version; return (before, after), before None if unknown."""
+    cache = get_cache()
+    try:
+        after = cache.incr(VERSION_KEY)
+        before = after - 1
+    except ValueError:
+        after = int(time.time() * 1000)
+        cache.set(VERSION_KEY, after, timeout=None)
+        before = None
+    # a second later than the version before at least, so that an
+    # If-Modified-Since from just before a write never matches after it
+    modified = int(time.time())
+    if before is not None:
+        modified = max(modified, cache.get(f'{VERSION_KEY}:modified:{before}', 0) + 1)
+    cache.set(f'{VERSION_KEY}:modified:{after}', modified, cache_timeout())
+    return before, after
+
+
+class _CommitBump:
+    """
+    The second bump of a write, run by transaction.on_commit: it hands
+    the replicas the rows the write changed, now that they have landed.
+    Queued in _uncommitted until then (see _drop_rolled_back).
+    """
+
+    def __init__(self, saved, deleted, known):
+        self.connection = transaction.get_connection()
+        self.saved, self.deleted, self.known = saved, deleted, known
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        with _uncommitted_lock:
+            if self in _uncommitted:
+                _uncommitted.remove(self)
+        before, after = _bump()
+        _notify(before, after, self.saved, self.deleted, self.known)
+
+    def rolled_back(self):
+        # Django forgets the callbacks of a transaction or savepoint it
+        # rolls back
+        return not self.done and not any(func is self for _, func in self.connection.run_on_commit)
+
+
+_uncommitted = []
+_uncommitted_lock = threading.Lock()
+_local = threading.local()
+
+
+def bump_dataset_version(saved=(), deleted=(), known=True):
+    """
+    Invalidate everything derived from the Pokemon table. Called from
+    Pokemon.save()/delete() (with the row that changed) and the bulk
+    queryset writes (with known=False when the rows are not at hand).
+
+    Bumps right away so the writer sees its own change, and again once the
+    transaction commits so nothing cached from the old data in between
+    survives. The replicas are only patched with the rows on commit; a
+    write rolled back drops them instead.
+    """
+    if getattr(_local, 'depth', 0):
+        _local.saved.extend(saved)
+        _local.deleted.extend(deleted)
+        _local.known = _local.known and known
+        _local.pending = True
+        return
+    before, after = _bump()
+    # nothing changed yet as far as other connections can tell
+    _notify(before, after, (), (), True)
+    commit = _CommitBump(list(saved), list(deleted), known)
+    if transaction.get_connection().in_atomic_block:
+        with _uncommitted_lock:
+            _uncommitted.append(commit)
+    transaction.on_commit(commit)
+
+
+@contextlib.contextmanager
+def single_version_bump():
+    """
+    Collapse the bumps of every write inside the block into one at the end,
+    e.g. for a bulk request saving thousands of rows.
+    """
+    depth = getattr(_local, 'depth', 0)
+    if depth == 0:
+        _local.pending, _local.saved, _local.deleted, _local.known = False, [], [], True
+    _local.depth = depth + 1
+    try:
+        yield
+    except BaseException:
+        if depth == 0:
+            # the enclosing transaction is most likely rolling back
+            _reset_replicas()
+            _local.saved, _local.deleted, _local.known = [], [], False
+        raise
+    finally:
+        _local.depth = depth
+        if depth == 0 and _local.pending:
+            _local.pending = False
+            saved, deleted, known = _local.saved, _local.deleted, _local.known
+            _local.saved, _local.deleted = [], []
+            bump_dataset_version(saved, deleted, known)
+
+
+# ---------------------------------------------------------------------------
+# In-process replicas
+#
+# Structures such as the search index are too big to rebuild on every
+# write, so they are patched with the rows each write reports once it has
+# committed. A replica only patches when it is exactly one version behind;
+# a write it did not see (another process, a bulk update) leaves it stale,
+# and it reloads from the database on next use.
+# ---------------------------------------------------------------------------
+
+_replicas = []
+
+
+def _notify(before, after, saved, deleted, known):
+    for replica in _replicas:
+        replica.notify(before, after, saved, deleted, known)
+
+
+def _reset_replicas():
+    for replica in _replicas:
+        with replica.lock:
+            replica.version = None
+
+
+def _drop_rolled_back():
+    """
+    Once a write is rolled back, drop the replicas and bump the version:
+    the writing thread may have loaded a replica, or cached a response,
+    with its uncommitted rows in between.
+    """
+    if not _uncommitted:
+        return
+    with _uncommitted_lock:
+        lost = [commit for commit in _uncommitted if commit.rolled_back()]
+        for commit in lost:
+            _uncommitted.remove(commit)
+    if lost:
+        _reset_replicas()
+        _bump()
+
+
+class DatasetReplica:
+    """
+    Base class for an in-process structure derived from the Pokemon table.
+    Subclasses implement load() and apply(saved, deleted); callers go
+    through current(), which reloads when the replica is stale.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.lock = threading.RLock()
+        _replicas.append(self)
+
+    def load(self):
+        raise NotImplementedError
+
+    def apply(self, saved, deleted):
+        raise NotImplementedError
+
+    def current(self):
+        version = dataset_version()
+        if self.version != version:
+            with self.lock:
+                if self.version != version:
+                    self.load()
+                    self.version = version
+        return self
+
+    def notify(self, before, after, saved, deleted, known):
+        with self.lock:
+            if self.version is None:
+                return
+            if known and before is not None and self.version == before:
+                if saved or deleted:
+                    self.apply(saved, deleted)
+                self.version = after
+            else:
+                self.version = None
+
+
+# ---------------------------------------------------------------------------
+# Response cache
+# ---------------------------------------------------------------------------
+
+# response headers replayed on a cache hit
+CACHED_HEADERS = ('Content-Type', 'Vary', 'Allow')
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def cache_stats():
+    """Hit/miss counters for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _count(kind):
+    with _stats_lock:
+        _stats[kind] += 1
+
+
+def _response_key(request, kwargs):
+    match = request.resolver_match
+    name = match.url_name if match else request.path
+    params = sorted(
+        (k, v) for k in request.GET for v in request.GET.getlist(k)
+    )
+    # pages link to each other with absolute URLs
+    return versioned_key(
+        'response', name, sorted(kwargs.items()), params, request.META.get('HTTP_ACCEPT', ''),
+        request.scheme, request.get_host(),
+    )
+
+
+# backends whose entries (the dataset version among them) belong to one
+# process: each worker would hand out validators of its own
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def http_validators():
+    """
+    Whether cached API responses carry an ETag and a Last-Modified and
+    answer conditional requests (settings.POKEDATA_HTTP_VALIDATORS). By
+    default, only when the pokedata cache is shared between processes.
+    """
+    enabled = getattr(settings, 'POKEDATA_HTTP_VALIDATORS', None)
+    if enabled is None:
+        alias = getattr(settings, 'POKEDATA_CACHE_ALIAS', 'default')
+        enabled = settings.CACHES[alias]['BACKEND'] not in PROCESS_LOCAL_CACHES
+    return enabled
+
+
+def http_max_age():
+    """
+    Seconds a client or front cache may reuse an API response without
+    revalidating it (settings.POKEDATA_HTTP_MAX_AGE); 0: always revalidate.
+    """
+    return getattr(settings, 'POKEDATA_HTTP_MAX_AGE', 0)
+
+
+# Compressed bodies are made once per dataset version and cached next to
+# the plain one, so favour size over speed; preferred first.
+COMPRESSORS = {'gzip': lambda content: gzip.compress(content, compresslevel=6, mtime=0)}
+if brotli is not None:
+    COMPRESSORS = {'br': lambda content: brotli.compress(content, quality=5), **COMPRESSORS}
+# bodies shorter than this are sent as they are (as GZipMiddleware does)
+MIN_COMPRESS_LENGTH = 200
+
+
+def accepted_coding(request, codings=None):
+    """
+    The first of `codings` (by default COMPRESSORS) the request's
+    Accept-Encoding allows, or None.
+    """
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = part.partition(';')
+        name, _, q = params.strip().partition('=')
+        try:
+            accepted[coding.strip().lower()] = float(q) if name == 'q' else 1.0
+        except ValueError:
+            accepted[coding.strip().lower()] = 0.0
+    for coding in COMPRESSORS if codings is None else codings:
+        if accepted.get(coding, accepted.get('*', 0.0)) > 0:
+            return coding
+    return None
+
+
+def _etag(key, coding):
+    # strong: one per cache entry, i.e. per dataset version and request
+    # variant, and per encoding, as the bytes differ
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return f'"{digest}-{coding}"' if coding else f'"{digest}"'
+
+
+def _not_modified(request, key, modified):
+    """Whether the client's copy (If-None-Match / If-Modified-Since) is current."""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        # weak comparison, as RFC 7232 has it for If-None-Match; `*`
+        # would need to know the resource exists, so it never matches
+        current = {_etag(key, coding) for coding in (None, *COMPRESSORS)}
+        return any((tag[2:] if tag.startswith('W/') else tag) in current
+                   for tag in parse_etags(if_none_match))
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and modified <= since
+
+
+def _validators(response, key, coding, modified):
+    if http_validators():
+        response['ETag'] = _etag(key, coding)
+        response['Last-Modified'] = http_date(modified)
+    max_age = http_max_age()
+    response['Cache-Control'] = f'public, max-age={max_age}' if max_age else 'public, no-cache'
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
+
+
+def _encoded(cache, key, coding):
+    """
+    The cached (content, headers) of `key` in `coding`, compressed from
+    the plain entry the first time; None when there is no plain entry.
+    """
+    encoded = cache.get(f'{key}:{coding}')
+    if encoded is None:
+        plain = cache.get(key)
+        if plain is None:
+            return None
+        encoded = _compress(cache, key, coding, *plain)
+    return encoded
+
+
+def _compress(cache, key, coding, content, headers):
+    if len(content) >= MIN_COMPRESS_LENGTH:
+        compressed = COMPRESSORS[coding](content)
+        if len(compressed) < len(content):
+            content, headers = compressed, {**headers, 'Content-Encoding': coding}
+    cache.set(f'{key}:{coding}', (content, headers), cache_timeout())
+    return content, headers
+
+
+def cached_response(view):
+    """
+    Cache the rendered body of successful GET responses until the next
+    write to the Pokemon table. Keyed by URL name, URL kwargs, query string,
+    Accept header, scheme and host. Streamed and browsable-API responses are not cached.
+
+    Cached responses carry a strong ETag and a Last-Modified for their
+    dataset version (see http_validators()); while one is cached, a request whose If-None-Match
+    or If-Modified-Since still holds gets a 304 without running the view
+    (anything else, e.g. a 404, is never cached and never a 304). Bodies
+    are sent brotli- or gzip-compressed as Accept-Encoding allows,
+    compressed once per version and cached.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+
+        cache = get_cache()
+        key = _response_key(request, kwargs)
+        coding = accepted_coding(request)
+        modified = dataset_modified(dataset_version())
+        plain = cache.get(key)
+        # the validators stand for a cached 200: without one, run the view
+        if plain is not None and http_validators() and _not_modified(request, key, modified):
+            _count('hits')
+            return _validators(HttpResponseNotModified(), key, coding, modified)
+
+        hit = _encoded(cache, key, coding) if coding and plain is not None else plain
+        if hit is not None:
+            _count('hits')
+            content, headers = hit
+            response = HttpResponse(content)
+            for header, value in headers.items():
+                response[header] = value
+            response['X-Cache'] = 'HIT'
+            return _validators(response, key, coding, modified)
+
+        _count('misses')
+        response = view(request, *args, **kwargs)
+        renderer = getattr(response, 'accepted_renderer', None)
+        if (response.status_code == 200 and not response.streaming
+                and getattr(renderer, 'format', None) != 'api'):
+            if hasattr(response, 'render'):
+                response.render()
+            headers = {h: response[h] for h in CACHED_HEADERS if response.has_header(h)}
+            cache.set(key, (response.content, headers), cache_timeout())
+            if coding:
+                response.content, headers = _compress(cache, key, coding, response.content, headers)
+                if 'Content-Encoding' in headers:
+                    response['Content-Encoding'] = coding
+            _validators(response, key, coding, modified)
+        response['X-Cache'] = 'MISS'
+        return response
+
+    return wrapper
@@ -0,0 +1,25 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The dataset version lives in the pokedata cache: with several worker
+    processes (gunicorn reads WEB_CONCURRENCY), a process-local cache
+    would keep each one from ever seeing the others' writes.
+    """
+    from .cache import PROCESS_LOCAL_CACHES
+
+    workers = os.environ.get('WEB_CONCURRENCY', '1')
+    alias = getattr(settings, 'POKEDATA_CACHE_ALIAS', 'default')
+    backend = settings.CACHES[alias]['BACKEND']
+    if workers.isdigit() and int(workers) > 1 and backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"The '{alias}' cache ({backend}) is local to each of the {workers} worker processes.",
+            hint="Set POKEDATA_DB_MODE=production, or point POKEDATA_CACHE_ALIAS at a shared cache.",
+            id='pokedata.E001',
+        )]
+    return []
@@ -0,0 +1,92 @@
+import functools
+import json
+from json.encoder import encode_basestring
+
+from rest_framework import serializers
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import PokemonSerializer
+
+
+def dumps(data):
+    # match DRF's JSONRenderer output (compact, unicode left as-is)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def js_safe(text):
+    """JSON text with U+2028/U+2029 escaped, as JSONRenderer does, for JavaScript."""
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+
+
+def _field_encoder(field):
+    """
+    value → JSON text, the same as dumps(field.to_representation(value)),
+    with the common values looked up instead of recomputed.
+    """
+    def generic(value):
+        return 'null' if value is None else dumps(field.to_representation(value))
+
+    if isinstance(field, serializers.ChoiceField):
+        known = {choice: dumps(field.to_representation(choice)) for choice in field.choices}
+    elif isinstance(field, serializers.BooleanField):
+        known = {True: 'true', False: 'false'}
+    elif isinstance(field, serializers.CharField):
+        return lambda value: 'null' if value is None else encode_basestring(str(value))
+    else:
+        return generic
+    return lambda value: known.get(value) or generic(value)
+
+
+class PokemonRowEncoder:
+    """
+    Read-only fast path for PokemonSerializer output.
+
+    Rows come straight from `values_list(*encoder.fields)` tuples instead
+    of model instances, and are written through a JSON template compiled
+    once per fieldset: non-null integer columns are formatted by the
+    template itself (%d), the rest through a per-field encoder. The text
+    is the same as serializing model instances and rendering them with
+    JSONRenderer, byte for byte.
+
+    Rows may carry extra trailing columns (e.g. for pagination cursors);
+    they are ignored.
+    """
+
+    def __init__(self, fields=None):
+        self.fields = tuple(fields or PokemonSerializer.Meta.fields)
+        serializer_fields = PokemonSerializer(fields=self.fields).fields
+        self.serializer_fields = [serializer_fields[name] for name in self.fields]
+
+        parts, self._convert = [], []
+        for i, (name, field) in enumerate(zip(self.fields, self.serializer_fields)):
+            plain_int = isinstance(field, serializers.IntegerField) and not field.allow_null
+            parts.append(f'{encode_basestring(name)}:{"%d" if plain_int else "%s"}')
+            if not plain_int:
+                self._convert.append((i, _field_encoder(field)))
+        # field names are identifiers, so they never need %-escaping
+        self._template = '{' + ','.join(parts) + '}'
+        self._width = len(self.fields)
+
+    def encode(self, row):
+        """One row as a JSON object."""
+        values = list(row[:self._width])
+        for i, encode in self._convert:
+            values[i] = encode(values[i])
+        return self._template % tuple(values)
+
+    def encode_list(self, rows):
+        """Rows as a JSON array."""
+        return '[' + ','.join(map(self.encode, rows)) + ']'
+
+    def to_representation(self, row):
+        """One row as the dict PokemonSerializer would give."""
+        return {
+            field.field_name: None if value is None else field.to_representation(value)
+            for field, value in zip(self.serializer_fields, row)
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def row_encoder(fields=None):
+    """The shared PokemonRowEncoder for a fieldset (see parse_fieldset)."""
+    return PokemonRowEncoder(fields)
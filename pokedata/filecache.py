@@ -0,0 +1,39 @@
+import contextlib
+import os
+
+from django.core.cache.backends import filebased
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+try:
+    import fcntl
+except ImportError:  # Windows: development runs a single process anyway
+    fcntl = None
+
+
+class FileBasedCache(filebased.FileBasedCache):
+    """
+    Django's file cache, shared by every worker process on the host
+    (BACKEND 'pokedata.filecache.FileBasedCache'), with add() and incr()
+    atomic across them. The stock ones read and then write unlocked, so
+    two workers bumping the dataset version at once could both land on
+    the same number and one write would go unnoticed.
+    """
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._locked():
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            return super().incr(key, delta, version)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        self._createdir()
+        # not a .djcache file: clear() and culling leave it alone
+        with open(os.path.join(self._dir, 'lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
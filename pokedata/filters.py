@@ -0,0 +1,97 @@
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from .models import MAX_DB_INT, PokemonType, canonical_type
+
+# columns that accept range lookups, e.g. ?speed__gt=100&defense__lt=80
+RANGE_FIELDS = (
+    'pokemon_HP',
+    'attack',
+    'defense',
+    'special_attack',
+    'special_defense',
+    'speed',
+    'total_stats',
+)
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+
+# accepted by ?ordering=, optionally prefixed with '-'
+ORDERING_FIELDS = RANGE_FIELDS + ('pokemon_name', 'generation', 'id')
+
+
+def parse_int(params, key):
+    """
+    params[key] as an int the database can take, raising ValidationError
+    when it is not one.
+    """
+    try:
+        value = int(params[key])
+    except ValueError:
+        raise ValidationError({key: ['Must be an integer.']})
+    if not -MAX_DB_INT <= value <= MAX_DB_INT:
+        raise ValidationError({key: ['Out of range.']})
+    return value
+
+
+def parse_common_filters(params):
+    """
+    ?generation= / ?type= / ?legendary= as {'generation': int,
+    'type': canonical type, 'legendary': bool}, raising ValidationError on
+    bad values.
+    """
+    filters = {}
+    if params.get('generation'):
+        filters['generation'] = parse_int(params, 'generation')
+    if params.get('type'):
+        t = canonical_type(params['type'])
+        if t not in PokemonType.values:
+            raise ValidationError({'type': ['Unknown type.']})
+        filters['type'] = t
+    if params.get('legendary'):
+        if params['legendary'] not in ('true', 'false'):
+            raise ValidationError({'legendary': ['Must be true or false.']})
+        filters['legendary'] = params['legendary'] == 'true'
+    return filters
+
+
+def filter_pokemon(qs, params):
+    """
+    Narrow a Pokemon queryset by the list filters:
+
+        ?generation=3&type=fire&legendary=false
+        ?speed__gt=100&defense__lt=80&total_stats__gte=500
+    """
+    common = parse_common_filters(params)
+    if 'generation' in common:
+        qs = qs.filter(generation=common['generation'])
+    if 'type' in common:
+        qs = qs.filter(Q(pokemon_type1=common['type']) | Q(pokemon_type2=common['type']))
+    if 'legendary' in common:
+        qs = qs.filter(legendary=common['legendary'])
+
+    ranges = {}
+    for field in RANGE_FIELDS:
+        for lookup in RANGE_LOOKUPS:
+            key = f'{field}__{lookup}'
+            if key in params:
+                ranges[key] = parse_int(params, key)
+    if ranges:
+        qs = qs.filter(**ranges)
+    return qs
+
+
+def order_pokemon(qs, params):
+    """
+    Apply ?ordering=-total_stats,pokemon_name. `id` is appended as a
+    tie-breaker (in the direction of the last field) so the order is total.
+    """
+    raw = params.get('ordering')
+    if not raw:
+        return qs
+    ordering = [f.strip() for f in raw.split(',') if f.strip()]
+    bad = [f for f in ordering if f.lstrip('-') not in ORDERING_FIELDS]
+    if bad or not ordering:
+        raise ValidationError({'ordering': [f'Must be from {", ".join(ORDERING_FIELDS)}.']})
+    if 'id' not in [f.lstrip('-') for f in ordering]:
+        ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+    return qs.order_by(*ordering)
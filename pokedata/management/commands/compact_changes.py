@@ -0,0 +1,28 @@
+import datetime
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from pokedata.models import PokemonChange
+
+
+class Command(BaseCommand):
+    help = (
+        "Compact the change log behind /api/pokemon/changes: keep the latest "
+        "entry per Pokémon and drop tombstones older than the retention period. "
+        "Run it periodically, e.g. daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=float,
+                            default=getattr(settings, 'POKEDATA_CHANGES_RETENTION', 30),
+                            help='keep tombstones this many days (default: POKEDATA_CHANGES_RETENTION)')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        removed = PokemonChange.objects.compact(datetime.timedelta(days=options['retention_days']))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{removed} entries removed, {PokemonChange.objects.count()} left in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,114 @@
+import csv
+import gzip
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from pokedata.models import Pokemon
+
+STATS = ('HP', 'Attack', 'Defense', 'Sp. Atk', 'Sp. Def', 'Speed')
+
+
+def open_csv(path):
+    """
+    Open `path` ('-' for stdin) as text, transparently gunzipping it when it
+    starts with the gzip magic bytes.
+    """
+    raw = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    raw = io.BufferedReader(raw) if not hasattr(raw, 'peek') else raw
+    if raw.peek(2)[:2] == b'\x1f\x8b':
+        raw = gzip.GzipFile(fileobj=raw)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+def row_to_pokemon(row):
+    hp, attack, defense, sp_atk, sp_def, speed = (int(row[s]) for s in STATS)
+    return Pokemon(
+        pokemon_name    = row['Name'].strip(),
+        pokemon_type1   = row['Type 1'],
+        pokemon_type2   = row.get('Type 2') or None,
+        # bulk_create() skips save(), so compute the total here
+        total_stats     = hp + attack + defense + sp_atk + sp_def + speed,
+        pokemon_HP      = hp,
+        attack          = attack,
+        defense         = defense,
+        special_attack  = sp_atk,
+        special_defense = sp_def,
+        speed           = speed,
+        generation      = int(row['Generation']),
+        legendary       = row['Legendary'].strip().lower() in ('1', 'true', 'yes'),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Import Pokémon from a CSV in the Pokemon_Data.csv layout (optionally "
+        "gzipped, '-' for stdin). Names already in the database are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help="CSV file, .csv.gz, or '-' for stdin")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='rows per INSERT batch and transaction (default: 5000)')
+        parser.add_argument('--progress', type=int, default=100_000,
+                            help='report progress every N rows, 0 to disable (default: 100000)')
+
+    def handle(self, *args, **options):
+        path       = options['csv_path']
+        batch_size = options['batch_size']
+        progress   = options['progress']
+
+        try:
+            f = open_csv(path)
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+        # one query up front instead of an exists() per row
+        seen = set(Pokemon.objects.values_list('pokemon_name', flat=True))
+
+        start = time.perf_counter()
+        read = imported = 0
+        batch = []
+        try:
+            for row in csv.DictReader(f):
+                read += 1
+                if progress and read % progress == 0:
+                    self.report(read, imported + len(batch), start)
+                name = row['Name'].strip()
+                if name in seen:
+                    continue
+                seen.add(name)
+                try:
+                    batch.append(row_to_pokemon(row))
+                except (KeyError, ValueError) as e:
+                    raise CommandError(f"Bad row {read}: {e}")
+
+                if len(batch) >= batch_size:
+                    imported += self.flush(batch)
+                    batch = []
+        finally:
+            if path == '-':
+                # stdin is not ours to close
+                f.detach()
+            else:
+                f.close()
+
+        if batch:
+            imported += self.flush(batch)
+        self.report(read, imported, start)
+        self.stdout.write(self.style.SUCCESS(f"{imported} Pokémon imported."))
+
+    def flush(self, batch):
+        with transaction.atomic():
+            Pokemon.objects.bulk_create(batch, batch_size=len(batch))
+        return len(batch)
+
+    def report(self, read, imported, start):
+        elapsed = time.perf_counter() - start
+        rate = read / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{read} rows read, {imported} imported in {elapsed:.1f}s ({rate:,.0f} rows/s)"
+        )
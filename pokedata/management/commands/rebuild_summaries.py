@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pokedata.models import PokemonSummary
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-generation and per-type PokemonSummary rows from "
+        "scratch, e.g. after editing the database outside Django."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='only report summaries that differ from a fresh aggregation')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['check']:
+            fresh  = PokemonSummary.objects.aggregate_rows()
+            stored = PokemonSummary.objects.stored_rows()
+            stale  = sorted(key for key in set(fresh) | set(stored) if fresh.get(key) != stored.get(key))
+            for group, key in stale:
+                self.stdout.write(f"{group} {key}: out of date")
+            self.stdout.write(f"{len(stale)} of {len(fresh)} summaries out of date.")
+            return
+
+        PokemonSummary.objects.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{PokemonSummary.objects.count()} summaries rebuilt in {elapsed:.2f}s."
+        ))
@@ -0,0 +1,271 @@
+import atexit
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .cache import cache_stats
+
+# seconds
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+# bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+# a worker's counters reach the other workers' scrapes at most this late (s)
+FLUSH_INTERVAL = 1.0
+
+
+def metrics_dir():
+    """
+    Directory the worker processes share their metrics through
+    (settings.POKEDATA_METRICS_DIR); None for a single process.
+    """
+    return getattr(settings, 'POKEDATA_METRICS_DIR', None)
+
+
+class Metric:
+    """
+    One metric family: a counter, a gauge or a histogram, with a value
+    per combination of label values.
+
+    A histogram's value is [count per bucket..., count past the last
+    bucket, sum]; buckets are stored non-cumulative and summed on output.
+    """
+
+    def __init__(self, registry, kind, name, help, labels=(), buckets=None):
+        self.kind    = kind
+        self.name    = name
+        self.help    = help
+        self.labels  = tuple(labels)
+        self.buckets = tuple(buckets or ())
+        self.values  = {}
+        self._lock   = registry.lock
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            slots = self.values.get(labels)
+            if slots is None:
+                slots = self.values[labels] = [0] * (len(self.buckets) + 2)
+            # the first bucket with value <= bound; past the end: overflow
+            slots[bisect.bisect_left(self.buckets, value)] += 1
+            slots[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            samples = [[list(k), v[:] if isinstance(v, list) else v] for k, v in self.values.items()]
+        return {
+            'kind': self.kind, 'help': self.help, 'labels': self.labels,
+            'buckets': self.buckets, 'samples': samples,
+        }
+
+
+class Registry:
+    """
+    The metrics of this process, and the Prometheus text of all of them.
+
+    With several worker processes (gunicorn), each one writes a snapshot
+    to <POKEDATA_METRICS_DIR>/metrics-<pid>.json every FLUSH_INTERVAL
+    seconds and on exit; a scrape answered by any worker
+    merges every file. Counters and histograms of workers that have
+    exited keep counting, so totals never go backwards; gauges only
+    count live workers. Empty the directory when the server (not a
+    worker) restarts.
+    """
+
+    def __init__(self):
+        self.lock       = threading.Lock()
+        self.metrics    = {}
+        self.collectors = []
+        self._flusher_pid = None
+
+    def _add(self, kind, name, help, labels=(), buckets=None):
+        metric = self.metrics[name] = Metric(self, kind, name, help, labels, buckets)
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add('counter', name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._add('gauge', name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add('histogram', name, help, labels, buckets)
+
+    def collector(self, fn):
+        """Register fn() → {name: snapshot} for values kept elsewhere."""
+        self.collectors.append(fn)
+        return fn
+
+    def snapshot(self):
+        families = {name: metric.snapshot() for name, metric in self.metrics.items()}
+        for fn in self.collectors:
+            families.update(fn())
+        return families
+
+    # -----------------------------------------------------------------------
+
+    def start_flushing(self):
+        """
+        Flush every FLUSH_INTERVAL seconds from a background thread, once
+        per process (gunicorn forks workers after import).
+        """
+        if not metrics_dir() or self._flusher_pid == os.getpid():
+            return
+        with self.lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def flush(self):
+        directory = metrics_dir()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def collect(self):
+        """Every worker's snapshot merged (just this process's without a directory)."""
+        own = self.snapshot()
+        directory = metrics_dir()
+        if not directory:
+            return own
+        self.flush()
+        merged = {}
+        for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+            pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+            if pid == os.getpid():
+                families = own
+            else:
+                try:
+                    with open(path) as f:
+                        families = json.load(f)
+                except (OSError, ValueError):
+                    continue
+            live = pid == os.getpid() or _alive(pid)
+            for name, family in families.items():
+                if family['kind'] == 'gauge' and not live:
+                    continue
+                _merge(merged, name, family)
+        return merged
+
+    def render(self):
+        """The Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f'# HELP {name} {family["help"]}')
+            lines.append(f'# TYPE {name} {family["kind"]}')
+            for labels, value in sorted(family['samples'], key=lambda s: s[0]):
+                pairs = list(zip(family['labels'], labels))
+                if family['kind'] != 'histogram':
+                    lines.append(f'{name}{_labels(pairs)} {_number(value)}')
+                    continue
+                cumulative = 0
+                for bound, n in zip([*family['buckets'], math.inf], value[:-1]):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{_labels(pairs + [("le", bound)])} {_number(cumulative)}')
+                lines.append(f'{name}_sum{_labels(pairs)} {_number(value[-1])}')
+                lines.append(f'{name}_count{_labels(pairs)} {_number(cumulative)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(merged, name, family):
+    target = merged.setdefault(name, {**family, 'samples': []})
+    index = {tuple(labels): i for i, (labels, _) in enumerate(target['samples'])}
+    for labels, value in family['samples']:
+        i = index.get(tuple(labels))
+        if i is None:
+            index[tuple(labels)] = len(target['samples'])
+            target['samples'].append([labels, value[:] if isinstance(value, list) else value])
+        elif isinstance(value, list):
+            target['samples'][i][1] = [a + b for a, b in zip(target['samples'][i][1], value)]
+        else:
+            target['samples'][i][1] += value
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _escape(value):
+    if isinstance(value, float):
+        return _number(value)
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value):
+    return '+Inf' if value == math.inf else repr(value)
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+REQUEST_LABELS = ('view', 'method')
+
+requests_total = registry.counter(
+    'pokedata_http_requests_total', 'Requests answered, by status code.',
+    REQUEST_LABELS + ('status',))
+request_seconds = registry.histogram(
+    'pokedata_http_request_duration_seconds', 'Time to produce the response.',
+    REQUEST_LABELS)
+db_seconds = registry.histogram(
+    'pokedata_http_request_db_seconds', 'Time spent in SQL per request.',
+    REQUEST_LABELS)
+render_seconds = registry.histogram(
+    'pokedata_http_request_render_seconds', 'Time spent rendering templates, where any were.',
+    REQUEST_LABELS)
+db_queries_total = registry.counter(
+    'pokedata_http_request_db_queries_total', 'SQL statements run.',
+    REQUEST_LABELS)
+response_bytes = registry.histogram(
+    'pokedata_http_response_size_bytes', 'Response body size (not for streamed bodies).',
+    REQUEST_LABELS, buckets=SIZE_BUCKETS)
+in_flight = registry.gauge(
+    'pokedata_http_requests_in_flight', 'Requests being answered right now.',
+    REQUEST_LABELS)
+
+
+@registry.collector
+def _response_cache():
+    stats = cache_stats()
+    return {'pokedata_response_cache_total': {
+        'kind': 'counter', 'help': 'Response cache lookups, by result.',
+        'labels': ('result',), 'buckets': (),
+        'samples': [[['hit'], stats.get('hits', 0)], [['miss'], stats.get('misses', 0)]],
+    }}
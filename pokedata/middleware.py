@@ -0,0 +1,248 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+
+from . import metrics, rendering
+
+logger = logging.getLogger('pokedata.sql')
+
+
+def slow_query_ms():
+    """Statements slower than this are logged (settings.POKEDATA_SLOW_QUERY_MS)."""
+    return getattr(settings, 'POKEDATA_SLOW_QUERY_MS', 100)
+
+
+def repeated_query_limit():
+    """
+    The same statement run this many times in one request is logged as
+    an N-query pattern (settings.POKEDATA_REPEATED_QUERY_LIMIT).
+    """
+    return getattr(settings, 'POKEDATA_REPEATED_QUERY_LIMIT', 10)
+
+
+def _url_name(request):
+    match = request.resolver_match
+    return (match.view_name if match else None) or request.path
+
+
+class QueryStats:
+    """
+    A connection.execute_wrapper() timing and counting the statements of
+    one request. Statements are grouped by their SQL text, which for ORM
+    queries still has the %s placeholders, so a query issued in a loop
+    shows up as one entry with a high count.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.count   = 0
+        self.seconds = 0.0
+        self.by_sql  = Counter()
+        self.slow    = slow_query_ms() / 1000
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.seconds += elapsed
+            self.by_sql[sql] += 1
+            if elapsed >= self.slow:
+                logger.warning('slow query %.1f ms in %s: %s',
+                               elapsed * 1000, _url_name(self.request), sql)
+
+    def repeated(self, limit):
+        """[(sql, count)] of the statements run at least `limit` times."""
+        return [(sql, n) for sql, n in self.by_sql.most_common() if n >= limit]
+
+
+# the QueryStats of the request being served, if any; a context variable
+# rather than a thread-local so it follows async requests into the
+# threads their database work runs in (see asyncviews.py)
+_stats = contextvars.ContextVar('pokedata_query_stats', default=None)
+# per thread: whether instrument_connections() has run
+_thread = threading.local()
+
+
+def _record(execute, sql, params, many, context):
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def instrument_connections():
+    """
+    Give this thread's connections a permanent _record() wrapper, once.
+    Entering connection.execute_wrapper() on every request would cost a
+    thread-local connection lookup per database per request instead.
+    """
+    if getattr(_thread, 'instrumented', False):
+        return
+    for alias in connections:
+        wrappers = connections[alias].execute_wrappers
+        if _record not in wrappers:
+            # first, as execute_wrapper() blocks pop() the last one on exit
+            wrappers.insert(0, _record)
+    _thread.instrumented = True
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count and time every SQL statement of a request, on every database:
+
+    * a `Server-Timing: db;dur=…;desc="N queries", app;dur=…` header, for
+      the browser's network panel, with a `render;dur=…` entry between
+      them when templates were rendered (see rendering.py),
+    * a warning on the `pokedata.sql` logger, with the resolved URL name,
+      for each statement slower than POKEDATA_SLOW_QUERY_MS and each
+      statement repeated POKEDATA_REPEATED_QUERY_LIMIT times or more.
+
+    The body of a streamed response is produced after the middleware
+    returns, so its queries are not included.
+
+    Works under WSGI and ASGI alike.
+    """
+
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _mark_async(self, get_response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        tokens, start = self.before(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.after(request, response, start)
+
+    async def __acall__(self, request):
+        tokens, start = self.before(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.reset(tokens)
+        return self.after(request, response, start)
+
+    def before(self, request):
+        instrument_connections()
+        request.query_stats = QueryStats(request)
+        request.render_timer, render_token = rendering.start_timer()
+        return (_stats.set(request.query_stats), render_token), time.perf_counter()
+
+    @staticmethod
+    def reset(tokens):
+        stats_token, render_token = tokens
+        _stats.reset(stats_token)
+        rendering.stop_timer(render_token)
+
+    def after(self, request, response, start):
+        elapsed = time.perf_counter() - start
+        stats = request.query_stats
+
+        for sql, n in stats.repeated(repeated_query_limit()):
+            logger.warning('%d× the same query in %s: %s', n, _url_name(request), sql)
+
+        timing = f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries", '
+        if request.render_timer.count:
+            timing += f'render;dur={request.render_timer.seconds * 1000:.2f}, '
+        timing += f'app;dur={elapsed * 1000:.2f}'
+        if response.has_header('Server-Timing'):
+            timing = f"{response['Server-Timing']}, {timing}"
+        response['Server-Timing'] = timing
+        return response
+
+
+def _mark_async(middleware, get_response):
+    # how Django tells an async-capable middleware instance is a coroutine
+    # function (see MiddlewareMixin._async_check)
+    if asyncio.iscoroutinefunction(get_response):
+        middleware._is_coroutine = asyncio.coroutines._is_coroutine
+
+
+# anything else is counted as "other", to bound the label values
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+class MetricsMiddleware:
+    """
+    Feed pokedata.metrics: requests by status, latency, DB time, query
+    count and template render time (from QueryInstrumentationMiddleware,
+    which must come after this one), response size and in-flight requests, all labelled by URL
+    name and method. Unmatched URLs share the view label "<unmatched>".
+    """
+
+    sync_capable  = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _mark_async(self, get_response)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        labels, start = self.before(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.in_flight.dec(*labels)
+        return self.after(request, response, labels, start)
+
+    async def __acall__(self, request):
+        labels, start = self.before(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.in_flight.dec(*labels)
+        return self.after(request, response, labels, start)
+
+    def before(self, request):
+        metrics.registry.start_flushing()
+        labels = self.labels(request)
+        metrics.in_flight.inc(*labels)
+        return labels, time.perf_counter()
+
+    def after(self, request, response, labels, start):
+        elapsed = time.perf_counter() - start
+        metrics.requests_total.inc(*labels, str(response.status_code))
+        metrics.request_seconds.observe(elapsed, *labels)
+        stats = getattr(request, 'query_stats', None)
+        if stats is not None:
+            metrics.db_seconds.observe(stats.seconds, *labels)
+            metrics.db_queries_total.inc(*labels, amount=stats.count)
+        timer = getattr(request, 'render_timer', None)
+        if timer is not None and timer.count:
+            metrics.render_seconds.observe(timer.seconds, *labels)
+        if not response.streaming:
+            metrics.response_bytes.observe(len(response.content), *labels)
+        if labels[0] == 'metrics':
+            # the scrape flushed this worker's file while it was in flight;
+            # don't leave the next scrape (by another worker) seeing it so
+            metrics.registry.flush()
+        return response
+
+    @staticmethod
+    def labels(request):
+        # resolved here, ahead of the handler, rather than in a
+        # process_view() hook: Django runs a sync hook in a thread of its
+        # own under ASGI, for every request
+        try:
+            view = resolve(request.path_info).view_name or '<unmatched>'
+        except Resolver404:
+            view = '<unmatched>'
+        return view, request.method if request.method in METHODS else 'other'
@@ -0,0 +1,21 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokedata', '0002_auto_20250617_2240'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='pokemon',
+            options={'ordering': ['generation', 'pokemon_name', 'id'], 'verbose_name': 'Pokémon', 'verbose_name_plural': 'Pokémon'},
+        ),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=models.Index(fields=['generation', 'pokemon_name', 'id'], name='pokemon_default_order_idx'),
+        ),
+    ]
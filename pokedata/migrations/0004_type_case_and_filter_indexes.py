@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+TYPES = [
+    'Normal', 'Fire', 'Water', 'Electric', 'Grass', 'Ice', 'Fighting', 'Poison', 'Ground',
+    'Flying', 'Psychic', 'Bug', 'Rock', 'Ghost', 'Dragon', 'Dark', 'Steel', 'Fairy',
+]
+
+
+def canonicalize_types(apps, schema_editor):
+    # One UPDATE per distinct stored spelling, e.g. 'fire' -> 'Fire', '' -> NULL
+    lookup = {t.lower(): t for t in TYPES}
+    Pokemon = apps.get_model('pokedata', 'Pokemon')
+    for field in ('pokemon_type1', 'pokemon_type2'):
+        for value in Pokemon.objects.values_list(field, flat=True).distinct():
+            if value is None:
+                continue
+            canonical = lookup.get(value.strip().lower(), value) if value.strip() else None
+            if canonical is None and field == 'pokemon_type1':
+                continue
+            if canonical != value:
+                Pokemon.objects.filter(**{field: value}).update(**{field: canonical})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokedata', '0003_keyset_ordering_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_types, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=models.Index(condition=models.Q(('legendary', True)), fields=['generation', 'pokemon_name', 'id'], name='pokemon_legendary_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=models.Index(fields=['pokemon_type1', 'pokemon_type2', 'generation', 'pokemon_name', 'id'], name='pokemon_type1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pokemon',
+            index=models.Index(fields=['pokemon_type2', 'generation', 'pokemon_name', 'id'], name='pokemon_type2_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:13
+
+from django.db import migrations, models
+
+
+STATS = ['pokemon_HP', 'attack', 'defense', 'special_attack', 'special_defense', 'speed', 'total_stats']
+
+
+def build_summaries(apps, schema_editor):
+    # Same numbers as PokemonSummary.objects.rebuild(), folded in Python
+    # against the historical models
+    Pokemon = apps.get_model('pokedata', 'Pokemon')
+    PokemonSummary = apps.get_model('pokedata', 'PokemonSummary')
+    summaries = {}
+    rows = Pokemon.objects.values_list('generation', 'pokemon_type1', 'pokemon_type2', 'legendary', *STATS)
+    for generation, type1, type2, legendary, *stats in rows.iterator():
+        groups = [('generation', str(generation)), ('type', type1)]
+        if type2 and type2 != type1:
+            groups.append(('type', type2))
+        for group in groups:
+            s = summaries.setdefault(group, {'count': 0, 'legendary_count': 0})
+            s['count'] += 1
+            s['legendary_count'] += bool(legendary)
+            for stat, value in zip(STATS, stats):
+                s[f'{stat}_sum'] = s.get(f'{stat}_sum', 0) + value
+                s[f'{stat}_max'] = max(s.get(f'{stat}_max', value), value)
+    PokemonSummary.objects.bulk_create([
+        PokemonSummary(group=group, key=key, **values)
+        for (group, key), values in summaries.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokedata', '0005_stat_range_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PokemonSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.CharField(choices=[('generation', 'Generation'), ('type', 'Type')], max_length=16)),
+                ('key', models.CharField(max_length=16)),
+                ('count', models.IntegerField(default=0)),
+                ('legendary_count', models.IntegerField(default=0)),
+                ('pokemon_HP_sum', models.BigIntegerField(default=0)),
+                ('attack_sum', models.BigIntegerField(default=0)),
+                ('defense_sum', models.BigIntegerField(default=0)),
+                ('special_attack_sum', models.BigIntegerField(default=0)),
+                ('special_defense_sum', models.BigIntegerField(default=0)),
+                ('speed_sum', models.BigIntegerField(default=0)),
+                ('total_stats_sum', models.BigIntegerField(default=0)),
+                ('pokemon_HP_max', models.IntegerField(null=True)),
+                ('attack_max', models.IntegerField(null=True)),
+                ('defense_max', models.IntegerField(null=True)),
+                ('special_attack_max', models.IntegerField(null=True)),
+                ('special_defense_max', models.IntegerField(null=True)),
+                ('speed_max', models.IntegerField(null=True)),
+                ('total_stats_max', models.IntegerField(null=True)),
+            ],
+            options={
+                'verbose_name': 'Pokémon summary',
+                'verbose_name_plural': 'Pokémon summaries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pokemonsummary',
+            constraint=models.UniqueConstraint(fields=('group', 'key'), name='pokemon_summary_group_key'),
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:29
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def log_existing_rows(apps, schema_editor):
+    # one upsert per row already there, so that ?since=0 is a full copy
+    Pokemon = apps.get_model('pokedata', 'Pokemon')
+    PokemonChange = apps.get_model('pokedata', 'PokemonChange')
+    now = timezone.now()
+    pks = Pokemon.objects.order_by('pk').values_list('pk', flat=True)
+    PokemonChange.objects.bulk_create(
+        (PokemonChange(pokemon_id=pk, changed_at=now) for pk in pks.iterator()),
+        batch_size=5000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pokedata', '0006_pokemon_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PokemonChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('pokemon_id', models.IntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Pokémon change',
+                'verbose_name_plural': 'Pokémon changes',
+            },
+        ),
+        migrations.CreateModel(
+            name='PokemonChangeCompaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('compacted_at', models.DateTimeField(auto_now_add=True)),
+                ('horizon', models.BigIntegerField()),
+                ('removed', models.IntegerField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='pokemonchange',
+            index=models.Index(fields=['pokemon_id', 'seq'], name='pokemon_change_pokemon_idx'),
+        ),
+        migrations.RunPython(log_existing_rows, migrations.RunPython.noop),
+    ]
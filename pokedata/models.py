@@ -1,5 +1,19 @@
+import datetime
+import functools
+import threading
+from collections import Counter
+from contextlib import contextmanager
 from enum import Enum
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, connection, connections, models, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from .cache import bump_dataset_version
+
+# SQLite integers are signed 64-bit: a larger value given in a request
+# makes binding it fail with OverflowError
+MAX_DB_INT = 2**63 - 1
 
 class PokemonType(models.TextChoices):
     NORMAL   = "Normal",   "Normal"
@@ -30,8 +44,128 @@ class Generation(models.IntegerChoices):
     GEN5 = 5, "Generation V"
     GEN6 = 6, "Generation VI"
 
+
+_CANONICAL_TYPES = {value.lower(): value for value in PokemonType.values}
+
+
+def canonical_type(value):
+    """
+    Map any spelling of a type ('fire', 'FIRE') to the stored one ('Fire')
+    so filters can use plain, index-friendly equality instead of iexact.
+    Blank becomes None; unknown values are passed through unchanged.
+    """
+    if not value:
+        return None
+    return _CANONICAL_TYPES.get(value.strip().lower(), value)
+
+
+# stats summarized per generation and per type, in this order
+SUMMARY_STATS = (
+    'pokemon_HP',
+    'attack',
+    'defense',
+    'special_attack',
+    'special_defense',
+    'speed',
+    'total_stats',
+)
+# the columns a row contributes to PokemonSummary with
+SUMMARY_FIELDS = ('generation', 'pokemon_type1', 'pokemon_type2', 'legendary') + SUMMARY_STATS
+
+
+class PokemonQuerySet(models.QuerySet):
+    # Bulk writes skip Pokemon.save()/delete(), so they have to bump the
+    # dataset version and maintain PokemonSummary and the PokemonChange
+    # log themselves. They set
+    # _for_write first, as Django's own do, so that self.db is the alias
+    # writes are routed to rather than reads (see routers.py).
+
+    def bulk_create(self, objs, batch_size=None, ignore_conflicts=False):
+        if ignore_conflicts:
+            # the skipped rows cannot be told apart from the inserted ones,
+            # which the summaries and the change log would count all the same
+            raise ValueError("Pokemon bulk_create() does not support ignore_conflicts.")
+        # bulk_create() skips save(), so normalize the types here too
+        objs = list(objs)
+        for obj in objs:
+            obj.pokemon_type1 = canonical_type(obj.pokemon_type1)
+            obj.pokemon_type2 = canonical_type(obj.pokemon_type2)
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            # SQLite does not hand back the new ids either, but they all
+            # come after the highest one so far
+            last = self.order_by().aggregate(last=Max('pk'))['last'] or 0
+            created = super().bulk_create(objs, batch_size=batch_size)
+            PokemonSummary.objects.apply(added=[obj.summary_values() for obj in objs])
+            PokemonChange.objects.record(self.model.objects.filter(pk__gt=last))
+            given = [obj.pk for obj in objs if obj.pk is not None and obj.pk <= last]
+            if given:
+                PokemonChange.objects.record(given)
+        # SQLite does not hand back the new ids, so the rows are unknown
+        bump_dataset_version(known=False)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        # Django runs bulk_update() as filter(pk__in=...).update(...)
+        # batches, so update() below keeps PokemonSummary in step
+        objs = list(objs)
+        updated = super().bulk_update(objs, fields, *args, **kwargs)
+        bump_dataset_version(saved=objs)
+        return updated
+
+    def update(self, **kwargs):
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            # the filter may not match the rows any more afterwards
+            PokemonChange.objects.record(self)
+            if not set(kwargs) & set(SUMMARY_FIELDS):
+                rows = super().update(**kwargs)
+            else:
+                pks = list(self.order_by().values_list('pk', flat=True))
+                before = summary_rows(pks)
+                rows = super().update(**kwargs)
+                PokemonSummary.objects.apply(added=summary_rows(pks), removed=before)
+        bump_dataset_version(known=False)
+        return rows
+
+    def delete(self):
+        self._for_write = True
+        with transaction.atomic(using=self.db, savepoint=False):
+            PokemonChange.objects.record(self, deleted=True)
+            if not self.query.where and getattr(_batch, 'rows', None) is None:
+                deleted = super().delete()
+                PokemonSummary.objects.all().delete()
+            else:
+                removed = list(self.order_by().values_list(*SUMMARY_FIELDS))
+                deleted = super().delete()
+                PokemonSummary.objects.apply(removed=removed)
+        bump_dataset_version(known=False)
+        return deleted
+
+
+def summary_rows(pks, batch_size=900):
+    """
+    The SUMMARY_FIELDS of the given rows, a bounded IN (...) at a time.
+    Plain SQL: it runs before every single-row write, where compiling the
+    equivalent values_list() query costs more than the lookup itself.
+    """
+    qn = connection.ops.quote_name
+    columns = ', '.join(qn(Pokemon._meta.get_field(f).column) for f in SUMMARY_FIELDS)
+    table = qn(Pokemon._meta.db_table)
+    rows = []
+    with connection.cursor() as cursor:
+        for i in range(0, len(pks), batch_size):
+            batch = list(pks[i:i + batch_size])
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'SELECT {columns} FROM {table} WHERE {qn("id")} IN ({placeholders})', batch)
+            rows += cursor.fetchall()
+    return rows
+
+
 class Pokemon(models.Model):
     #Name,Type 1,Type 2,Total,HP,Attack,Defense,Sp. Atk,Sp. Def,Speed,Generation,Legendary
+    objects = PokemonQuerySet.as_manager()
+
     pokemon_name = models.CharField(max_length=256, null=False, blank=False)
     pokemon_type1 = models.CharField(
         max_length=8,
@@ -65,6 +199,9 @@ class Pokemon(models.Model):
         return self.pokemon_name
 
     def save(self, *args, **kwargs):
+        # Store types in their canonical case ('Fire', never 'fire')
+        self.pokemon_type1 = canonical_type(self.pokemon_type1)
+        self.pokemon_type2 = canonical_type(self.pokemon_type2)
         # Auto-compute total_stats before saving,
         # so you never have to fill it in by hand
         self.total_stats = (
@@ -75,16 +212,431 @@ class Pokemon(models.Model):
             + self.special_defense
             + self.speed
         )
-        super().save(*args, **kwargs)
+        # no savepoint: the summary change stands or falls with the row's
+        with transaction.atomic(savepoint=False):
+            before = None if self.pk is None else summary_rows([self.pk])
+            super().save(*args, **kwargs)
+            PokemonSummary.objects.apply(added=[self.summary_values()], removed=before or ())
+            PokemonChange.objects.record([self.pk])
+        bump_dataset_version(saved=[self])
+
+    def summary_values(self):
+        return tuple(getattr(self, field) for field in SUMMARY_FIELDS)
 
     class Meta:
         # Optional: default ordering, e.g. by Pokédex order (generation → name)
-        ordering = ['generation', 'pokemon_name']
+        # `id` breaks ties so keyset pagination has a strict total order
+        ordering = ['generation', 'pokemon_name', 'id']
+        # Each filter path is an equality prefix followed by the default
+        # ordering, so matching rows come back already sorted.
+        indexes = [
+            models.Index(
+                fields=['generation', 'pokemon_name', 'id'],
+                name='pokemon_default_order_idx',
+            ),
+            # Django renders legendary=True as a bare `WHERE legendary`, which
+            # a partial index matches exactly (and it only holds legendaries)
+            models.Index(
+                fields=['generation', 'pokemon_name', 'id'],
+                name='pokemon_legendary_idx',
+                condition=models.Q(legendary=True),
+            ),
+            models.Index(
+                fields=['pokemon_type1', 'pokemon_type2', 'generation', 'pokemon_name', 'id'],
+                name='pokemon_type1_idx',
+            ),
+            models.Index(
+                fields=['pokemon_type2', 'generation', 'pokemon_name', 'id'],
+                name='pokemon_type2_idx',
+            ),
+            # ?<stat>__gt= ranges and ?ordering=<stat> on the list API; SQLite
+            # appends the rowid (id), so `ORDER BY stat, id` needs no sort
+            *[
+                models.Index(fields=[stat], name=f"pokemon_{stat.lower().replace('pokemon_', '')}_idx")
+                for stat in (
+                    'total_stats', 'pokemon_HP', 'attack', 'defense',
+                    'special_attack', 'special_defense', 'speed',
+                )
+            ],
+        ]
         verbose_name = 'Pokémon'
         verbose_name_plural = 'Pokémon'
 
     def delete(self, using=None, keep_parents=False):
         # custom cleanup, logging, or preventing deletion
         # e.g. log to a file, revoke related resources, etc.
-        super().delete(using=using, keep_parents=keep_parents)
+        pk = self.pk
+        with transaction.atomic(using=using, savepoint=False):
+            before = summary_rows([pk])
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            PokemonSummary.objects.apply(removed=before)
+            PokemonChange.objects.record([pk], deleted=True)
+        bump_dataset_version(deleted=[pk])
+        return deleted
+
+
+def summary_groups(row):
+    """The (group, key) summaries a row of SUMMARY_FIELDS counts towards."""
+    generation, type1, type2 = row[:3]
+    groups = [('generation', str(generation)), ('type', type1)]
+    if type2 and type2 != type1:
+        groups.append(('type', type2))
+    return groups
+
+
+def _normalize(row):
+    generation, type1, type2, legendary, *stats = row
+    return (int(generation), type1, type2 or None, bool(legendary), *map(int, stats))
+
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_summaries():
+    """
+    Fold the summary changes of every write inside the block into one
+    apply() at the end, e.g. for a bulk request saving thousands of rows
+    one by one. Use it inside the transaction doing the writes.
+    """
+    if getattr(_batch, 'rows', None) is not None:
+        yield
+        return
+    _batch.rows = ([], [])
+    try:
+        yield
+        added, removed = _batch.rows
+    finally:
+        _batch.rows = None
+    PokemonSummary.objects.apply(added, removed)
+
+
+class PokemonSummaryQuerySet(models.QuerySet):
+
+    def apply(self, added=(), removed=()):
+        """
+        Fold rows (tuples of SUMMARY_FIELDS) entering and leaving the
+        Pokemon table into the summaries, with one UPDATE per touched group.
+        Counts and sums are adjusted in place; a maximum is recomputed for
+        its group only when a removed row might have held it.
+        """
+        batch = getattr(_batch, 'rows', None)
+        if batch is not None:
+            batch[0].extend(added)
+            batch[1].extend(removed)
+            return
+
+        self._for_write = True
+        added, removed = Counter(map(_normalize, added)), Counter(map(_normalize, removed))
+        # an edit that leaves the summarized columns alone changes nothing
+        added, removed = added - removed, removed - added
+        if not added and not removed:
+            return
+
+        deltas = {}
+        for sign, rows in ((1, added), (-1, removed)):
+            for row, times in rows.items():
+                legendary, stats = row[3], row[4:]
+                for group in summary_groups(row):
+                    d = deltas.setdefault(group, {
+                        'count': 0, 'legendary': 0, 'sums': [0] * len(SUMMARY_STATS),
+                        'max': [None] * len(SUMMARY_STATS), 'removed': [None] * len(SUMMARY_STATS),
+                    })
+                    d['count'] += sign * times
+                    d['legendary'] += sign * times * legendary
+                    for j, value in enumerate(stats):
+                        d['sums'][j] += sign * times * value
+                        slot = 'max' if sign > 0 else 'removed'
+                        if d[slot][j] is None or value > d[slot][j]:
+                            d[slot][j] = value
+
+        sql = self._increment_sql(self.db)
+        with connections[self.db].cursor() as cursor:
+            for (group, key), d in deltas.items():
+                params = [d['count'], d['legendary'], *d['sums']]
+                for peak in d['max']:
+                    params += [peak, peak]
+                cursor.execute(sql, params + [group, key])
+                if not cursor.rowcount and not self._create(group, key, d):
+                    # created concurrently in between; increment that one
+                    cursor.execute(sql, params + [group, key])
+                # a maximum can only drop where the removed value beats
+                # anything this write added (an unchanged or raised stat
+                # is already covered by the MAX() above)
+                lost = [
+                    removed if removed is not None and (added is None or removed > added) else None
+                    for removed, added in zip(d['removed'], d['max'])
+                ]
+                if any(v is not None for v in lost):
+                    self._refresh_maxima(group, key, lost)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _increment_sql(alias):
+        # Built once: compiling ~20 F()/Greatest() expressions per UPDATE
+        # through the ORM costs more than running the statement.
+        # COALESCE(MAX(m, p), m, p) copes with either side being NULL under
+        # both SQLite's MAX() (NULL if any argument is) and GREATEST().
+        qn = connections[alias].ops.quote_name
+        greatest = 'MAX' if connections[alias].vendor == 'sqlite' else 'GREATEST'
+        columns = ['count', 'legendary_count'] + [f'{stat}_sum' for stat in SUMMARY_STATS]
+        sets = [f'{qn(c)} = {qn(c)} + %s' for c in columns] + [
+            f'{qn(c)} = COALESCE({greatest}({qn(c)}, %s), {qn(c)}, %s)'
+            for c in (f'{stat}_max' for stat in SUMMARY_STATS)
+        ]
+        return (
+            f'UPDATE {qn(PokemonSummary._meta.db_table)} SET {", ".join(sets)} '
+            f'WHERE {qn("group")} = %s AND {qn("key")} = %s'
+        )
+
+    def _create(self, group, key, d):
+        values = {
+            'count': d['count'], 'legendary_count': d['legendary'],
+            **{f'{stat}_sum': v for stat, v in zip(SUMMARY_STATS, d['sums'])},
+            **{f'{stat}_max': v for stat, v in zip(SUMMARY_STATS, d['max'])},
+        }
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(group=group, key=key, **values)
+        except IntegrityError:
+            return False
+        return True
+
+    def _refresh_maxima(self, group, key, removed):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(self._maxima_sql(self.db), [group, key])
+            current = cursor.fetchone()
+        if current is None:
+            return
+        stale = [
+            stat for stat, value, peak in zip(SUMMARY_STATS, removed, current)
+            if value is not None and (peak is None or value >= peak)
+        ]
+        if not stale:
+            return
+        maxima = Pokemon.objects.filter(PokemonSummary.rows(group, key)).aggregate(
+            **{f'{stat}_max': Max(stat) for stat in stale}
+        )
+        self.filter(group=group, key=key).update(**maxima)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _maxima_sql(alias):
+        qn = connections[alias].ops.quote_name
+        columns = ', '.join(qn(f'{stat}_max') for stat in SUMMARY_STATS)
+        return (
+            f'SELECT {columns} FROM {qn(PokemonSummary._meta.db_table)} '
+            f'WHERE {qn("group")} = %s AND {qn("key")} = %s'
+        )
+
+    def aggregate_rows(self):
+        """
+        {(group, key): {field: value}} computed from scratch with GROUP BY,
+        what rebuild() stores and what apply() must keep matching.
+        """
+        columns = {
+            'count':           Count('id'),
+            'legendary_count': Count('id', filter=Q(legendary=True)),
+            **{f'{stat}_sum': Sum(stat) for stat in SUMMARY_STATS},
+            **{f'{stat}_max': Max(stat) for stat in SUMMARY_STATS},
+        }
+        passes = [
+            ('generation', 'generation', Pokemon.objects.all()),
+            ('type', 'pokemon_type1', Pokemon.objects.all()),
+            # a second type only counts when it differs from the first
+            ('type', 'pokemon_type2', Pokemon.objects.exclude(pokemon_type2=None)
+                                                     .exclude(pokemon_type2=F('pokemon_type1'))),
+        ]
+        result = {}
+        for group, column, qs in passes:
+            for row in qs.order_by().values(column).annotate(**columns):
+                key = (group, str(row.pop(column)))
+                if key not in result:
+                    result[key] = row
+                    continue
+                merged = result[key]
+                for field, value in row.items():
+                    if field.endswith('_max'):
+                        merged[field] = max(merged[field], value)
+                    else:
+                        merged[field] += value
+        return result
+
+    def stored_rows(self):
+        """The non-empty summaries in the shape of aggregate_rows()."""
+        fields = [f.name for f in PokemonSummary._meta.fields if f.name not in ('id', 'group', 'key')]
+        return {
+            (group, key): dict(zip(fields, values))
+            for group, key, *values in self.filter(count__gt=0).values_list('group', 'key', *fields)
+        }
+
+    def rebuild(self):
+        """Replace every summary with a fresh aggregation of the table."""
+        self._for_write = True
+        with transaction.atomic(using=self.db):
+            self.all().delete()
+            self.bulk_create([
+                PokemonSummary(group=group, key=key, **values)
+                for (group, key), values in self.aggregate_rows().items()
+            ])
+        # cached responses may hold the old numbers
+        bump_dataset_version()
+
+
+class PokemonSummary(models.Model):
+    """
+    Count, legendary count, sum and maximum of every stat for one
+    generation or one type, maintained incrementally by every Pokemon
+    write path (see PokemonSummaryQuerySet.apply) so the aggregate
+    endpoints never scan the Pokemon table.
+
+    A Pokémon counts once towards its generation and once towards each of
+    its distinct types. `manage.py rebuild_summaries` recomputes them.
+    """
+    objects = PokemonSummaryQuerySet.as_manager()
+
+    group = models.CharField(max_length=16, choices=[('generation', 'Generation'), ('type', 'Type')])
+    key = models.CharField(max_length=16)
+    count = models.IntegerField(default=0)
+    legendary_count = models.IntegerField(default=0)
+    pokemon_HP_sum = models.BigIntegerField(default=0)
+    attack_sum = models.BigIntegerField(default=0)
+    defense_sum = models.BigIntegerField(default=0)
+    special_attack_sum = models.BigIntegerField(default=0)
+    special_defense_sum = models.BigIntegerField(default=0)
+    speed_sum = models.BigIntegerField(default=0)
+    total_stats_sum = models.BigIntegerField(default=0)
+    pokemon_HP_max = models.IntegerField(null=True)
+    attack_max = models.IntegerField(null=True)
+    defense_max = models.IntegerField(null=True)
+    special_attack_max = models.IntegerField(null=True)
+    special_defense_max = models.IntegerField(null=True)
+    speed_max = models.IntegerField(null=True)
+    total_stats_max = models.IntegerField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'key'], name='pokemon_summary_group_key'),
+        ]
+        verbose_name = 'Pokémon summary'
+        verbose_name_plural = 'Pokémon summaries'
+
+    def __str__(self):
+        return f'{self.group} {self.key}'
+
+    @staticmethod
+    def rows(group, key):
+        """Q selecting the Pokemon rows a summary covers."""
+        if group == 'generation':
+            return Q(generation=int(key))
+        return Q(pokemon_type1=key) | Q(pokemon_type2=key)
+
+    def as_dict(self):
+        label = int(self.key) if self.group == 'generation' else self.key
+        return {
+            self.group:  label,
+            'count':     self.count,
+            'legendary': self.legendary_count,
+            'avg': {
+                stat: round(getattr(self, f'{stat}_sum') / self.count, 3) if self.count else None
+                for stat in SUMMARY_STATS
+            },
+            'max': {stat: getattr(self, f'{stat}_max') for stat in SUMMARY_STATS},
+        }
+
+
+
+class PokemonChangeQuerySet(models.QuerySet):
+
+    def record(self, pokemon, deleted=False):
+        """
+        Log an upsert, or with `deleted` a tombstone, for each of
+        `pokemon`: ids, or a Pokemon queryset, copied over with one
+        INSERT ... SELECT (so call it before the write changes what the
+        queryset matches). Use it inside the transaction of the write.
+        """
+        self._for_write = True
+        ops = connections[self.db].ops
+        qn = ops.quote_name
+        insert = (
+            f'INSERT INTO {qn(PokemonChange._meta.db_table)} '
+            f'({qn("pokemon_id")}, {qn("deleted")}, {qn("changed_at")}) '
+        )
+        now = ops.adapt_datetimefield_value(timezone.now())
+        with connections[self.db].cursor() as cursor:
+            if isinstance(pokemon, models.QuerySet):
+                sql, params = pokemon.order_by().values('pk').query.get_compiler(self.db).as_sql()
+                cursor.execute(f'{insert}SELECT {qn("id")}, %s, %s FROM ({sql}) AS changed',
+                               [deleted, now, *params])
+            else:
+                cursor.executemany(f'{insert}VALUES (%s, %s, %s)', [(pk, deleted, now) for pk in pokemon])
+
+    def horizon(self):
+        """
+        The newest sequence number compaction dropped a tombstone at;
+        a client last synced before it may have missed deletions.
+        """
+        self._for_write = True
+        return PokemonChangeCompaction.objects.using(self.db).aggregate(
+            horizon=Max('horizon'))['horizon'] or 0
+
+    def compact(self, retention=None):
+        """
+        Drop every entry a later one for the same Pokémon supersedes, and
+        tombstones older than `retention` (a timedelta, by default
+        settings.POKEDATA_CHANGES_RETENTION days). The log then holds one
+        upsert per live Pokémon plus the recent deletions. Returns the
+        number of entries removed.
+        """
+        if retention is None:
+            retention = datetime.timedelta(days=getattr(settings, 'POKEDATA_CHANGES_RETENTION', 30))
+        self._for_write = True
+        with transaction.atomic(using=self.db):
+            latest = self.values('pokemon_id').annotate(latest=Max('seq')).values('latest')
+            removed, _ = self.exclude(seq__in=latest).delete()
+            expired = self.filter(deleted=True, changed_at__lt=timezone.now() - retention)
+            horizon = expired.aggregate(horizon=Max('seq'))['horizon']
+            if horizon is not None:
+                removed += expired.delete()[0]
+            PokemonChangeCompaction.objects.using(self.db).create(
+                horizon=horizon or 0, removed=removed)
+        # cached feed pages may predate the new horizon
+        bump_dataset_version()
+        return removed
+
+
+class PokemonChange(models.Model):
+    """
+    One entry of the change log: Pokémon `pokemon_id` was created or
+    updated, or with `deleted` removed, at sequence number `seq`. Every
+    Pokemon write path appends to it in the write's own transaction, so
+    clients can mirror the table by asking for what changed since the
+    last `seq` they saw (/api/pokemon/changes?since=).
+
+    `manage.py compact_changes` trims it (see PokemonChangeQuerySet.compact).
+    """
+    objects = PokemonChangeQuerySet.as_manager()
+
+    # AUTOINCREMENT on SQLite: never reused, even after compaction
+    seq = models.BigAutoField(primary_key=True)
+    pokemon_id = models.IntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['pokemon_id', 'seq'], name='pokemon_change_pokemon_idx'),
+        ]
+        verbose_name = 'Pokémon change'
+        verbose_name_plural = 'Pokémon changes'
+
+    def __str__(self):
+        return f'{self.seq} {"delete" if self.deleted else "upsert"} {self.pokemon_id}'
+
 
+class PokemonChangeCompaction(models.Model):
+    """A compaction of the change log, and the tombstones it gave up."""
+    compacted_at = models.DateTimeField(auto_now_add=True)
+    # the newest tombstone dropped, 0 for none
+    horizon = models.BigIntegerField()
+    removed = models.IntegerField()
@@ -0,0 +1,173 @@
+import base64
+import json
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .encoders import dumps
+from .models import MAX_DB_INT, Pokemon
+
+
+class KeysetPagination:
+    """
+    Opt-in cursor pagination over the queryset's ordering -- Pokemon's
+    default (generation, pokemon_name, id) unless the caller ordered it.
+
+    Pages are selected with a comparison against the last row of the
+    previous page, so SQLite walks the ordering index straight to the
+    right spot instead of counting past OFFSET rows:
+
+        ?limit=50                 → first page
+        ?limit=50&cursor=<next>   → following page
+        ?limit=50&cursor=<prev>   → page before
+
+    Requests without `limit` or `cursor` are left unpaginated. The ordering
+    must end in a unique field (`id`) for pages not to skip rows.
+    """
+    limit_query_param  = 'limit'
+    cursor_query_param = 'cursor'
+    default_limit      = 100
+    max_limit          = 1000
+    key_fields         = ('generation', 'pokemon_name', 'id')
+
+    def paginate_queryset(self, queryset, request):
+        params = request.query_params
+        if self.limit_query_param not in params and self.cursor_query_param not in params:
+            return None
+
+        self.request  = request
+        self.limit    = self.get_limit(request)
+        self.ordering = self.get_ordering(queryset)
+        # column names of values_list() rows, to read the cursor fields from
+        self.columns  = list(queryset._fields or ())
+        position, reverse = self.decode_cursor(request)
+
+        if position is not None:
+            queryset = queryset.filter(self._seek(position, reverse))
+        queryset = queryset.order_by(*[
+            ('-' if desc != reverse else '') + field for field, desc in self.ordering
+        ])
+
+        # fetch one extra row to learn whether another page exists
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+
+        self.page = rows
+        if reverse:
+            self.has_next = position is not None
+            self.has_prev = has_more
+        else:
+            self.has_next = has_more
+            self.has_prev = position is not None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next':    self.get_next_link(),
+            'prev':    self.get_prev_link(),
+            'results': data,
+        })
+
+    def get_paginated_json(self, results):
+        """
+        get_paginated_response()'s JSON body around `results`, a JSON array
+        already encoded (see PokemonRowEncoder).
+        """
+        links = dumps({'next': self.get_next_link(), 'prev': self.get_prev_link()})
+        return links[:-1] + ',"results":' + results + '}'
+
+    def get_ordering(self, queryset):
+        """[(field, descending), ...] the queryset is sorted by."""
+        ordering = queryset.query.order_by or self.key_fields
+        return [(f.lstrip('-'), f.startswith('-')) for f in ordering]
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        if limit < 1:
+            return self.default_limit
+        return min(limit, self.max_limit)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_prev_link(self):
+        if not self.has_prev or not self.page:
+            return None
+        return self._link(self.page[0], reverse=True)
+
+    def _link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        cursor = self.encode_cursor([self._value(obj, field) for field, _ in self.ordering], reverse)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _value(self, obj, field):
+        # rows are model instances, values() dicts or values_list() tuples
+        if isinstance(obj, dict):
+            return obj[field]
+        if isinstance(obj, tuple):
+            return obj[self.columns.index(field)]
+        return getattr(obj, field)
+
+    def encode_cursor(self, position, reverse):
+        raw = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            position = data['p']
+            reverse = bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('Invalid cursor')
+        # a cursor only makes sense for the ordering it was issued under,
+        # whose columns are all integers or strings
+        if not isinstance(position, list) or len(position) != len(self.ordering) or not all(
+            isinstance(v, str) or (type(v) is int and -MAX_DB_INT <= v <= MAX_DB_INT)
+            for v in position
+        ):
+            raise NotFound('Invalid cursor')
+        return position, reverse
+
+    def _seek(self, position, reverse):
+        """The rows strictly after `position` in (possibly reversed) order."""
+        directions = {desc != reverse for _, desc in self.ordering}
+        if len(directions) == 1:
+            # (a, b, id) > (%s, %s, %s) -- SQLite can use a row-value range
+            # directly on a composite index in that order.
+            table   = connection.ops.quote_name(Pokemon._meta.db_table)
+            columns = ', '.join(
+                f'{table}.{connection.ops.quote_name(Pokemon._meta.get_field(f).column)}'
+                for f, _ in self.ordering
+            )
+            op = '<' if directions.pop() else '>'
+            placeholders = ', '.join(['%s'] * len(position))
+            return RawSQL(
+                f'({columns}) {op} ({placeholders})',
+                position,
+                output_field=BooleanField(),
+            )
+
+        # mixed directions: a > x OR (a = x AND b < y) OR ...
+        seek, equal = Q(), {}
+        for (field, desc), value in zip(self.ordering, position):
+            lookup = 'lt' if desc != reverse else 'gt'
+            seek |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        return seek
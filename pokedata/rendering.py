@@ -0,0 +1,72 @@
+"""
+The Django template backend, with the time spent rendering templates
+measured per request ('BACKEND': 'pokedata.rendering.TimedDjangoTemplates').
+QueryInstrumentationMiddleware reports it as the `render` entry of the
+Server-Timing header, next to the time spent in SQL.
+"""
+import contextlib
+import contextvars
+import time
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+
+class RenderTimer:
+    """Time spent in top-level template renders; nested renders count once."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.count   = 0
+        self.depth   = 0
+
+
+# the RenderTimer of the request being served, if any
+_timer = contextvars.ContextVar('pokedata_render_timer', default=None)
+
+
+def start_timer():
+    """A RenderTimer for the current request; (timer, token to reset)."""
+    timer = RenderTimer()
+    return timer, _timer.set(timer)
+
+
+def stop_timer(token):
+    _timer.reset(token)
+
+
+@contextlib.contextmanager
+def timing():
+    """Count the block as template rendering, e.g. around Template.render() calls."""
+    timer = _timer.get()
+    if timer is None:
+        yield
+        return
+    timer.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.depth -= 1
+        if not timer.depth:
+            timer.seconds += time.perf_counter() - start
+            timer.count += 1
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        with timing():
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,30 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_ALIAS = 'replica'
+
+
+class ReadReplicaRouter:
+    """
+    Reads go to the read-only `replica` connection, everything else to
+    `default`, the one connection per process that writes (see
+    POKEDATA_DB_MODE in settings). Both are the same SQLite file; in WAL
+    mode readers never wait for the writer.
+
+    Reads inside a transaction stay on `default`, so they see the
+    transaction's own writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # one database under two connections
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,148 @@
+import bisect
+import heapq
+from collections import Counter
+
+from .cache import DatasetReplica
+from .models import Pokemon
+
+# fuzzy matching ignores trigrams shared by more names than this ("mon"),
+# they say little about similarity and would touch most of the table
+FUZZY_MAX_POSTINGS = 20000
+# how many fuzzy candidates get an exact similarity score
+FUZZY_CANDIDATES = 200
+# minimum trigram similarity (Jaccard) for a fuzzy match
+FUZZY_THRESHOLD = 0.3
+
+
+def normalize(text):
+    return ' '.join(text.casefold().split())
+
+
+def trigrams(text, padded=True):
+    """The set of 3-character windows, padded as '  name ' like pg_trgm."""
+    if padded:
+        text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex(DatasetReplica):
+    """
+    Autocomplete over pokemon_name, kept in memory:
+
+    * a sorted list of (name, id) answers prefix queries with bisect,
+    * a trigram → ids posting map answers substring queries (intersect the
+      query's trigrams, then verify) and typo-tolerant ones (rank names by
+      shared trigrams, then score by trigram similarity).
+
+    Patched row by row on Pokemon.save()/delete(), see DatasetReplica.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.names    = {}
+        self.sorted   = []
+        self.postings = {}
+
+    def load(self):
+        self.names, self.sorted, self.postings = {}, [], {}
+        for pk, name in Pokemon.objects.values_list('id', 'pokemon_name').iterator():
+            self._add(pk, name, keep_sorted=False)
+        self.sorted.sort()
+
+    def apply(self, saved, deleted):
+        for pk in deleted:
+            self._remove(pk)
+        for pokemon in saved:
+            self._remove(pokemon.pk)
+            self._add(pokemon.pk, pokemon.pokemon_name)
+
+    def _add(self, pk, name, keep_sorted=True):
+        key = normalize(name)
+        self.names[pk] = (name, key)
+        if keep_sorted:
+            bisect.insort(self.sorted, (key, pk))
+        else:
+            self.sorted.append((key, pk))
+        for gram in trigrams(key):
+            self.postings.setdefault(gram, set()).add(pk)
+
+    def _remove(self, pk):
+        entry = self.names.pop(pk, None)
+        if entry is None:
+            return
+        key = entry[1]
+        i = bisect.bisect_left(self.sorted, (key, pk))
+        if i < len(self.sorted) and self.sorted[i] == (key, pk):
+            del self.sorted[i]
+        for gram in trigrams(key):
+            ids = self.postings.get(gram)
+            if ids is not None:
+                ids.discard(pk)
+                if not ids:
+                    del self.postings[gram]
+
+    # -----------------------------------------------------------------------
+
+    def search(self, query, limit=10):
+        """
+        [(id, name, match)] for `query`, best first: prefix matches, then
+        substring matches, then fuzzy ones.
+        """
+        q = normalize(query)
+        if not q:
+            return []
+        with self.lock:
+            found = self._prefix(q, limit)
+            if len(found) < limit and len(q) >= 3:
+                found += self._substring(q, limit - len(found), found)
+            if len(found) < limit:
+                found += self._fuzzy(q, limit - len(found), found)
+            return [(pk, self.names[pk][0], match) for pk, match in found]
+
+    def _prefix(self, q, limit):
+        found = []
+        i = bisect.bisect_left(self.sorted, (q,))
+        while i < len(self.sorted) and len(found) < limit:
+            key, pk = self.sorted[i]
+            if not key.startswith(q):
+                break
+            found.append((pk, 'prefix'))
+            i += 1
+        return found
+
+    def _substring(self, q, limit, seen):
+        seen = {pk for pk, _ in seen}
+        lists = sorted((self.postings.get(g, set()) for g in trigrams(q, padded=False)), key=len)
+        if not lists or not lists[0]:
+            return []
+        candidates = lists[0].intersection(*lists[1:])
+        hits = []
+        for pk in candidates:
+            key = self.names[pk][1]
+            pos = key.find(q)
+            if pos >= 0 and pk not in seen:
+                hits.append((pos, len(key), key, pk))
+        return [(pk, 'substring') for *_, pk in heapq.nsmallest(limit, hits)]
+
+    def _fuzzy(self, q, limit, seen):
+        seen = {pk for pk, _ in seen}
+        grams = trigrams(q)
+        shared = Counter()
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids and len(ids) <= FUZZY_MAX_POSTINGS:
+                shared.update(ids)
+
+        scored = []
+        for pk, _ in shared.most_common(FUZZY_CANDIDATES):
+            if pk in seen:
+                continue
+            name_grams = trigrams(self.names[pk][1])
+            common = len(grams & name_grams)
+            score = common / (len(grams) + len(name_grams) - common)
+            if score >= FUZZY_THRESHOLD:
+                scored.append((-score, self.names[pk][1], pk))
+        return [(pk, 'fuzzy') for *_, pk in heapq.nsmallest(limit, scored)]
+
+
+name_index = NameIndex()
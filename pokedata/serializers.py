@@ -1,9 +1,74 @@
 from rest_framework import serializers
 from .models import *
 
+
+def is_pk(value):
+    """Whether `value`, parsed from JSON, is an id: an int, but not true/false."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class PokemonListSerializer(serializers.ListSerializer):
+    """
+    The many=True path used by the bulk endpoints.
+
+    For updates, pass `instance` as a {pk: Pokemon} dict (e.g. from
+    in_bulk()); each item is then validated against the row named by its
+    "id". Errors come back as a list aligned with the input items.
+    """
+    def to_internal_value(self, data):
+        if self.instance is None:
+            return super().to_internal_value(data)
+
+        if not isinstance(data, list):
+            raise serializers.ValidationError({
+                'non_field_errors': ['Expected a list of items.']
+            })
+
+        ret, errors, self._targets = [], [], []
+        for item in data:
+            pk = item.get('id') if isinstance(item, dict) else None
+            pokemon = self.instance.get(pk) if is_pk(pk) else None
+            if pokemon is None:
+                errors.append({'id': ['No Pokémon with this id.']})
+                continue
+            self.child.instance = pokemon
+            try:
+                validated = self.child.run_validation(item)
+            except serializers.ValidationError as exc:
+                errors.append(exc.detail)
+            else:
+                ret.append(validated)
+                self._targets.append(pokemon)
+                errors.append({})
+            finally:
+                self.child.instance = None
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return ret
+
+    def update(self, instance, validated_data):
+        # _targets lines up with validated_data, see to_internal_value()
+        return [
+            self.child.update(pokemon, attrs)
+            for pokemon, attrs in zip(self._targets, validated_data)
+        ]
+
+
 class PokemonSerializer(serializers.ModelSerializer):
+    """
+    Pass `fields=` (e.g. from parse_fieldset()) to render only those
+    fields; the instance may then be a values() dict holding just them.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     class Meta:
         model  = Pokemon
+        list_serializer_class = PokemonListSerializer
         fields = [
             "id",
             "pokemon_name",
@@ -29,3 +94,22 @@ class PokemonSerializer(serializers.ModelSerializer):
             'total_stats':     {'min_value': 1},
         }
 
+
+
+def parse_fieldset(params):
+    """
+    ?fields=id,pokemon_name (or ?exclude=total_stats,legendary) as the
+    tuple of PokemonSerializer fields to render, in the usual order; None
+    when neither was given.
+    """
+    all_fields = PokemonSerializer.Meta.fields
+    for param in ('fields', 'exclude'):
+        if param in params:
+            names = [f.strip() for f in params[param].split(',') if f.strip()]
+            unknown = [f for f in names if f not in all_fields]
+            if unknown or not names:
+                raise serializers.ValidationError({param: [f'Must be from {", ".join(all_fields)}.']})
+            if param == 'fields':
+                return tuple(f for f in all_fields if f in names)
+            return tuple(f for f in all_fields if f not in names)
+    return None
@@ -0,0 +1,191 @@
+import numpy as np
+from scipy.spatial import cKDTree
+
+from .cache import DatasetReplica
+from .models import Pokemon, PokemonType
+
+# the six base stats the distance is measured over
+VECTOR_FIELDS = (
+    'pokemon_HP',
+    'attack',
+    'defense',
+    'special_attack',
+    'special_defense',
+    'speed',
+)
+TYPES = list(PokemonType.values)
+# writes collect in a small side buffer; past this many (or this fraction
+# of the table) the tree is rebuilt from memory with them folded in
+COMPACT_MIN      = 1024
+COMPACT_FRACTION = 0.05
+
+
+class SimilarIndex(DatasetReplica):
+    """
+    KD-tree over every Pokémon's six-stat vector for nearest-neighbour
+    queries.
+
+    The tree itself is immutable, so writes patch around it: a saved row
+    is tombstoned in the tree and kept in `delta`, which queries scan by
+    brute force; a deleted row is just tombstoned. Once the side buffer
+    grows past COMPACT_MIN / COMPACT_FRACTION the tree is rebuilt from
+    memory, without going back to the database.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._build(np.empty(0, dtype=np.int64), np.empty((0, len(VECTOR_FIELDS))),
+                    np.empty((0, 4), dtype=np.int16))
+
+    def load(self):
+        rows = list(Pokemon.objects.order_by().values_list(
+            'id', *VECTOR_FIELDS, 'pokemon_type1', 'pokemon_type2', 'generation', 'legendary',
+        ))
+        columns = list(zip(*rows)) if rows else [()] * (len(VECTOR_FIELDS) + 5)
+        codes = {t: i for i, t in enumerate(TYPES)}
+        self._build(
+            np.array(columns[0], dtype=np.int64),
+            np.array(columns[1:7], dtype=np.float64).T.reshape(len(rows), len(VECTOR_FIELDS)),
+            np.array([
+                [codes.get(t, -1) for t in columns[7]],
+                [codes.get(t, -1) for t in columns[8]],
+                columns[9],
+                columns[10],
+            ], dtype=np.int16).T.reshape(len(rows), 4),
+        )
+
+    def _build(self, ids, points, attrs):
+        self.ids    = ids
+        self.points = points
+        # per row: type1 code, type2 code (-1 for none), generation, legendary
+        self.attrs  = attrs
+        self.tree   = cKDTree(points) if len(points) else None
+        self.row_of = {pk: i for i, pk in enumerate(ids.tolist())}
+        self.dead   = np.zeros(len(ids), dtype=bool)
+        self.ndead  = 0
+        self.delta  = {}
+        self._stacked = None
+
+    def apply(self, saved, deleted):
+        self._stacked = None
+        for pk in deleted:
+            self._kill(pk)
+            self.delta.pop(pk, None)
+        for pokemon in saved:
+            self._kill(pokemon.pk)
+            self.delta[pokemon.pk] = (
+                np.array([getattr(pokemon, f) for f in VECTOR_FIELDS], dtype=np.float64),
+                np.array(_attrs(pokemon.pokemon_type1, pokemon.pokemon_type2,
+                                pokemon.generation, pokemon.legendary), dtype=np.int16),
+            )
+        if self.ndead + len(self.delta) > max(COMPACT_MIN, COMPACT_FRACTION * len(self.ids)):
+            self.compact()
+
+    def _kill(self, pk):
+        row = self.row_of.get(pk)
+        if row is not None and not self.dead[row]:
+            self.dead[row] = True
+            self.ndead += 1
+
+    def compact(self):
+        """Rebuild the tree from the live rows plus the side buffer."""
+        live = ~self.dead
+        extra = list(self.delta.items())
+        self._build(
+            np.concatenate([self.ids[live], np.array([pk for pk, _ in extra], dtype=np.int64)]),
+            np.vstack([self.points[live], *[v for _, (v, _) in extra]]),
+            np.vstack([self.attrs[live], *[a for _, (_, a) in extra]]),
+        )
+
+    # -----------------------------------------------------------------------
+
+    def vector(self, pk):
+        """(stat vector, attrs) of a live row, or None."""
+        if pk in self.delta:
+            return self.delta[pk]
+        row = self.row_of.get(pk)
+        if row is None or self.dead[row]:
+            return None
+        return self.points[row], self.attrs[row]
+
+    def similar(self, pk, k=10, generation=None, type=None, legendary=None):
+        """
+        [(id, distance)] of the k rows nearest to `pk`'s stats (itself
+        excluded) that pass the filters, nearest first; None if `pk` is
+        not in the table.
+        """
+        with self.lock:
+            found = self.vector(pk)
+            if found is None:
+                return None
+            point = found[0]
+
+            def keep(attrs):
+                ok = np.ones(len(attrs), dtype=bool)
+                if generation is not None:
+                    ok &= attrs[:, 2] == generation
+                if type is not None:
+                    code = TYPES.index(type)
+                    ok &= (attrs[:, 0] == code) | (attrs[:, 1] == code)
+                if legendary is not None:
+                    ok &= attrs[:, 3] == legendary
+                return ok
+
+            hits = self._from_tree(point, k + 1, keep) + self._from_delta(point, k + 1, keep)
+            hits = [(d, other) for d, other in hits if other != pk]
+            hits.sort()
+            return [(other, d) for d, other in hits[:k]]
+
+    def _from_tree(self, point, k, keep):
+        """
+        The k nearest live, matching tree rows. The search widens while
+        tombstones and filters reject candidates; once it would cover a
+        large part of the table, one vectorized scan of the matching rows
+        is cheaper.
+        """
+        if self.tree is None:
+            return []
+        n = len(self.ids)
+        fetch = min(n, 4 * k + self.ndead)
+        while fetch < n // 8:
+            dist, rows = self.tree.query(point, k=fetch)
+            ok = ~self.dead[rows] & keep(self.attrs[rows])
+            if ok.sum() >= k:
+                return list(zip(dist[ok][:k].tolist(), self.ids[rows[ok][:k]].tolist()))
+            fetch *= 4
+
+        rows = np.flatnonzero(~self.dead & keep(self.attrs))
+        dist = np.sqrt(((self.points[rows] - point) ** 2).sum(axis=1))
+        if len(rows) > k:
+            best = np.argpartition(dist, k)[:k]
+            rows, dist = rows[best], dist[best]
+        return list(zip(dist.tolist(), self.ids[rows].tolist()))
+
+    def _from_delta(self, point, k, keep):
+        if not self.delta:
+            return []
+        if self._stacked is None:
+            pks = list(self.delta)
+            self._stacked = (
+                pks,
+                np.vstack([self.delta[pk][0] for pk in pks]),
+                np.vstack([self.delta[pk][1] for pk in pks]),
+            )
+        pks, points, attrs = self._stacked
+        dist = np.sqrt(((points - point) ** 2).sum(axis=1))
+        ok = np.flatnonzero(keep(attrs))
+        if len(ok) > k:
+            ok = ok[np.argpartition(dist[ok], k)[:k]]
+        return [(float(dist[i]), pks[i]) for i in ok]
+
+
+def _attrs(type1, type2, generation, legendary):
+    return (
+        TYPES.index(type1) if type1 in TYPES else -1,
+        TYPES.index(type2) if type2 in TYPES else -1,
+        generation,
+        int(bool(legendary)),
+    )
+
+
+similar_index = SimilarIndex()
@@ -0,0 +1,30 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The SQLite backend, for several worker processes sharing one file
+    (ENGINE 'pokedata.sqlite'). Extra OPTIONS:
+
+    * pragmas: {name: value} set on every new connection, e.g.
+      journal_mode, synchronous, mmap_size, cache_size;
+    * immediate: start transactions with BEGIN IMMEDIATE. A transaction
+      that reads before it writes then takes the write lock up front,
+      waiting up to `timeout` for it, instead of failing with "database
+      is locked" when another process committed in between.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas   = params.pop('pragmas', {})
+        self.immediate = params.pop('immediate', False)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE' if self.immediate else 'BEGIN')
@@ -0,0 +1,215 @@
+import math
+import threading
+
+import numpy as np
+from rest_framework.exceptions import ValidationError
+
+from .cache import dataset_version
+from .models import Pokemon, PokemonType
+
+# columns held in the snapshot, in this order
+STAT_FIELDS = (
+    'pokemon_HP',
+    'attack',
+    'defense',
+    'special_attack',
+    'special_defense',
+    'speed',
+    'total_stats',
+)
+TYPES = list(PokemonType.values)
+GROUPS = ('generation', 'type1', 'type', 'legendary')
+
+
+class StatsSnapshot:
+    """
+    The Pokemon table as NumPy columns, for vectorized analytics.
+
+    `stats` is an (n, 7) int32 matrix in STAT_FIELDS order; `type1` and
+    `type2` hold indexes into TYPES (-1 for no secondary type).
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        n = len(rows)
+        columns = list(zip(*rows)) if rows else [()] * (len(STAT_FIELDS) + 6)
+        self.ids        = np.array(columns[0], dtype=np.int64)
+        self.names      = list(columns[1])
+        self.stats      = np.array(columns[2:9], dtype=np.int32).T.reshape(n, len(STAT_FIELDS))
+        codes = {t: i for i, t in enumerate(TYPES)}
+        self.type1      = np.array([codes.get(t, -1) for t in columns[9]], dtype=np.int8)
+        self.type2      = np.array([codes.get(t, -1) for t in columns[10]], dtype=np.int8)
+        self.generation = np.array(columns[11], dtype=np.int8)
+        self.legendary  = np.array(columns[12], dtype=bool)
+        self._row_of    = {pk: i for i, pk in enumerate(columns[0])}
+
+    @classmethod
+    def load(cls, version):
+        rows = list(
+            Pokemon.objects.order_by('id').values_list(
+                'id', 'pokemon_name', *STAT_FIELDS,
+                'pokemon_type1', 'pokemon_type2', 'generation', 'legendary',
+            )
+        )
+        return cls(version, rows)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row_of(self, pk):
+        return self._row_of.get(pk)
+
+    def column(self, stat):
+        return self.stats[:, STAT_FIELDS.index(stat)]
+
+    def mask(self, generation=None, type=None, legendary=None):
+        """Boolean row mask for the usual list filters."""
+        keep = np.ones(len(self), dtype=bool)
+        if generation is not None:
+            keep &= self.generation == generation
+        if type is not None:
+            code = TYPES.index(type)
+            keep &= (self.type1 == code) | (self.type2 == code)
+        if legendary is not None:
+            keep &= self.legendary == legendary
+        return keep
+
+    def group_codes(self, group_by):
+        """
+        ([code arrays], labels): each array maps rows to a group index
+        (-1 for none). Grouping by `type` counts a row under both of its
+        types, hence two arrays.
+        """
+        if group_by == 'generation':
+            labels = sorted(int(g) for g in np.unique(self.generation))
+            lookup = np.full(max(labels, default=0) + 1, -1, dtype=np.int64)
+            lookup[labels] = np.arange(len(labels))
+            return [lookup[self.generation]], labels
+        if group_by == 'legendary':
+            return [self.legendary.astype(np.int64)], [False, True]
+        if group_by == 'type1':
+            return [self.type1.astype(np.int64)], TYPES
+        return [self.type1.astype(np.int64), self.type2.astype(np.int64)], TYPES
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def get_snapshot():
+    """
+    The snapshot for the current dataset version, reloaded from the
+    database the first time it is needed after a write.
+    """
+    global _snapshot
+    version = dataset_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = StatsSnapshot.load(version)
+        return _snapshot
+
+
+# ---------------------------------------------------------------------------
+# Query-string parsing shared by the analytics endpoints
+# ---------------------------------------------------------------------------
+
+def parse_stat(params, name='stat', default=None):
+    stat = params.get(name, default)
+    if stat not in STAT_FIELDS:
+        raise ValidationError({name: [f'Must be one of {", ".join(STAT_FIELDS)}.']})
+    return stat
+
+
+def parse_weights(params):
+    """
+    ?weights=attack:1,special_attack:1,speed:0.5 → a 7-vector over
+    STAT_FIELDS, or None when no formula was given.
+    """
+    raw = params.get('weights')
+    if not raw:
+        return None
+    weights = np.zeros(len(STAT_FIELDS))
+    for term in raw.split(','):
+        stat, _, weight = term.partition(':')
+        if stat not in STAT_FIELDS:
+            raise ValidationError({'weights': [f'Unknown stat "{stat}".']})
+        try:
+            value = float(weight or 1)
+        except ValueError:
+            value = math.nan
+        # nan / inf would turn every score into one JSON cannot hold
+        if not math.isfinite(value):
+            raise ValidationError({'weights': [f'Bad weight for "{stat}".']})
+        weights[STAT_FIELDS.index(stat)] = value
+    return weights
+
+
+# ---------------------------------------------------------------------------
+# Analytics
+# ---------------------------------------------------------------------------
+
+def percentiles(snapshot, stat, qs, keep):
+    values = snapshot.column(stat)[keep]
+    if not len(values):
+        return {}
+    return {str(q): float(v) for q, v in zip(qs, np.percentile(values, qs))}
+
+
+def summary(snapshot, group_by, keep):
+    """count, mean and standard deviation of every stat, per group."""
+    passes, labels = snapshot.group_codes(group_by)
+    size = len(labels)
+    counts = np.zeros(size)
+    sums   = np.zeros((size, len(STAT_FIELDS)))
+    sumsq  = np.zeros((size, len(STAT_FIELDS)))
+    # one bincount per stat instead of a boolean mask per group
+    for codes in passes:
+        rows  = keep & (codes >= 0)
+        c     = codes[rows]
+        block = snapshot.stats[rows].astype(np.float64)
+        counts += np.bincount(c, minlength=size)
+        for j in range(len(STAT_FIELDS)):
+            sums[:, j]  += np.bincount(c, weights=block[:, j], minlength=size)
+            sumsq[:, j] += np.bincount(c, weights=block[:, j] ** 2, minlength=size)
+
+    result = []
+    for g, label in enumerate(labels):
+        if not counts[g]:
+            continue
+        means = sums[g] / counts[g]
+        stds  = np.sqrt(np.maximum(sumsq[g] / counts[g] - means ** 2, 0))
+        result.append({
+            group_by: label,
+            'count': int(counts[g]),
+            'mean':  dict(zip(STAT_FIELDS, np.round(means, 3).tolist())),
+            'std':   dict(zip(STAT_FIELDS, np.round(stds, 3).tolist())),
+        })
+    return result
+
+
+def zscores(snapshot, row, keep):
+    """z-score of one row's stats against the rows in `keep`; None for none."""
+    if not keep.any():
+        return dict.fromkeys(STAT_FIELDS)
+    block = snapshot.stats[keep]
+    means = block.mean(axis=0)
+    stds  = block.std(axis=0)
+    stds[stds == 0] = 1
+    scores = (snapshot.stats[row] - means) / stds
+    return dict(zip(STAT_FIELDS, np.round(scores, 4).tolist()))
+
+
+def top(snapshot, score, n, keep):
+    """The n highest-scoring rows in `keep`, as (row, score) pairs."""
+    candidates = np.flatnonzero(keep)
+    if not len(candidates):
+        return []
+    scores = score[candidates]
+    n = min(n, len(candidates))
+    # argpartition is O(rows); only the n winners get sorted
+    best = np.argpartition(-scores, n - 1)[:n]
+    best = best[np.argsort(-scores[best], kind='stable')]
+    return [(int(candidates[i]), float(scores[i])) for i in best]
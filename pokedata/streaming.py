@@ -0,0 +1,233 @@
+import csv
+import io
+import itertools
+import zlib
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from rest_framework import serializers
+from rest_framework.renderers import BaseRenderer
+
+from .cache import accepted_coding
+from .encoders import dumps, js_safe, row_encoder
+from .serializers import PokemonSerializer
+
+NDJSON   = 'application/x-ndjson'
+CSV      = 'text/csv'
+COLUMNAR = 'application/vnd.pokedata.columnar+ndjson'
+
+# rows pulled from the database cursor per fetch / written per chunk
+CHUNK_SIZE = 2000
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, one object per line. Lets clients send
+    `Accept: application/x-ndjson`; list endpoints stream it, anything
+    else (a single object, an error) is rendered as a single line.
+    """
+    media_type = NDJSON
+    format     = 'ndjson'
+    charset    = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        return ''.join(dumps(row) + '\n' for row in data).encode('utf-8')
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV with a header row. Exports stream it (see export_response);
+    anything else (an error) is rendered as a small table of its keys.
+    """
+    media_type = CSV
+    format     = 'csv'
+    charset    = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        out = io.StringIO()
+        writer = csv.DictWriter(out, list(dict.fromkeys(key for row in data for key in row)))
+        writer.writeheader()
+        writer.writerows(data)
+        return out.getvalue().encode('utf-8')
+
+
+class ColumnarRenderer(BaseRenderer):
+    """
+    Column-oriented JSON lines, laid out like Parquet without its binary
+    encoding: a schema line, then one line per row group of up to
+    CHUNK_SIZE rows, holding each column's values as one array:
+
+        {"schema":[{"name":"id","type":"integer"},...]}
+        {"rows":2000,"columns":[[1,2,...],["Bulbasaur","Ivysaur",...],...]}
+
+    Exports stream it; anything else (an error) is rendered as one row group.
+    """
+    media_type = COLUMNAR
+    format     = 'columnar'
+    charset    = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, list):
+            data = [data]
+        fields = list(dict.fromkeys(key for row in data for key in row))
+        rows = [[row.get(field) for field in fields] for row in data]
+        return b''.join(_row_groups(fields, [rows], ['string'] * len(fields)))
+
+
+def _is_ndjson(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return isinstance(renderer, NDJSONRenderer)
+
+
+def wants_stream(request):
+    """
+    True when the client asked for a streamed list, either with
+    ?stream=1 or by accepting NDJSON.
+    """
+    if request.query_params.get('stream') in ('1', 'true'):
+        return True
+    return _is_ndjson(request)
+
+
+def _rows(qs, encoder):
+    for row in qs.iterator(chunk_size=CHUNK_SIZE):
+        yield encoder.encode(row)
+
+
+def _json_array(qs, encoder):
+    # the same bytes as the buffered list (see api._list_response)
+    buf, sep = ['['], ''
+    for i, row in enumerate(_rows(qs, encoder), 1):
+        buf.append(sep + row)
+        sep = ','
+        if i % CHUNK_SIZE == 0:
+            yield js_safe(''.join(buf)).encode('utf-8')
+            buf = []
+    buf.append(']')
+    yield js_safe(''.join(buf)).encode('utf-8')
+
+
+def _ndjson(qs, encoder):
+    buf = []
+    for i, row in enumerate(_rows(qs, encoder), 1):
+        buf.append(row + '\n')
+        if i % CHUNK_SIZE == 0:
+            yield ''.join(buf).encode('utf-8')
+            buf = []
+    if buf:
+        yield ''.join(buf).encode('utf-8')
+
+
+def stream_response(request, qs, encoder):
+    """
+    Stream `qs`, a values_list() queryset of `encoder.fields`, as a JSON
+    array (or NDJSON when the client accepts it) with constant memory:
+    rows are read through a chunked iterator and written out as they are
+    encoded.
+    """
+    if _is_ndjson(request):
+        return StreamingHttpResponse(_ndjson(qs, encoder), content_type=NDJSON)
+    return StreamingHttpResponse(_json_array(qs, encoder), content_type='application/json')
+
+
+# ---------------------------------------------------------------------------
+# Exports: values_list() rows of `fields`, written chunk by chunk
+# ---------------------------------------------------------------------------
+
+def _chunks(qs):
+    rows = qs.iterator(chunk_size=CHUNK_SIZE)
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv(qs, fields):
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(fields)
+    for chunk in _chunks(qs):
+        writer.writerows(chunk)
+        yield out.getvalue().encode('utf-8')
+        out.seek(0)
+        out.truncate()
+    if out.tell():
+        yield out.getvalue().encode('utf-8')
+
+
+def _column_type(field):
+    if isinstance(field, serializers.BooleanField):
+        return 'boolean'
+    if isinstance(field, serializers.IntegerField):
+        return 'integer'
+    return 'string'
+
+
+def _row_groups(fields, chunks, types):
+    schema = [{'name': name, 'type': kind} for name, kind in zip(fields, types)]
+    yield (dumps({'schema': schema}) + '\n').encode('utf-8')
+    for chunk in chunks:
+        columns = [list(column) for column in zip(*chunk)]
+        yield (dumps({'rows': len(chunk), 'columns': columns}) + '\n').encode('utf-8')
+
+
+def _columnar(qs, fields):
+    serializer_fields = PokemonSerializer(fields=fields).fields
+    types = [_column_type(serializer_fields[name]) for name in fields]
+    return _row_groups(fields, _chunks(qs), types)
+
+
+def _ndjson_rows(qs, fields):
+    return _ndjson(qs, row_encoder(fields))
+
+
+# renderer format → (writer, file extension)
+EXPORTS = {
+    'csv':      (_csv,         'csv'),
+    'ndjson':   (_ndjson_rows, 'ndjson'),
+    'columnar': (_columnar,    'columnar.ndjson'),
+}
+
+
+def _gzipped(chunks, level=6):
+    # wbits 31: a gzip container around the deflate stream
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(request, qs, fields):
+    """
+    Stream `qs`, a values_list() queryset of `fields`, as a download in
+    the format of the accepted renderer (CSVRenderer, NDJSONRenderer or
+    ColumnarRenderer), gzipped on the fly when the client accepts it.
+    Rows are read through a chunked iterator and each chunk is written
+    out before the next is fetched, so memory stays flat (under ASGI
+    too, see asyncviews.ASGIHandler).
+    """
+    renderer = request.accepted_renderer
+    writer, extension = EXPORTS[renderer.format]
+    chunks = writer(qs, fields)
+    gzipped = accepted_coding(request, ('gzip',)) is not None
+    if gzipped:
+        chunks = _gzipped(chunks)
+    response = StreamingHttpResponse(chunks, content_type=f'{renderer.media_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="pokemon.{extension}"'
+    if gzipped:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
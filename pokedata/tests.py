@@ -1,19 +1,45 @@
+import csv
+import datetime
+import gzip
 import io
 import json
 import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+from unittest import mock, skipUnless
 
+from asgiref.sync import async_to_sync
 from django.urls import reverse
 from django.core.management import call_command
-from django.test import TestCase
+from django.db import OperationalError, connection, transaction
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django import forms
 
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
 
-from .models import Pokemon
+from . import asyncviews, checks, warmup
+from .cache import (
+    brotli, cache_stats, dataset_version, get_cache, http_validators, single_version_bump,
+)
+from .filecache import FileBasedCache
+from .models import Pokemon, PokemonChange, PokemonSummary
+from .search import name_index
 from .serializers import PokemonSerializer
+from .similar import similar_index
+from . import typechart
 from .forms import PokemonForm
 from .model_factories import PokemonFactory
+from .pagination import KeysetPagination
+from .routers import ReadReplicaRouter
+from .views import row_fragments
+from .sqlite.base import DatabaseWrapper as TunedSQLiteWrapper
 
 from django.urls import reverse
 from rest_framework import status
@@ -388,4 +414,1520 @@ class PokemonForm(forms.ModelForm):
             raise forms.ValidationError(
                 f"Total stats must be the sum of the six stats ({expected})."
             )
-        return total
\ No newline at end of file
+        return total
+
+
+class PokemonKeysetPaginationTest(APITestCase):
+    def setUp(self):
+        # Same generation for all so the name (and id) decides the order
+        for name in ["Eevee", "Abra", "Diglett", "Bulbasaur", "Caterpie"]:
+            PokemonFactory.create(pokemon_name=name, generation=1)
+        self.url = reverse('api_pokemon-list-api')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_unpaginated_by_default(self):
+        data = self.client.get(self.url, format='json').json()
+        self.assertIsInstance(data, list)
+        self.assertEqual(len(data), 5)
+
+    def test_walks_all_pages_in_order(self):
+        names = []
+        url = self.url + '?limit=2'
+        while url:
+            response = self.client.get(url, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertLessEqual(len(data['results']), 2)
+            names += [p['pokemon_name'] for p in data['results']]
+            url = data['next']
+        self.assertEqual(names, ["Abra", "Bulbasaur", "Caterpie", "Diglett", "Eevee"])
+
+    def test_prev_cursor_returns_previous_page(self):
+        first  = self.client.get(self.url + '?limit=2', format='json').json()
+        self.assertIsNone(first['prev'])
+        second = self.client.get(first['next'], format='json').json()
+        back   = self.client.get(second['prev'], format='json').json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url + '?cursor=garbage', format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        paginator = KeysetPagination()
+        for position in ['abc', [1, 'Abra', 2**63], [1, 'Abra', -2**63 - 1], [True, 'Abra', 1], None]:
+            cursor = paginator.encode_cursor(position, False)
+            response = self.client.get(self.url, {'cursor': cursor}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class PokemonStreamingTest(APITestCase):
+    def setUp(self):
+        PokemonFactory.create_batch(5)
+        self.url = reverse('api_pokemon-list-api')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_stream_matches_buffered_list(self):
+        buffered = self.client.get(self.url, format='json').json()
+        response = self.client.get(self.url + '?stream=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(streamed, buffered)
+
+    def test_stream_is_the_same_bytes(self):
+        PokemonFactory.create(pokemon_name='Line\u2028Paragraph\u2029')
+        with mock.patch('pokedata.streaming.CHUNK_SIZE', 2):
+            streamed = b''.join(self.client.get(self.url + '?stream=1').streaming_content)
+        self.assertIn(b'\\u2028', streamed)
+        self.assertEqual(streamed, self.client.get(self.url + '?nocache=1', format='json').content)
+
+    def test_ndjson_one_object_per_line(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual({json.loads(l)['id'] for l in lines},
+                         set(Pokemon.objects.values_list('id', flat=True)))
+
+    def test_stream_rejects_pagination(self):
+        for params, accept in [('?stream=1&limit=2', None), ('?stream=1&cursor=x', None),
+                               ('?limit=2', 'application/x-ndjson')]:
+            headers = {'HTTP_ACCEPT': accept} if accept else {}
+            response = self.client.get(self.url + params, **headers)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('stream', json.loads(response.content))
+
+    def test_stream_empty_list(self):
+        Pokemon.objects.filter(legendary=True).delete()
+        response = self.client.get(reverse('api_pokemon_legendary') + '?stream=1')
+        self.assertEqual(json.loads(b''.join(response.streaming_content)), [])
+
+class PokemonExportTest(APITestCase):
+    def setUp(self):
+        self.pokemons = PokemonFactory.create_batch(5, generation=1)
+        PokemonFactory.create(pokemon_name="Legend", generation=2, legendary=True, pokemon_type2=None)
+        self.url = reverse('api_pokemon-export')
+        self.rows = PokemonSerializer(Pokemon.objects.order_by('pk'), many=True).data
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def export(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response, body = self.export(format='csv')
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('filename="pokemon.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body.decode('utf-8'))))
+        self.assertEqual([int(row['id']) for row in rows], [row['id'] for row in self.rows])
+        self.assertEqual(rows[-1]['pokemon_name'], "Legend")
+        self.assertEqual(rows[-1]['legendary'], 'True')
+        self.assertEqual(rows[-1]['pokemon_type2'], '')
+
+    def test_csv_is_the_default(self):
+        response, _ = self.export()
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+
+    def test_ndjson(self):
+        _, body = self.export(format='ndjson')
+        self.assertEqual([json.loads(line) for line in body.decode('utf-8').splitlines()], self.rows)
+
+    def test_columnar(self):
+        _, body = self.export(format='columnar')
+        schema, *groups = [json.loads(line) for line in body.decode('utf-8').splitlines()]
+        names = [column['name'] for column in schema['schema']]
+        self.assertEqual(names, PokemonSerializer.Meta.fields)
+        self.assertEqual(schema['schema'][names.index('legendary')]['type'], 'boolean')
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]['rows'], len(self.rows))
+        rebuilt = [dict(zip(names, values)) for values in zip(*groups[0]['columns'])]
+        self.assertEqual(rebuilt, self.rows)
+
+    def test_row_groups_follow_the_chunk_size(self):
+        with mock.patch('pokedata.streaming.CHUNK_SIZE', 2):
+            _, body = self.export(format='columnar')
+        groups = [json.loads(line) for line in body.decode('utf-8').splitlines()[1:]]
+        self.assertEqual([group['rows'] for group in groups], [2, 2, 2])
+
+    def test_filters_ordering_and_fields(self):
+        _, body = self.export(format='ndjson', generation=2, fields='id,pokemon_name')
+        self.assertEqual(json.loads(body), {'id': self.rows[-1]['id'], 'pokemon_name': "Legend"})
+        _, body = self.export(format='csv', ordering='-id', fields='id')
+        self.assertEqual(body.decode('utf-8').split(), ['id'] + [str(row['id']) for row in reversed(self.rows)])
+
+    def test_gzip_on_the_fly(self):
+        plain = self.export(format='csv')[1]
+        response = self.client.get(self.url, {'format': 'csv'}, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_bad_params(self):
+        response = self.client.get(self.url, {'format': 'csv', 'generation': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class PokemonQueryPlanTest(TestCase):
+    """
+    Every SELECT an endpoint issues against the Pokemon table must be
+    answered through an index: a bare `SCAN pokedata_pokemon` (no index)
+    means a full table scan.
+    """
+    urls = [
+        '/api/pokemon/',
+        '/api/pokemon/?limit=2',
+        '/api/pokemon/gen/1/',
+        '/api/pokemon/legendary/',
+        '/api/pokemon/type/fire/',
+        '/api/pokemon/type/Fire/water/',
+        '/api/pokemon/?speed__gt=100&ordering=-total_stats&limit=10',
+        '/pokemon/?type=fire&generation=1',
+        '/pokemon/gen/1/',
+        '/pokemon/legendary/',
+        '/pokemon/type/Fire/',
+        '/pokemon/type/Fire/Water',
+    ]
+
+    def setUp(self):
+        PokemonFactory.create(pokemon_type1='Fire', pokemon_type2='Water', generation=1)
+        PokemonFactory.create(pokemon_type1='Water', pokemon_type2=None, legendary=True)
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def plans(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        table = Pokemon._meta.db_table
+        for query in ctx.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or table not in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                yield sql, [row[-1] for row in cursor.fetchall()]
+
+    def test_no_full_table_scans(self):
+        table = Pokemon._meta.db_table
+        for url in self.urls:
+            for sql, plan in self.plans(url):
+                for step in plan:
+                    with self.subTest(url=url, step=step):
+                        self.assertFalse(
+                            step.startswith(f'SCAN {table}') and 'INDEX' not in step,
+                            f'{url} does a full scan:\n{sql}\n{plan}',
+                        )
+
+    def test_filtered_endpoints_search_an_index(self):
+        # filtered lists must seek into an index (or walk a partial one),
+        # never read every row of the ordering index
+        table = Pokemon._meta.db_table
+        partial = [i.name for i in Pokemon._meta.indexes if i.condition is not None]
+        for url in self.urls[2:6]:
+            for sql, plan in self.plans(url):
+                with self.subTest(url=url):
+                    self.assertTrue(
+                        any(step.startswith(f'SEARCH {table}')
+                            or any(name in step for name in partial) for step in plan),
+                        f'{url}:\n{sql}\n{plan}',
+                    )
+
+    def test_types_stored_in_canonical_case(self):
+        p = PokemonFactory.create(pokemon_type1='fire', pokemon_type2='')
+        p.refresh_from_db()
+        self.assertEqual(p.pokemon_type1, 'Fire')
+        self.assertIsNone(p.pokemon_type2)
+
+class PokemonResponseCacheTest(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.p1 = PokemonFactory.create(pokemon_name="Cached", generation=1)
+        self.url = reverse('api_pokemon-list-api')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    @override_settings(ALLOWED_HOSTS=['one.example', 'two.example'])
+    def test_links_follow_the_host(self):
+        PokemonFactory.create(generation=1)
+        for host, secure in [('one.example', False), ('two.example', False), ('two.example', True)]:
+            response = self.client.get(self.url + '?limit=1', format='json', HTTP_HOST=host, secure=secure)
+            scheme = 'https' if secure else 'http'
+            self.assertTrue(response.json()['next'].startswith(f'{scheme}://{host}/'))
+
+    def test_second_get_is_a_hit(self):
+        before = cache_stats()
+        first  = self.client.get(self.url, format='json')
+        second = self.client.get(self.url, format='json')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+        after = cache_stats()
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+
+    def test_params_are_part_of_the_key(self):
+        self.client.get(self.url + '?limit=1&stream=0', format='json')
+        response = self.client.get(self.url + '?stream=0&limit=1', format='json')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = self.client.get(self.url + '?limit=2', format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_save_invalidates(self):
+        self.client.get(self.url, format='json')
+        PokemonFactory.create(pokemon_name="Fresh")
+        response = self.client.get(self.url, format='json')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 2)
+
+    def test_delete_and_bulk_update_invalidate(self):
+        detail = reverse('api_pokemon-detail-api', kwargs={'pk': self.p1.pk})
+        self.client.get(detail, format='json')
+        Pokemon.objects.filter(pk=self.p1.pk).update(pokemon_name="Renamed")
+        self.assertEqual(self.client.get(detail, format='json').json()['pokemon_name'], "Renamed")
+        self.client.delete(detail, format='json')
+        self.assertEqual(self.client.get(detail, format='json').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+@override_settings(POKEDATA_HTTP_VALIDATORS=True)
+class PokemonConditionalRequestTest(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        PokemonFactory.create_batch(10, generation=1)
+        self.url = reverse('api_pokemon-list-api')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_validators_are_set(self):
+        response = self.client.get(self.url, format='json')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(self.client.get(self.url, format='json')['ETag'], response['ETag'])
+
+    @override_settings(POKEDATA_HTTP_MAX_AGE=30)
+    def test_max_age(self):
+        self.assertEqual(self.client.get(self.url, format='json')['Cache-Control'], 'public, max-age=30')
+
+    def test_if_none_match_is_not_modified(self):
+        etag = self.client.get(self.url, format='json')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        weak = self.client.get(self.url, format='json', HTTP_IF_NONE_MATCH=f'"other", W/{etag}')
+        self.assertEqual(weak.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_write_changes_the_etag(self):
+        etag = self.client.get(self.url, format='json')['ETag']
+        PokemonFactory.create(pokemon_name="Fresh")
+        response = self.client.get(self.url, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()), 11)
+
+    def test_if_modified_since(self):
+        modified = self.client.get(self.url, format='json')['Last-Modified']
+        response = self.client.get(self.url, format='json', HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        PokemonFactory.create(pokemon_name="Fresh")
+        response = self.client.get(self.url, format='json', HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(POKEDATA_HTTP_VALIDATORS=None)
+    def test_no_validators_from_a_process_local_cache(self):
+        self.client.get(self.url, format='json')
+        response = self.client.get(self.url, format='json',
+                                   HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        with override_settings(CACHES=shared):
+            self.assertTrue(http_validators())
+
+    def test_only_a_cached_response_is_not_modified(self):
+        modified = self.client.get(self.url, format='json')['Last-Modified']
+        missing = reverse('api_pokemon_similar', kwargs={'pk': 99999})
+        response = self.client.get(missing, format='json', HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        get_cache().clear()
+        response = self.client.get(self.url, format='json', HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_gzip(self):
+        plain = self.client.get(self.url, format='json')
+        for _ in range(2):  # compressed on the miss, then from the cache
+            response = self.client.get(self.url, format='json', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+            self.assertLess(len(response.content), len(plain.content))
+            self.assertNotEqual(response['ETag'], plain['ETag'])
+        response = self.client.get(self.url, format='json', HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        refused = self.client.get(self.url, format='json', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', refused)
+        self.assertEqual(refused.content, plain.content)
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_brotli_is_preferred(self):
+        plain = self.client.get(self.url, format='json')
+        response = self.client.get(self.url, format='json', HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+
+class PokemonChangeFeedTest(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.pokemons = PokemonFactory.create_batch(5, generation=1)
+        self.url = reverse('api_pokemon-changes')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def changes(self, since, **params):
+        response = self.client.get(self.url, {'since': since, **params}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_since_zero_is_a_full_copy(self):
+        data = self.changes(0)
+        self.assertEqual([row['id'] for row in data['upserts']], [p.pk for p in self.pokemons])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['more'])
+        self.assertEqual(data['upserts'][0], PokemonSerializer(self.pokemons[0]).data)
+
+    def test_one_edit_behind_transfers_one_row(self):
+        head = self.changes(0)['next']
+        pokemon = self.pokemons[2]
+        pokemon.pokemon_name = "Renamed"
+        pokemon.save()
+        data = self.changes(head)
+        self.assertEqual(len(data['upserts']), 1)
+        self.assertEqual(data['upserts'][0]['pokemon_name'], "Renamed")
+        self.assertEqual(self.changes(data['next'])['upserts'], [])
+
+    def test_repeated_edits_collapse(self):
+        head = self.changes(0)['next']
+        pokemon = self.pokemons[0]
+        for speed in (10, 20, 30):
+            pokemon.speed = speed
+            pokemon.save()
+        data = self.changes(head)
+        self.assertEqual([row['speed'] for row in data['upserts']], [30])
+
+    def test_deletes_are_tombstones(self):
+        head = self.changes(0)['next']
+        pks = [p.pk for p in self.pokemons[:2]]
+        self.pokemons[0].delete()
+        self.client.delete(reverse('api_pokemon-detail-api', kwargs={'pk': pks[1]}))
+        data = self.changes(head)
+        self.assertEqual(data['upserts'], [])
+        self.assertEqual(data['deleted'], pks)
+
+    def test_bulk_paths_are_logged(self):
+        head = self.changes(0)['next']
+        created = Pokemon.objects.bulk_create([PokemonFactory.build(pokemon_name=f"Bulk{i}") for i in range(3)])
+        Pokemon.objects.filter(pk=self.pokemons[0].pk).update(speed=99)
+        Pokemon.objects.filter(pk=self.pokemons[1].pk).delete()
+        data = self.changes(head)
+        names = {row['pokemon_name'] for row in data['upserts']}
+        self.assertEqual(names, {"Bulk0", "Bulk1", "Bulk2", self.pokemons[0].pokemon_name})
+        self.assertEqual(data['deleted'], [self.pokemons[1].pk])
+        self.assertEqual(len(created), 3)
+
+    def test_bulk_api_is_logged(self):
+        head = self.changes(0)['next']
+        items = [{**PokemonSerializer(p).data, 'attack': 77} for p in self.pokemons[:2]]
+        response = self.client.put(reverse('api_pokemon-bulk'), items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = self.changes(head)
+        self.assertEqual([row['attack'] for row in data['upserts']], [77, 77])
+
+    def test_pages(self):
+        first = self.changes(0, limit=2)
+        self.assertTrue(first['more'])
+        seen = [row['id'] for row in first['upserts']]
+        data = first
+        while data['more']:
+            data = self.changes(data['next'], limit=2)
+            seen += [row['id'] for row in data['upserts']]
+        self.assertEqual(seen, [p.pk for p in self.pokemons])
+
+    def test_cached_until_the_next_write(self):
+        head = self.changes(0)['next']
+        self.changes(head)
+        with self.assertNumQueries(0):
+            self.client.get(self.url, {'since': head}, format='json')
+        PokemonFactory.create(pokemon_name="Fresh")
+        self.assertEqual(self.changes(head)['upserts'][0]['pokemon_name'], "Fresh")
+
+    def test_compaction(self):
+        pokemon = self.pokemons[0]
+        pokemon.speed = 50
+        pokemon.save()
+        head = self.changes(0)['next']
+        gone = self.pokemons[1].pk
+        self.pokemons[1].delete()
+        # the first upserts of both are superseded
+        self.assertEqual(PokemonChange.objects.compact(), 2)
+        self.assertEqual(PokemonChange.objects.filter(pokemon_id=pokemon.pk).count(), 1)
+        self.assertEqual(self.changes(head)['deleted'], [gone])
+
+        # expired tombstones go, and clients from before them must resync
+        out = io.StringIO()
+        call_command('compact_changes', '--retention-days', '0', stdout=out)
+        self.assertIn('1 entries removed', out.getvalue())
+        response = self.client.get(self.url, {'since': head}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        data = self.changes(0)
+        self.assertEqual(len(data['upserts']), 4)
+        self.assertEqual(data['deleted'], [])
+        self.assertEqual(self.changes(data['next'])['upserts'], [])
+
+    def test_full_copy_pages_past_the_horizon(self):
+        self.pokemons[0].delete()
+        PokemonChange.objects.compact(retention=datetime.timedelta(0))
+        for pokemon in self.pokemons[1:3]:
+            pokemon.speed = 50
+            pokemon.save()
+        with mock.patch('pokedata.api.CHANGES_MAX_LIMIT', 2):
+            data = self.changes(0, limit=1000)
+            self.assertLessEqual(len(data['upserts']) + len(data['deleted']), 2)
+            self.assertTrue(data['more'])
+            self.assertLess(data['next'], data['horizon'])
+            seen = [row['id'] for row in data['upserts']]
+            while data['more']:
+                data = self.changes(data['next'], horizon=data['horizon'])
+                seen += [row['id'] for row in data['upserts']]
+        self.assertEqual(sorted(set(seen)), [p.pk for p in self.pokemons[1:]])
+        # without the horizon, or after another compaction, the cursor is stale
+        response = self.client.get(self.url, {'since': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_bad_params(self):
+        for params in ({'since': 'x'}, {'limit': 'x'}, {'since': '99999999999999999999999'},
+                       {'horizon': '-99999999999999999999999'}):
+            response = self.client.get(self.url, params, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PokemonSidebarCacheTest(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.pokemons = PokemonFactory.create_batch(20, generation=1)
+        self.url = reverse('pokemon-detail', args=[self.pokemons[0].pk])
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_warm_detail_page_only_queries_the_object(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'sidebar_page=2')
+
+    def test_sidebar_pages_are_cached_separately(self):
+        first  = self.client.get(self.url)
+        second = self.client.get(self.url + '?sidebar_page=2')
+        last_on_page_2 = Pokemon.objects.order_by('generation', 'pokemon_name', 'id')[15]
+        self.assertNotContains(first, f'/pokemon/{last_on_page_2.pk}"')
+        self.assertContains(second, f'/pokemon/{last_on_page_2.pk}"')
+
+    def test_write_refreshes_sidebar(self):
+        self.client.get(self.url)
+        PokemonFactory.create(pokemon_name="AAAFirst", generation=1)
+        self.assertContains(self.client.get(self.url), 'AAAFirst')
+
+    def test_list_views_share_the_sidebar(self):
+        self.client.get(self.url)
+        for url in ['/pokemon/gen/1/', '/pokemon/legendary/', '/pokemon/type/Fire/']:
+            with self.subTest(url=url), self.assertNumQueries(1):
+                self.client.get(url)
+
+class ImportPokemonCommandTest(TestCase):
+    csv_text = (
+        "#,Name,Type 1,Type 2,Total,HP,Attack,Defense,Sp. Atk,Sp. Def,Speed,Generation,Legendary\n"
+        "1,A,Normal,,0,1,1,1,1,1,1,1,False\n"
+        "2,B,water,,0,2,2,2,2,2,2,2,True\n"
+        "3,A,Normal,,0,1,1,1,1,1,1,1,False\n"
+    )
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+        Pokemon.objects.all().delete()
+
+    def write(self, name, opener=open):
+        path = os.path.join(self.tmpdir, name)
+        with opener(path, 'wt', encoding='utf-8', newline='') as f:
+            f.write(self.csv_text)
+        return path
+
+    def test_imports_and_computes_totals(self):
+        out = io.StringIO()
+        call_command('import_pokemon', self.write('p.csv'), '--batch-size', '1', stdout=out)
+        self.assertIn('2 Pokémon imported', out.getvalue())
+        b = Pokemon.objects.get(pokemon_name='B')
+        self.assertEqual(b.total_stats, 12)
+        self.assertEqual(b.pokemon_type1, 'Water')
+        self.assertTrue(b.legendary)
+
+    def test_gzip_and_idempotent(self):
+        path = self.write('p.csv.gz', opener=gzip.open)
+        call_command('import_pokemon', path, stdout=io.StringIO())
+        call_command('import_pokemon', path, stdout=io.StringIO())
+        self.assertEqual(Pokemon.objects.count(), 2)
+
+    def test_progress_counts_duplicate_rows(self):
+        out = io.StringIO()
+        call_command('import_pokemon', self.write('p.csv'), '--progress', '3', stdout=out)
+        # row 3 is a duplicate: reported there, and again at the end
+        self.assertEqual(out.getvalue().count('3 rows read'), 2)
+
+    def test_stdin_is_left_open(self):
+        stdin = io.TextIOWrapper(io.BufferedReader(io.BytesIO(self.csv_text.encode('utf-8'))))
+        with mock.patch('sys.stdin', stdin):
+            call_command('import_pokemon', '-', stdout=io.StringIO())
+        self.assertFalse(stdin.buffer.closed)
+        self.assertEqual(Pokemon.objects.count(), 2)
+
+class PokemonBulkTest(APITestCase):
+    def setUp(self):
+        self.url = reverse('api_pokemon-bulk')
+        self.existing = PokemonFactory.create(pokemon_name="Existing")
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def payload(self, name, **extra):
+        item = {
+            "pokemon_name": name, "pokemon_type1": "Fire", "pokemon_type2": None,
+            "pokemon_HP": 1, "attack": 1, "defense": 1, "special_attack": 1,
+            "special_defense": 1, "speed": 1, "total_stats": 6,
+            "generation": 1, "legendary": False,
+        }
+        item.update(extra)
+        return item
+
+    def test_bulk_create(self):
+        items = [self.payload(f"Bulk{i}") for i in range(3)]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()), 3)
+        self.assertTrue(all(p['id'] for p in response.json()))
+        self.assertEqual(Pokemon.objects.count(), 4)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        items = [self.payload("Good"), self.payload("Bad", pokemon_HP=-1)]
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn('pokemon_HP', errors[1])
+        self.assertFalse(Pokemon.objects.filter(pokemon_name="Good").exists())
+
+    def test_bulk_update(self):
+        items = [self.payload("Renamed", id=self.existing.pk)]
+        response = self.client.put(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.pokemon_name, "Renamed")
+
+    def test_bulk_update_unknown_id(self):
+        items = [self.payload("Renamed", id=self.existing.pk), self.payload("Nope", id=9999)]
+        response = self.client.put(self.url, items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()[0], {})
+        self.assertIn('id', response.json()[1])
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.pokemon_name, "Existing")
+
+    def test_bulk_delete(self):
+        other = PokemonFactory.create()
+        response = self.client.delete(self.url, [self.existing.pk, 9999], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Pokemon.objects.count(), 2)
+        response = self.client.delete(self.url, [self.existing.pk, other.pk], format='json')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Pokemon.objects.count(), 0)
+
+    def test_booleans_are_not_ids(self):
+        first = Pokemon.objects.filter(pk=1).first() or PokemonFactory.create(id=1)
+        response = self.client.delete(self.url, [True], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.json()[0])
+        response = self.client.put(self.url, [{**PokemonSerializer(first).data, 'id': True}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Pokemon.objects.filter(pk=1).exists())
+
+class PokemonStatsTest(APITestCase):
+    def setUp(self):
+        self.slow = PokemonFactory.create(pokemon_name="Slow", speed=10, attack=50,
+                                          generation=1, pokemon_type1='Water', pokemon_type2=None)
+        self.mid  = PokemonFactory.create(pokemon_name="Mid", speed=20, attack=60,
+                                          generation=1, pokemon_type1='Fire', pokemon_type2=None)
+        self.fast = PokemonFactory.create(pokemon_name="Fast", speed=30, attack=10,
+                                          generation=2, pokemon_type1='Fire', pokemon_type2='Water')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_percentiles(self):
+        response = self.client.get('/api/pokemon/stats/percentiles/?stat=speed&q=0,50,100')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['percentiles'], {'0.0': 10.0, '50.0': 20.0, '100.0': 30.0})
+
+    def test_percentiles_bad_stat(self):
+        response = self.client.get('/api/pokemon/stats/percentiles/?stat=luck')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_summary_by_generation(self):
+        data = self.client.get('/api/pokemon/stats/summary/?group_by=generation').json()
+        gen1 = next(g for g in data if g['generation'] == 1)
+        self.assertEqual(gen1['count'], 2)
+        self.assertEqual(gen1['mean']['speed'], 15.0)
+        self.assertEqual(gen1['std']['speed'], 5.0)
+
+    def test_zscores(self):
+        data = self.client.get(f'/api/pokemon/{self.fast.pk}/zscores/').json()
+        self.assertAlmostEqual(data['zscores']['speed'], 1.2247, places=3)
+        self.assertEqual(self.client.get('/api/pokemon/9999/zscores/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_top_by_stat_and_formula(self):
+        data = self.client.get('/api/pokemon/stats/top/?stat=speed&n=2').json()
+        self.assertEqual([p['pokemon_name'] for p in data], ["Fast", "Mid"])
+        data = self.client.get('/api/pokemon/stats/top/?weights=attack:1,speed:0.5&type=water').json()
+        self.assertEqual([p['pokemon_name'] for p in data], ["Slow", "Fast"])
+        self.assertEqual(data[0]['score'], 55.0)
+
+    def test_zscores_of_an_empty_population(self):
+        response = self.client.get(f'/api/pokemon/{self.fast.pk}/zscores/?generation=99')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['population'], 0)
+        self.assertEqual(set(response.json()['zscores'].values()), {None})
+
+    def test_non_finite_weights(self):
+        for weight in ('nan', 'inf', '-inf', 'x'):
+            response = self.client.get(f'/api/pokemon/stats/top/?weights=attack:{weight}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, weight)
+            self.assertIn('weights', response.json())
+
+    def test_snapshot_follows_writes(self):
+        self.client.get('/api/pokemon/stats/top/?stat=speed&n=1')
+        PokemonFactory.create(pokemon_name="Fastest", speed=200)
+        data = self.client.get('/api/pokemon/stats/top/?stat=speed&n=1').json()
+        self.assertEqual(data[0]['pokemon_name'], "Fastest")
+
+class PokemonRangeFilterTest(APITestCase):
+    def setUp(self):
+        self.url = reverse('api_pokemon-list-api')
+        for i, (speed, defense) in enumerate([(120, 50), (110, 90), (90, 60), (130, 70)]):
+            PokemonFactory.create(pokemon_name=f"R{i}", speed=speed, defense=defense,
+                                  pokemon_HP=10, attack=10, special_attack=10,
+                                  special_defense=10, generation=1 + i % 2)
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_range_filters_and_ordering(self):
+        data = self.client.get(
+            self.url + '?speed__gt=100&defense__lt=80&ordering=-total_stats', format='json'
+        ).json()
+        self.assertEqual([p['pokemon_name'] for p in data], ["R3", "R0"])
+
+    def test_combines_with_generation_filter(self):
+        data = self.client.get(self.url + '?speed__gte=90&generation=1', format='json').json()
+        self.assertEqual({p['pokemon_name'] for p in data}, {"R0", "R2"})
+        data = self.client.get(reverse('api_pokemon_by_generation', kwargs={'gen': 2})
+                               + '?defense__lte=70', format='json').json()
+        self.assertEqual([p['pokemon_name'] for p in data], ["R3"])
+
+    def test_bad_parameters(self):
+        for query in ['?speed__gt=fast', '?ordering=luck', '?legendary=maybe',
+                      '?speed__gt=99999999999999999999999', '?generation=99999999999999999999999']:
+            with self.subTest(query=query):
+                response = self.client.get(self.url + query, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def walk(self, query):
+        names, url = [], self.url + query
+        while url:
+            data = self.client.get(url, format='json').json()
+            names += [p['pokemon_name'] for p in data['results']]
+            url = data['next']
+        return names, data
+
+    def test_keyset_pages_follow_custom_ordering(self):
+        names, _ = self.walk('?ordering=-speed&limit=1')
+        self.assertEqual(names, ["R3", "R0", "R1", "R2"])
+        # mixed directions
+        names, last = self.walk('?ordering=-generation,pokemon_name&limit=1')
+        self.assertEqual(names, ["R1", "R3", "R0", "R2"])
+        back = self.client.get(last['prev'], format='json').json()
+        self.assertEqual([p['pokemon_name'] for p in back['results']], ["R0"])
+
+class PokemonSearchTest(APITestCase):
+    def setUp(self):
+        for name in ["Pikachu", "Raichu", "Pichu", "Charmander", "Charizard"]:
+            PokemonFactory.create(pokemon_name=name)
+        self.url = reverse('api_pokemon-search')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def search(self, q):
+        response = self.client.get(self.url, {'q': q}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(p['pokemon_name'], p['match']) for p in response.json()]
+
+    def test_prefix_then_substring(self):
+        results = self.search('ch')
+        self.assertEqual(results[:2], [("Charizard", 'prefix'), ("Charmander", 'prefix')])
+        self.assertIn(("Raichu", 'substring'), self.search('chu'))
+
+    def test_typo_tolerant(self):
+        self.assertEqual(self.search('pikachoo')[0], ("Pikachu", 'fuzzy'))
+
+    def test_index_follows_save_and_delete(self):
+        self.search('pi')
+        with self.captureOnCommitCallbacks(execute=True):
+            mon = PokemonFactory.create(pokemon_name="Pidgey")
+        self.assertIn(("Pidgey", 'prefix'), self.search('pid'))
+        self.assertEqual(name_index.version, dataset_version())
+
+        mon.pokemon_name = "Spearow"
+        with self.captureOnCommitCallbacks(execute=True):
+            mon.save()
+        self.assertEqual(self.search('pidg'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            mon.delete()
+        self.assertEqual(self.search('spearow'), [])
+        self.assertEqual(name_index.version, dataset_version())
+
+    def test_rolled_back_write_leaves_no_phantom(self):
+        self.search('pi')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            PokemonFactory.create(pokemon_name="Zzphantom")
+            raise RuntimeError
+        self.assertEqual(self.search('zzphantom'), [])
+
+        # loaded by the writer mid-transaction, uncommitted row and all
+        name_index.version = None
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            PokemonFactory.create(pokemon_name="Zzphantom")
+            self.assertEqual(self.search('zzphantom'), [("Zzphantom", 'prefix')])
+            raise RuntimeError
+        self.assertEqual(self.search('zzphantom'), [])
+
+    def test_rolled_back_bulk_write_leaves_no_phantom(self):
+        self.search('pi')
+        with self.assertRaises(RuntimeError), transaction.atomic(), single_version_bump():
+            PokemonFactory.create(pokemon_name="Zzphantom")
+            raise RuntimeError
+        self.assertIsNone(name_index.version)
+        self.assertEqual(self.search('zzphantom'), [])
+
+    def test_empty_query(self):
+        self.assertEqual(self.search(''), [])
+
+
+class PokemonSummaryTest(APITestCase):
+    def setUp(self):
+        self.mons = PokemonFactory.create_batch(30)
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def assertConsistent(self):
+        self.assertEqual(PokemonSummary.objects.stored_rows(), PokemonSummary.objects.aggregate_rows())
+
+    def test_incremental_matches_fresh_aggregation(self):
+        self.assertConsistent()
+
+        # single-row edits: stats, generation and types, name only
+        mon = self.mons[0]
+        mon.attack, mon.generation = 255, 6
+        mon.pokemon_type1, mon.pokemon_type2 = 'fire', 'Fire'
+        mon.save()
+        self.mons[1].pokemon_name = "Renamed"
+        self.mons[1].save()
+        self.assertConsistent()
+
+        # removing the row holding a maximum forces it to be recomputed
+        strongest = Pokemon.objects.order_by('-total_stats').first()
+        strongest.delete()
+        self.assertConsistent()
+
+        # bulk paths
+        Pokemon.objects.bulk_create(PokemonFactory.build_batch(10))
+        Pokemon.objects.filter(generation=2).update(generation=3, legendary=True)
+        objs = list(Pokemon.objects.filter(generation=3))
+        for obj in objs:
+            obj.speed = 1
+        Pokemon.objects.bulk_update(objs, ['speed'])
+        Pokemon.objects.filter(pokemon_type1='Water').delete()
+        self.assertConsistent()
+
+        Pokemon.objects.all().delete()
+        self.assertEqual(PokemonSummary.objects.stored_rows(), {})
+
+    def test_bulk_create_rejects_ignore_conflicts(self):
+        duplicate = PokemonFactory.build(id=self.mons[0].pk)
+        with self.assertRaises(ValueError):
+            Pokemon.objects.bulk_create([duplicate, PokemonFactory.build()], ignore_conflicts=True)
+        self.assertEqual(Pokemon.objects.count(), 30)
+        self.assertConsistent()
+
+    def test_bulk_api_keeps_summaries(self):
+        payload = [
+            {**PokemonSerializer(m).data, 'pokemon_name': f"Bulk{i}"} for i, m in enumerate(self.mons[:5])
+        ]
+        for item in payload:
+            del item['id']
+        response = self.client.post(reverse('api_pokemon-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created = response.json()
+        for item in created:
+            item['generation'] = 6
+            item['speed'] = 1
+        response = self.client.put(reverse('api_pokemon-bulk'), created, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [p['id'] for p in created]
+        self.client.delete(reverse('api_pokemon-bulk'), ids[:2], format='json')
+        self.assertConsistent()
+
+    def test_aggregates_endpoint(self):
+        response = self.client.get(reverse('api_pokemon_aggregates'), {'by': 'generation'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        gen1 = response.json()[0]
+        rows = Pokemon.objects.filter(generation=1)
+        self.assertEqual(gen1['generation'], 1)
+        self.assertEqual(gen1['count'], rows.count())
+        self.assertEqual(gen1['max']['speed'], max(p.speed for p in rows))
+        self.assertAlmostEqual(gen1['avg']['attack'], sum(p.attack for p in rows) / rows.count(), places=3)
+
+        types = self.client.get(reverse('api_pokemon_aggregates'), {'by': 'type'}).json()
+        self.assertEqual(
+            sum(t['count'] for t in types),
+            sum(len({p.pokemon_type1, p.pokemon_type2} - {None}) for p in Pokemon.objects.all()),
+        )
+        bad = self.client.get(reverse('api_pokemon_aggregates'), {'by': 'speed'})
+        self.assertEqual(bad.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_command(self):
+        PokemonSummary.objects.filter(group='generation', key='1').update(count=999)
+        out = io.StringIO()
+        call_command('rebuild_summaries', '--check', stdout=out)
+        self.assertIn('1 of', out.getvalue())
+        call_command('rebuild_summaries', stdout=io.StringIO())
+        self.assertConsistent()
+
+
+class PokemonMatchupTest(APITestCase):
+    def setUp(self):
+        self.target = PokemonFactory.create(pokemon_name="Target", pokemon_type1='Fire', pokemon_type2='Flying')
+        self.rock   = PokemonFactory.create(pokemon_name="Rocky", pokemon_type1='Rock', pokemon_type2=None)
+        self.water  = PokemonFactory.create(pokemon_name="Wet", pokemon_type1='Water', pokemon_type2=None)
+        self.grass  = PokemonFactory.create(pokemon_name="Leafy", pokemon_type1='Grass', pokemon_type2='Bug')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_chart(self):
+        code = typechart.type_code
+        self.assertEqual(typechart.CHART[code('Fire'), code('Grass')], 2)
+        self.assertEqual(typechart.CHART[code('Dragon'), code('Fairy')], 0)
+        self.assertEqual(typechart.taken([code('Ground')])[code('Fire'), code('Flying')], 0)
+        self.assertEqual(typechart.taken([code('Rock')])[code('Fire'), code('Flying')], 4)
+        self.assertEqual(typechart.taken([code('Rock')])[code('Fire'), typechart.NONE], 2)
+        data = self.client.get(reverse('api_pokemon_type_chart')).json()
+        self.assertEqual(len(data['matrix']), 18)
+        self.assertTrue(all(len(row) == 18 for row in data['matrix']))
+
+    def test_counters(self):
+        response = self.client.get(reverse('api_pokemon_counters', kwargs={'pk': self.target.pk}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual([p['pokemon_name'] for p in data], ["Rocky", "Wet", "Leafy"])
+        self.assertEqual((data[0]['offense'], data[0]['defense'], data[0]['score']), (4, 0.5, 8))
+        # Fire/Flying hits Grass/Bug 4x (Fire) and takes 0.25x from Grass
+        self.assertEqual((data[2]['offense'], data[2]['defense']), (0.25, 4))
+
+    def test_attacker_and_defenders(self):
+        # Grass/Bug resists Electric, which Water and Fire/Flying are weak to
+        data = self.client.get(reverse('api_pokemon_matchups'), {'attacker': 'electric', 'n': 1}).json()
+        self.assertEqual([(p['pokemon_name'], p['score']) for p in data], [("Leafy", 2)])
+        ids = f'{self.target.pk},{self.rock.pk}'
+        data = self.client.get(reverse('api_pokemon_matchups'), {'defenders': ids, 'type': 'water'}).json()
+        self.assertEqual([p['pokemon_name'] for p in data], ["Wet"])
+
+    def test_bad_requests(self):
+        url = reverse('api_pokemon_matchups')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'attacker': 'sound'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'defenders': '999999'}).status_code, status.HTTP_400_BAD_REQUEST)
+        missing = reverse('api_pokemon_counters', kwargs={'pk': 999999})
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PokemonSimilarTest(APITestCase):
+    def setUp(self):
+        def make(name, base, **kwargs):
+            return PokemonFactory.create(
+                pokemon_name=name, pokemon_HP=base, attack=base, defense=base,
+                special_attack=base, special_defense=base, speed=base, **kwargs,
+            )
+        self.make = make
+        self.origin = make("Origin", 100, pokemon_type1='Fire', pokemon_type2=None, generation=1)
+        self.near   = make("Near", 102, pokemon_type1='Water', pokemon_type2=None, generation=1)
+        self.mid    = make("Mid", 110, pokemon_type1='Fire', pokemon_type2=None, generation=2)
+        self.far    = make("Far", 200, pokemon_type1='Fire', pokemon_type2=None, generation=1)
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def similar(self, pk, **params):
+        response = self.client.get(reverse('api_pokemon_similar', kwargs={'pk': pk}), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['pokemon_name'] for p in response.json()]
+
+    def test_nearest_first(self):
+        self.assertEqual(self.similar(self.origin.pk, k=2), ["Near", "Mid"])
+        data = self.client.get(reverse('api_pokemon_similar', kwargs={'pk': self.origin.pk}), {'k': 1}).json()
+        self.assertAlmostEqual(data[0]['distance'], (6 * 2 ** 2) ** 0.5, places=3)
+
+    def test_constraints(self):
+        self.assertEqual(self.similar(self.origin.pk, type='fire'), ["Mid", "Far"])
+        self.assertEqual(self.similar(self.origin.pk, generation=1), ["Near", "Far"])
+
+    def test_follows_writes(self):
+        self.similar(self.origin.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            closer = self.make("Closer", 101, pokemon_type1='Bug', pokemon_type2=None)
+        self.assertEqual(self.similar(self.origin.pk, k=1), ["Closer"])
+        with self.captureOnCommitCallbacks(execute=True):
+            closer.delete()
+            self.near.speed = 250
+            self.near.save()
+        self.assertEqual(self.similar(self.origin.pk, k=1), ["Mid"])
+        self.assertEqual(similar_index.version, dataset_version())
+
+        similar_index.compact()
+        self.assertEqual(self.similar(self.origin.pk), ["Mid", "Near", "Far"])
+
+    def test_rolled_back_write_leaves_no_phantom(self):
+        self.similar(self.origin.pk)
+        for reload in (False, True):
+            if reload:
+                similar_index.version = None
+            with self.subTest(reload=reload), self.assertRaises(RuntimeError), transaction.atomic():
+                self.make("Zzphantom", 100, pokemon_type1='Bug', pokemon_type2=None)
+                if reload:
+                    self.assertEqual(similar_index.current().similar(self.origin.pk, 1)[0][1], 0.0)
+                raise RuntimeError
+            self.assertEqual(self.similar(self.origin.pk, k=1), ["Near"])
+
+    def test_unknown(self):
+        response = self.client.get(reverse('api_pokemon_similar', kwargs={'pk': 999999}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PokemonFieldsetTest(APITestCase):
+    def setUp(self):
+        self.mons = PokemonFactory.create_batch(5)
+        self.url = reverse('api_pokemon-list-api')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_fields_fetched_and_rendered(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'fields': 'pokemon_name,id'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('"attack"', queries.captured_queries[-1]['sql'])
+
+        full = {p['id']: p for p in self.client.get(self.url).json()}
+        for row in response.json():
+            self.assertEqual(list(row), ['id', 'pokemon_name'])
+            self.assertEqual(row['pokemon_name'], full[row['id']]['pokemon_name'])
+
+    def test_exclude(self):
+        row = self.client.get(self.url, {'exclude': 'total_stats,legendary'}).json()[0]
+        self.assertNotIn('total_stats', row)
+        self.assertNotIn('legendary', row)
+        self.assertIn('speed', row)
+
+    def test_paginated_and_streamed(self):
+        names = [{'pokemon_name': p.pokemon_name} for p in Pokemon.objects.all()]
+        page = self.client.get(self.url, {'fields': 'pokemon_name', 'limit': 2}).json()
+        self.assertEqual(page['results'], names[:2])
+        following = self.client.get(page['next']).json()
+        self.assertEqual(following['results'], names[2:4])
+
+        response = self.client.get(self.url, {'fields': 'id', 'stream': '1'})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(rows, [{'id': p.pk} for p in Pokemon.objects.all()])
+
+    def test_detail_and_writes(self):
+        mon = self.mons[0]
+        url = reverse('api_pokemon-detail-api', kwargs={'pk': mon.pk})
+        self.assertEqual(self.client.get(url, {'fields': 'speed'}).json(), {'speed': mon.speed})
+
+        data = PokemonSerializer(mon).data
+        data['pokemon_name'] = "Changed"
+        response = self.client.put(url + '?fields=id,pokemon_name', data, format='json')
+        self.assertEqual(response.json(), {'id': mon.pk, 'pokemon_name': "Changed"})
+        self.assertEqual(Pokemon.objects.get(pk=mon.pk).speed, mon.speed)
+
+    def test_unknown_field(self):
+        response = self.client.get(self.url, {'fields': 'id,weight'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PokemonRowEncoderTest(APITestCase):
+    def setUp(self):
+        PokemonFactory.create_batch(4)
+        PokemonFactory.create(pokemon_name='Flabébé "\u2028', pokemon_type2=None, legendary=True)
+        self.url = reverse('api_pokemon-list-api')
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def rendered(self, data):
+        return JSONRenderer().render(data)
+
+    def test_same_bytes_as_serializer(self):
+        qs = Pokemon.objects.all()
+        response = self.client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.content, self.rendered(PokemonSerializer(qs, many=True).data))
+
+        response = self.client.get(reverse('api_pokemon_legendary'), {'fields': 'pokemon_name,legendary'})
+        expected = PokemonSerializer(qs.filter(legendary=True), many=True,
+                                     fields=('pokemon_name', 'legendary')).data
+        self.assertEqual(response.content, self.rendered(expected))
+
+    def test_paginated_same_bytes(self):
+        response = self.client.get(self.url, {'limit': 2})
+        data = response.json()
+        expected = {
+            'next': data['next'],
+            'prev': None,
+            'results': PokemonSerializer(Pokemon.objects.all()[:2], many=True).data,
+        }
+        self.assertEqual(response.content, self.rendered(expected))
+
+    def test_other_renderers(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  {', response.content)
+        self.assertEqual(json.loads(response.content), self.client.get(self.url).json())
+
+        response = self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(b'Flab\xc3\xa9b\xc3\xa9', response.content)
+
+
+class QueryInstrumentationTest(APITestCase):
+    def setUp(self):
+        self.mon = PokemonFactory.create()
+        self.url = reverse('api_pokemon-detail-api', kwargs={'pk': self.mon.pk})
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_server_timing_header(self):
+        response = self.client.get(self.url)
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="1 queries", app;dur=[\d.]+$')
+
+    @override_settings(POKEDATA_SLOW_QUERY_MS=0)
+    def test_slow_queries_logged_with_url_name(self):
+        with self.assertLogs('pokedata.sql', 'WARNING') as logs:
+            self.client.get(self.url)
+        self.assertIn('slow query', logs.output[0])
+        self.assertIn('in api_pokemon-detail-api:', logs.output[0])
+
+    @override_settings(POKEDATA_REPEATED_QUERY_LIMIT=3)
+    def test_repeated_queries_logged(self):
+        items = [PokemonSerializer(PokemonFactory.build()).data for _ in range(3)]
+        with self.assertLogs('pokedata.sql', 'WARNING') as logs:
+            self.client.post(reverse('api_pokemon-bulk'), items, format='json')
+        self.assertTrue(any('× the same query in api_pokemon-bulk: INSERT' in line
+                            for line in logs.output))
+
+
+class MetricsTest(APITestCase):
+    def setUp(self):
+        self.mon = PokemonFactory.create()
+        self.url = reverse('api_pokemon-detail-api', kwargs={'pk': self.mon.pk})
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def sample(self, text, line):
+        for row in text.splitlines():
+            if row.startswith(line + ' '):
+                return float(row.rsplit(' ', 1)[1])
+        return 0.0
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode('utf-8')
+
+    def test_requests_by_view_and_method(self):
+        labels = 'view="api_pokemon-detail-api",method="GET"'
+        before = self.scrape()
+        self.client.get(self.url)
+        self.client.get(self.url)
+        after = self.scrape()
+
+        total = f'pokedata_http_requests_total{{{labels},status="200"}}'
+        self.assertEqual(self.sample(after, total) - self.sample(before, total), 2)
+        count = f'pokedata_http_request_duration_seconds_count{{{labels}}}'
+        self.assertEqual(self.sample(after, count) - self.sample(before, count), 2)
+        inf = f'pokedata_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'
+        self.assertEqual(self.sample(after, inf), self.sample(after, count))
+        self.assertIn('# TYPE pokedata_http_response_size_bytes histogram', after)
+        self.assertEqual(self.sample(after, f'pokedata_http_requests_in_flight{{{labels}}}'), 0)
+        self.assertEqual(self.sample(after, 'pokedata_http_requests_in_flight{view="metrics",method="GET"}'), 1)
+
+        self.client.get('/no/such/page/')
+        self.assertIn('view="<unmatched>",method="GET",status="404"', self.scrape())
+
+    def test_merges_worker_files(self):
+        # a worker that has exited: its counters stay, its gauges go
+        worker = subprocess.Popen([sys.executable, '-c', ''])
+        worker.wait()
+        labels = ['api_pokemon-detail-api', 'GET']
+        other = {
+            'pokedata_http_requests_total': {
+                'kind': 'counter', 'help': '', 'labels': ['view', 'method', 'status'],
+                'buckets': [], 'samples': [[labels + ['200'], 1000]],
+            },
+            'pokedata_http_requests_in_flight': {
+                'kind': 'gauge', 'help': '', 'labels': ['view', 'method'],
+                'buckets': [], 'samples': [[labels, 7]],
+            },
+        }
+        total = 'pokedata_http_requests_total{view="api_pokemon-detail-api",method="GET",status="200"}'
+        in_flight = 'pokedata_http_requests_in_flight{view="api_pokemon-detail-api",method="GET"}'
+        directory = tempfile.mkdtemp()
+        try:
+            with override_settings(POKEDATA_METRICS_DIR=directory):
+                before = self.scrape()
+                with open(os.path.join(directory, f'metrics-{worker.pid}.json'), 'w') as f:
+                    json.dump(other, f)
+                after = self.scrape()
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics-{os.getpid()}.json')))
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(self.sample(after, total) - self.sample(before, total), 1000)
+        self.assertEqual(self.sample(after, in_flight), 0)
+
+
+# the pool's threads use their own connections: the rows must be committed
+class AsyncViewsTest(APITransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        PokemonFactory.create_batch(5)
+        self.mon = Pokemon.objects.first()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def call(self, view, path, method='get', **kwargs):
+        request = getattr(self.factory, method)(path)
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_same_bytes_as_sync_views(self):
+        detail = reverse('api_pokemon-detail-api', kwargs={'pk': self.mon.pk})
+        for view, path, kwargs in [
+            (asyncviews.pokemon_list, reverse('api_pokemon-list-api') + '?nocache=1', {}),
+            (asyncviews.pokemon_list, reverse('api_pokemon-list-api') + '?limit=2', {}),
+            (asyncviews.pokemon_detail, detail, {'pk': self.mon.pk}),
+            (asyncviews.stats_summary, reverse('api_pokemon_stats_summary'), {}),
+        ]:
+            response = self.call(view, path, **kwargs)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, self.client.get(path).content)
+
+    def test_streamed_response_is_sent_chunk_by_chunk(self):
+        path = reverse('api_pokemon-list-api')
+        response = self.call(asyncviews.pokemon_list, path + '?stream=1')
+        self.assertTrue(response.streaming)
+        messages = []
+        async def receive():
+            return {'type': 'http.request'}
+        async def send(message):
+            messages.append(message)
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'stream=1',
+                 'headers': [], 'server': ('testserver', 80)}
+        with mock.patch('pokedata.streaming.CHUNK_SIZE', 2):
+            async_to_sync(asyncviews.ASGIHandler())(scope, receive, send)
+        self.assertEqual(messages[0]['status'], status.HTTP_200_OK)
+        body = messages[1:]
+        self.assertGreater(len(body), 2)
+        self.assertTrue(all(message['more_body'] for message in body[:-1]))
+        self.assertFalse(body[-1].get('more_body'))
+        self.assertEqual(json.loads(b''.join(message.get('body', b'') for message in body)),
+                         json.loads(b''.join(self.client.get(path + '?stream=1').streaming_content)))
+
+    def test_writes_go_to_the_sync_view(self):
+        path = reverse('api_pokemon-detail-api', kwargs={'pk': self.mon.pk})
+        response = self.call(asyncviews.pokemon_detail, path, method='delete', pk=self.mon.pk)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Pokemon.objects.filter(pk=self.mon.pk).exists())
+
+    def test_middleware_under_asgi(self):
+        url = reverse('api_pokemon-detail-api', kwargs={'pk': self.mon.pk})
+        async def get():
+            return await AsyncClient().get(url)
+        response = async_to_sync(get)()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries"')
+
+
+class SQLiteProductionModeTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'db.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def wrapper(self, **options):
+        settings_dict = {**connection.settings_dict, 'NAME': self.path, 'OPTIONS': options}
+        db = TunedSQLiteWrapper(settings_dict, alias='tuned')
+        self.addCleanup(db.close)
+        return db
+
+    def test_pragmas_on_connect(self):
+        db = self.wrapper(pragmas={'journal_mode': 'WAL', 'synchronous': 'NORMAL'})
+        with db.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone(), ('wal',))
+            self.assertEqual(cursor.execute('PRAGMA synchronous').fetchone(), (1,))
+
+    def test_immediate_transactions_take_the_write_lock(self):
+        db = self.wrapper(immediate=True)
+        db.ensure_connection()
+        db._start_transaction_under_autocommit()
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        try:
+            with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+                other.execute('BEGIN IMMEDIATE')
+        finally:
+            other.close()
+            db.connection.rollback()
+
+    def test_query_only_replica(self):
+        with self.wrapper().cursor() as cursor:
+            cursor.execute('CREATE TABLE t (x)')
+        with self.wrapper(pragmas={'query_only': 'ON'}).cursor() as cursor:
+            self.assertEqual(cursor.execute('SELECT count(*) FROM t').fetchone(), (0,))
+            with self.assertRaises(OperationalError):
+                cursor.execute('INSERT INTO t VALUES (1)')
+
+    def test_router(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Pokemon), 'replica')
+        self.assertEqual(router.db_for_write(Pokemon), 'default')
+        self.assertTrue(router.allow_migrate('default', 'pokedata'))
+        self.assertFalse(router.allow_migrate('replica', 'pokedata'))
+        connection.in_atomic_block = True
+        try:
+            # reads in a transaction see its writes
+            self.assertEqual(router.db_for_read(Pokemon), 'default')
+        finally:
+            connection.in_atomic_block = False
+
+
+class SharedCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_workers_bump_one_version(self):
+        workers = [FileBasedCache(self.directory, {}) for _ in range(4)]
+        workers[0].set('version', 0, None)
+
+        def bump(cache):
+            for _ in range(50):
+                cache.incr('version')
+        threads = [threading.Thread(target=bump, args=(cache,)) for cache in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(workers[-1].get('version'), 200)
+        workers[0].clear()
+        self.assertTrue(workers[0].add('version', 1))
+
+    def test_process_local_cache_with_several_workers(self):
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '3'}):
+            self.assertEqual([e.id for e in checks.check_shared_cache(None)], ['pokedata.E001'])
+            shared = {'default': {'BACKEND': 'pokedata.filecache.FileBasedCache', 'LOCATION': self.directory}}
+            with override_settings(CACHES=shared):
+                self.assertEqual(checks.check_shared_cache(None), [])
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '1'}):
+            self.assertEqual(checks.check_shared_cache(None), [])
+
+
+class WarmUpTest(TestCase):
+    def setUp(self):
+        PokemonFactory.create_batch(3)
+        self.saved = dict(warmup.state)
+        warmup.state.update(ready=False, error=None, steps={})
+        self.url = reverse('healthz_ready')
+
+    def tearDown(self):
+        warmup.state.update(self.saved)
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_not_ready_until_warmed_up(self):
+        self.assertEqual(self.client.get(self.url).status_code, 503)
+        warmup.warm_up()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.json()['steps']), [name for name, _ in warmup.STEPS])
+
+    def test_warm_up_loads_the_replicas(self):
+        warmup.warm_up()
+        with self.assertNumQueries(0):
+            similar_index.current()
+            name_index.current()
+
+    @override_settings(POKEDATA_WARM_UP=False)
+    def test_disabled(self):
+        warmup.warm_up()
+        self.assertEqual(self.client.get(self.url).json(),
+                         {'ready': True, 'error': None, 'steps': {}})
+
+    def test_failed_step_is_retried(self):
+        def broken():
+            raise RuntimeError('no')
+        steps, warmup.STEPS = warmup.STEPS, (('broken', broken),)
+        try:
+            with self.assertLogs('pokedata.warmup', 'ERROR'):
+                warmup.warm_up()
+            with self.assertLogs('pokedata.warmup', 'ERROR'):
+                response = self.client.get(self.url)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response.json()['error'], 'broken: no')
+        finally:
+            warmup.STEPS = steps
+        # the next check retries, now that the step gets through
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['error'])
+
+
+class PokemonFragmentCacheTest(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.pokemons = PokemonFactory.create_batch(20, generation=1, pokemon_type1='Fire')
+        self.url = reverse('pokemon_by_generation', args=[1])
+
+    def tearDown(self):
+        Pokemon.objects.all().delete()
+        PokemonFactory.reset_sequence(0)
+
+    def test_warm_list_page_runs_no_queries(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first.content, second.content)
+        for p in self.pokemons:
+            self.assertContains(second, f'href="/pokemon/{p.pk}/"')
+        self.assertContains(second, self.pokemons[0].pokemon_name)
+
+    def test_rows_cached_per_pokemon(self):
+        self.client.get(self.url)
+        rows = row_fragments.current().html
+        self.assertTrue(all(p.pk in rows for p in self.pokemons))
+        # another list of the same Pokémon reuses them
+        response = self.client.get(reverse('pokemon_list') + '?type=Fire')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, rows[self.pokemons[0].pk], html=True)
+
+    def test_write_refreshes_only_its_row(self):
+        self.client.get(self.url)
+        mon, other = self.pokemons[:2]
+        mon.pokemon_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            mon.save()
+        rows = row_fragments.current().html
+        self.assertNotIn(mon.pk, rows)
+        self.assertIn(other.pk, rows)
+        self.assertContains(self.client.get(self.url), 'Renamed')
+
+    def test_rolled_back_write_leaves_no_phantom(self):
+        self.client.get(self.url)
+        mon = self.pokemons[0]
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            mon.pokemon_name = 'Zzphantom'
+            mon.save()
+            # reloaded and filled by the writer, uncommitted row and all
+            row_fragments.version = None
+            self.assertContains(self.client.get(self.url), 'Zzphantom')
+            raise RuntimeError
+        self.assertNotIn('Zzphantom', row_fragments.current().html.get(mon.pk, ''))
+        self.assertNotContains(self.client.get(self.url), 'Zzphantom')
+
+    def test_empty_list(self):
+        response = self.client.get(reverse('pokemon_by_generation', args=[6]))
+        self.assertContains(response, 'No Pokémon found.')
+
+    def test_server_timing_reports_render_time(self):
+        response = self.client.get(self.url)
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", render;dur=[\d.]+, app;dur=[\d.]+$')
+
+    def test_index_skips_counting_pokemon(self):
+        self.client.get(reverse('pokemon_list'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('pokemon_list'))
@@ -0,0 +1,109 @@
+import numpy as np
+
+from .models import PokemonType
+
+TYPES = list(PokemonType.values)
+
+# attacking type → {defending type: multiplier}, current (Gen VI+) chart;
+# every pair not listed is 1x
+_EFFECTIVENESS = {
+    'Normal':   {'Rock': .5, 'Ghost': 0, 'Steel': .5},
+    'Fire':     {'Fire': .5, 'Water': .5, 'Grass': 2, 'Ice': 2, 'Bug': 2, 'Rock': .5,
+                 'Dragon': .5, 'Steel': 2},
+    'Water':    {'Fire': 2, 'Water': .5, 'Grass': .5, 'Ground': 2, 'Rock': 2, 'Dragon': .5},
+    'Electric': {'Water': 2, 'Electric': .5, 'Grass': .5, 'Ground': 0, 'Flying': 2, 'Dragon': .5},
+    'Grass':    {'Fire': .5, 'Water': 2, 'Grass': .5, 'Poison': .5, 'Ground': 2, 'Flying': .5,
+                 'Bug': .5, 'Rock': 2, 'Dragon': .5, 'Steel': .5},
+    'Ice':      {'Fire': .5, 'Water': .5, 'Grass': 2, 'Ice': .5, 'Ground': 2, 'Flying': 2,
+                 'Dragon': 2, 'Steel': .5},
+    'Fighting': {'Normal': 2, 'Ice': 2, 'Poison': .5, 'Flying': .5, 'Psychic': .5, 'Bug': .5,
+                 'Rock': 2, 'Ghost': 0, 'Dark': 2, 'Steel': 2, 'Fairy': .5},
+    'Poison':   {'Grass': 2, 'Poison': .5, 'Ground': .5, 'Rock': .5, 'Ghost': .5, 'Steel': 0,
+                 'Fairy': 2},
+    'Ground':   {'Fire': 2, 'Electric': 2, 'Grass': .5, 'Poison': 2, 'Flying': 0, 'Bug': .5,
+                 'Rock': 2, 'Steel': 2},
+    'Flying':   {'Electric': .5, 'Grass': 2, 'Fighting': 2, 'Bug': 2, 'Rock': .5, 'Steel': .5},
+    'Psychic':  {'Fighting': 2, 'Poison': 2, 'Psychic': .5, 'Dark': 0, 'Steel': .5},
+    'Bug':      {'Fire': .5, 'Grass': 2, 'Fighting': .5, 'Poison': .5, 'Flying': .5,
+                 'Psychic': 2, 'Ghost': .5, 'Dark': 2, 'Steel': .5, 'Fairy': .5},
+    'Rock':     {'Fire': 2, 'Ice': 2, 'Fighting': .5, 'Ground': .5, 'Flying': 2, 'Bug': 2,
+                 'Steel': .5},
+    'Ghost':    {'Normal': 0, 'Psychic': 2, 'Ghost': 2, 'Dark': .5},
+    'Dragon':   {'Dragon': 2, 'Steel': .5, 'Fairy': 0},
+    'Dark':     {'Fighting': .5, 'Psychic': 2, 'Ghost': 2, 'Dark': .5, 'Fairy': .5},
+    'Steel':    {'Fire': .5, 'Water': .5, 'Electric': .5, 'Ice': 2, 'Rock': 2, 'Steel': .5,
+                 'Fairy': 2},
+    'Fairy':    {'Fire': .5, 'Fighting': 2, 'Poison': .5, 'Dragon': 2, 'Dark': 2, 'Steel': .5},
+}
+
+# CHART[attacking, defending], rows and columns in TYPES order
+CHART = np.ones((len(TYPES), len(TYPES)))
+for _attacking, _row in _EFFECTIVENESS.items():
+    for _defending, _multiplier in _row.items():
+        CHART[TYPES.index(_attacking), TYPES.index(_defending)] = _multiplier
+CHART.setflags(write=False)
+
+# StatsSnapshot stores "no second type" as -1; these indexes use len(TYPES)
+NONE = len(TYPES)
+# an immunity (0x) counts as this much damage taken when scoring, so
+# immune counters rank highest without dividing by zero
+IMMUNE = 0.125
+
+
+def type_code(value):
+    return TYPES.index(value)
+
+
+def _combos(snapshot):
+    """(n,) index of each row's (type1, type2) pair into a (18, 19) table."""
+    type2 = np.where(snapshot.type2 < 0, NONE, snapshot.type2)
+    return snapshot.type1.astype(np.intp) * (NONE + 1) + type2
+
+
+def taken(attacking):
+    """
+    (18, 19) worst multiplier each type combination takes from the
+    attacking type codes, i.e. from the attacker's best STAB type;
+    column NONE is the single-typed case.
+    """
+    # an extra column of 1s stands for "no second type"
+    against = np.hstack([CHART, np.ones((len(TYPES), 1))])
+    worst = np.zeros((len(TYPES), NONE + 1))
+    for code in attacking:
+        worst = np.maximum(worst, against[code, :len(TYPES), None] * against[code, None, :])
+    return worst
+
+
+def dealt(defending):
+    """
+    (18, 19) best multiplier any of a combination's own types deals to a
+    defender with the type codes `defending` (-1 for no second type).
+    """
+    per_type = np.ones(len(TYPES))
+    for code in set(c for c in defending if c >= 0):
+        per_type = per_type * CHART[:, code]
+    # "no second type" attacks with nothing
+    per_type = np.append(per_type, 0)
+    return np.maximum(per_type[:len(TYPES), None], per_type[None, :])
+
+
+def matchups(snapshot, opponents):
+    """
+    (offense, defense, score) vectors for every row against `opponents`,
+    a list of (type1, type2) code pairs: mean multiplier dealt, mean
+    multiplier taken, and their ratio.
+
+    Scored once per type combination (18 x 19), then gathered per row, so
+    the per-row cost is a single indexing pass whatever the opponents.
+    """
+    offense = np.zeros((len(TYPES), NONE + 1))
+    defense = np.zeros((len(TYPES), NONE + 1))
+    for opponent in opponents:
+        offense += dealt(opponent)
+        defense += taken([c for c in opponent if c >= 0])
+    offense /= len(opponents)
+    defense /= len(opponents)
+    score = offense / np.maximum(defense, IMMUNE)
+
+    combos = _combos(snapshot)
+    return offense.ravel()[combos], defense.ravel()[combos], score.ravel()[combos]
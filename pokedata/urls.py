@@ -1,11 +1,20 @@
+from django.conf import settings
 from django.urls import include, path
 from . import views
 from . import api
 
+# the read endpoints: async under ASGI (see asyncviews.py)
+if settings.POKEDATA_ASYNC_VIEWS:
+    from . import asyncviews as reads
+else:
+    reads = api
+
 
 urlpatterns = [
 
     path('', views.api_home, name='api_home'),
+    path('metrics', views.metrics, name='metrics'),
+    path('healthz/ready', views.readiness, name='healthz_ready'),
 
     path('pokemon/', views.PokemonList.as_view(), name='pokemon_list'),
     path('pokemon/', views.PokemonList.as_view(),   name='pokemon-index'),
@@ -23,12 +32,25 @@ urlpatterns = [
     
 
     #  DRF API 
-    path('api/pokemon/', api.pokemon_list, name='api_pokemon-list-api'),
-    path('api/pokemon/<int:pk>/', api.pokemon_detail, name='api_pokemon-detail-api'),
+    path('api/pokemon/', reads.pokemon_list, name='api_pokemon-list-api'),
+    path('api/pokemon/<int:pk>/', reads.pokemon_detail, name='api_pokemon-detail-api'),
+    path('api/pokemon/bulk/', api.pokemon_bulk, name='api_pokemon-bulk'),
+    path('api/pokemon/search/', reads.pokemon_search, name='api_pokemon-search'),
+    path('api/pokemon/changes', reads.pokemon_changes, name='api_pokemon-changes'),
+    path('api/pokemon/export', reads.pokemon_export, name='api_pokemon-export'),
+    path('api/pokemon/<int:pk>/zscores/', reads.stats_zscores, name='api_pokemon_zscores'),
+    path('api/pokemon/<int:pk>/similar/', reads.pokemon_similar, name='api_pokemon_similar'),
+    path('api/pokemon/<int:pk>/counters/', reads.pokemon_counters, name='api_pokemon_counters'),
+    path('api/pokemon/matchups/', reads.pokemon_matchups, name='api_pokemon_matchups'),
+    path('api/pokemon/types/chart/', reads.type_chart, name='api_pokemon_type_chart'),
+    path('api/pokemon/stats/percentiles/', reads.stats_percentiles, name='api_pokemon_stats_percentiles'),
+    path('api/pokemon/stats/summary/', reads.stats_summary, name='api_pokemon_stats_summary'),
+    path('api/pokemon/aggregates/', reads.pokemon_aggregates, name='api_pokemon_aggregates'),
+    path('api/pokemon/stats/top/', reads.stats_top, name='api_pokemon_stats_top'),
     path('api/create_pokemon/', api.create_pokemon, name='api_create-pokemon'),
-    path('api/pokemon/gen/<int:gen>/', api.pokemon_by_generation, name='api_pokemon_by_generation'),
-    path('api/pokemon/legendary/', api.pokemon_legendary, name='api_pokemon_legendary'),
-    path('api/pokemon/type/<str:type1>/<str:type2>/', api.pokemon_by_type, name='api_pokemon_by_type_one'),
-    path('api/pokemon/type/<str:type1>/', api.pokemon_by_type, name='api_pokemon_by_type_one'),
-    path('pokemon/type/<str:type1>/<str:type2>', api.pokemon_by_type, name='pokemon_by_type_two'),
+    path('api/pokemon/gen/<int:gen>/', reads.pokemon_by_generation, name='api_pokemon_by_generation'),
+    path('api/pokemon/legendary/', reads.pokemon_legendary, name='api_pokemon_legendary'),
+    path('api/pokemon/type/<str:type1>/<str:type2>/', reads.pokemon_by_type, name='api_pokemon_by_type_one'),
+    path('api/pokemon/type/<str:type1>/', reads.pokemon_by_type, name='api_pokemon_by_type_one'),
+    path('pokemon/type/<str:type1>/<str:type2>', reads.pokemon_by_type, name='pokemon_by_type_two'),
 ]
@@ -1,16 +1,24 @@
+from django.db import DatabaseError, connection
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
+from django.template import Context
+from django.template.loader import get_template, render_to_string
 from django.urls import reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.db.models import Q
+from django.utils.safestring import mark_safe
 
 
+from .cache import DatasetReplica, cache_timeout, get_cache, versioned_key
+from .metrics import registry
+from . import rendering, warmup
 from .forms import PokemonForm
-from .models import Pokemon, Generation, PokemonType
+from .models import Pokemon, Generation, PokemonType, canonical_type
 
 
 def paginate_master(request, per_page=15, page_kwarg="sidebar_page"):
-    all_qs    = Pokemon.objects.all()
+    all_qs    = Pokemon.objects.only('pokemon_name')
     paginator = Paginator(all_qs, per_page)
     page_num  = request.GET.get(page_kwarg)
     try:
@@ -21,82 +29,138 @@ def paginate_master(request, per_page=15, page_kwarg="sidebar_page"):
         page = paginator.page(paginator.num_pages)
     return page
 
+def sidebar_context(request, per_page=15, page_kwarg="sidebar_page"):
+    """
+    The rendered sidebar for every HTML page. Its COUNT(*) and page query
+    only run once per dataset version and sidebar page; after that the
+    fragment comes straight from the cache.
+    """
+    cache = get_cache()
+    key   = versioned_key('sidebar', per_page, request.GET.get(page_kwarg))
+    html  = cache.get(key)
+    if html is None:
+        page = paginate_master(request, per_page=per_page, page_kwarg=page_kwarg)
+        html = render_to_string('pokedata/sidebar.html', {
+            'master_pokemons': page,
+            # this gives you e.g. [1, '…', 4, 5, 6, '…', 20]
+            'sidebar_pages': page.paginator.get_elided_page_range(
+                page.number,
+                on_each_side=2,
+                on_ends=1
+            ),
+        })
+        cache.set(key, html, cache_timeout())
+    return {'sidebar': mark_safe(html)}
+
+class RowFragments(DatasetReplica):
+    """
+    pokemon_row.html rendered per Pokémon id, for the current dataset
+    version. Filled as list pages need rows; a write drops just the rows
+    it touched, so the other lists keep theirs (see DatasetReplica).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.html = {}
+
+    def load(self):
+        self.html = {}
+
+    def apply(self, saved, deleted):
+        for pk in deleted:
+            self.html.pop(pk, None)
+        for pokemon in saved:
+            self.html.pop(pokemon.pk, None)
+
+
+row_fragments = RowFragments()
+
+
+def pokemon_rows(request, pokemons, page_kwarg="sidebar_page"):
+    """
+    The table rows of a Pokémon list page, pre-rendered. The page's rows
+    are cached as one fragment per dataset version and URL (the sidebar's
+    own page aside), so a warm page neither queries nor renders them;
+    otherwise they are joined from row_fragments, rendering only the rows
+    it is missing.
+    """
+    cache = get_cache()
+    params = sorted((k, v) for k, v in request.GET.items() if k != page_kwarg)
+    page_key = versioned_key('pokemon_rows', request.path, params)
+    html = cache.get(page_key)
+    if html is None:
+        fragments = row_fragments.current()
+        version, known = fragments.version, fragments.html
+        if hasattr(pokemons, 'values_list'):
+            pokemons = pokemons.values_list('pk', 'pokemon_name')
+        else:
+            pokemons = [(p.pk, p.pokemon_name) for p in pokemons]
+        rows, missing = [], {}
+        template, context = get_template('pokedata/pokemon_row.html').template, Context()
+        with rendering.timing():
+            for pk, name in pokemons:
+                row = known.get(pk)
+                if row is None:
+                    with context.push(p={'pk': pk, 'pokemon_name': name}):
+                        row = missing[pk] = template.render(context)
+                rows.append(row)
+        # not if a write came in since: the rows may predate it
+        if fragments.version == version:
+            known.update(missing)
+        html = ''.join(rows)
+        cache.set(page_key, html, cache_timeout())
+    return {'rows': mark_safe(html)}
+
 class SidebarMixin:
     sidebar_per_page   = 15
     sidebar_page_kwarg = "sidebar_page"
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        page = paginate_master(
+        ctx.update(sidebar_context(
             self.request,
             per_page=self.sidebar_per_page,
             page_kwarg=self.sidebar_page_kwarg
-        )
-        ctx["master_pokemons"] = page
-        # this gives you e.g. [1, '…', 4, 5, 6, '…', 20]
-        ctx["sidebar_pages"] = page.paginator.get_elided_page_range(
-            page.number,
-            on_each_side=2,
-            on_ends=1
-        )
+        ))
         return ctx
 
 def pokemon_by_generation(request, gen):
     pokemons     = Pokemon.objects.filter(generation=gen)
-    page         = paginate_master(request)
-    sidebar_pages = page.paginator.get_elided_page_range(
-        number=page.number,
-        on_each_side=2,
-        on_ends=1,
-    )
     return render(request, 'pokedata/list.html', {
-        'master_pokemons': page,     
-        'sidebar_pages':  sidebar_pages,
-        'pokemons':        pokemons,
+        **sidebar_context(request),
+        **pokemon_rows(request, pokemons),
         'current_generation': gen,
     })
 
 def pokemon_legendary(request):
     pokemons     = Pokemon.objects.filter(legendary=True)
-    page         = paginate_master(request)
-    sidebar_pages = page.paginator.get_elided_page_range(
-        number=page.number,
-        on_each_side=2,
-        on_ends=1,
-    )
     return render(request, 'pokedata/list.html', {
-        'master_pokemons': page,
-        'sidebar_pages':  sidebar_pages,
-        'pokemons':        pokemons,
+        **sidebar_context(request),
+        **pokemon_rows(request, pokemons),
     })
 
 def pokemon_by_type(request, type1, type2=None):
+    type1 = canonical_type(type1)
+    type2 = canonical_type(type2)
     if type2:
         qs = (
-            Pokemon.objects.filter(pokemon_type1__iexact=type1,
-                                   pokemon_type2__iexact=type2)
+            Pokemon.objects.filter(pokemon_type1=type1,
+                                   pokemon_type2=type2)
             | 
-            Pokemon.objects.filter(pokemon_type1__iexact=type2,
-                                   pokemon_type2__iexact=type1)
+            Pokemon.objects.filter(pokemon_type1=type2,
+                                   pokemon_type2=type1)
         )
         title = f"{type1.title()} / {type2.title()}"
     else:
         qs = Pokemon.objects.filter(
-            Q(pokemon_type1__iexact=type1) |
-            Q(pokemon_type2__iexact=type1)
+            Q(pokemon_type1=type1) |
+            Q(pokemon_type2=type1)
         )
         title = type1.title()
 
-    # paginate the sidebar
-    page = paginate_master(request)
-    sidebar_pages = page.paginator.get_elided_page_range(
-        number=page.number, on_each_side=2, on_ends=1
-    )
-
     return render(request, 'pokedata/list.html', {
-        'master_pokemons': page,
-        'sidebar_pages':   sidebar_pages,
-        'pokemons':        qs.distinct(),
+        **sidebar_context(request),
+        **pokemon_rows(request, qs.distinct()),
         'type':            title,
     })
 
@@ -104,16 +168,6 @@ class PokemonDetail(SidebarMixin, DetailView):
     model               = Pokemon
     context_object_name = 'pokemon'
     template_name       = 'pokedata/pokemon.html'
-
-    # you can delete this override if SidebarMixin already adds master_pokemons & sidebar_pages
-    def get_context_data(self, **kwargs):
-        ctx = super().get_context_data(**kwargs)
-        page = paginate_master(self.request)
-        ctx['master_pokemons'] = page
-        ctx['sidebar_pages'] = page.paginator.get_elided_page_range(
-            number=page.number, on_each_side=2, on_ends=1
-        )
-        return ctx
     
 class PokemonList(SidebarMixin, ListView):
     model = Pokemon
@@ -129,12 +183,13 @@ class PokemonList(SidebarMixin, ListView):
         if gen:
             qs = qs.filter(generation=gen)
         if t:
+            t = canonical_type(t)
             qs = qs.filter(
-                Q(pokemon_type1__iexact=t) |
-                Q(pokemon_type2__iexact=t)
+                Q(pokemon_type1=t) |
+                Q(pokemon_type2=t)
             )
         if legendary == 'true':
-            qs = qs.filter(is_legendary=True)
+            qs = qs.filter(legendary=True)
         return qs
 
     def get_context_data(self, **kwargs):
@@ -147,8 +202,16 @@ class PokemonList(SidebarMixin, ListView):
         ctx['gen_choices']  = Generation.choices        # [(1,"Generation I"),(2,"Generation II"),...]
         ctx['type_choices'] = PokemonType.choices       # [("Normal","Normal"),("Fire","Fire"),...]
 
+        if self.request.GET.get('type'):
+            ctx.update(pokemon_rows(self.request, ctx['pokemons']))
         return ctx
 
+    def get_paginate_by(self, queryset):
+        # index.html lists no Pokémon: skip the COUNT(*) of paginating them
+        if not self.request.GET.get('type'):
+            return None
+        return super().get_paginate_by(queryset)
+
     def get_template_names(self):
         if self.request.GET.get('type'):
             return ['pokedata/list.html']
@@ -178,4 +241,21 @@ def api_home(request):
     return render(request, 'pokedata/api_home.html', {
         'gen_choices': Generation.choices,
         'type_choices': PokemonType.choices,
-    })
\ No newline at end of file
+    })
+
+def metrics(request):
+    """GET /metrics → every worker's request metrics, for Prometheus to scrape"""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def readiness(request):
+    """GET /healthz/ready → 200 once this worker is warmed up (see warmup.py) and the database answers, else 503"""
+    if warmup.state['error']:
+        # e.g. the database was down at boot: try again
+        warmup.warm_up()
+    body = dict(warmup.state)
+    try:
+        connection.ensure_connection()
+    except DatabaseError as exc:
+        body['error'] = body['error'] or f'database: {exc}'
+    ready = body['ready'] and not body['error']
+    return JsonResponse({**body, 'ready': ready}, status=200 if ready else 503)
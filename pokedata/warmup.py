@@ -0,0 +1,103 @@
+"""
+Worker warm-up: do up front what the first requests after a worker boots
+would otherwise pay for, then report ready on /healthz/ready.
+
+Servers call warm_up() once per worker process before it takes requests:
+gunicorn from the post_worker_init hook in gunicorn.conf.py, uvicorn when
+it imports pokeweb/asgi.py. Not from PokedataConfig.ready(), which also
+runs for every manage.py command (migrate included, before the tables
+exist) and, under gunicorn --preload, before the workers are forked.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.template.loader import get_template
+from django.urls import URLResolver, get_resolver
+
+logger = logging.getLogger('pokedata.warmup')
+
+_lock = threading.Lock()
+# this process's warm-up: {'ready': bool, 'error': str or None, 'steps': {name: ms}}
+state = {'ready': False, 'error': None, 'steps': {}}
+
+
+def _urls():
+    """Compile every URL pattern's regex and the reverse() lookup tables."""
+    def compile_all(resolver):
+        for pattern in resolver.url_patterns:
+            pattern.pattern.regex
+            if isinstance(pattern, URLResolver):
+                compile_all(pattern)
+    resolver = get_resolver()
+    compile_all(resolver)
+    resolver.reverse_dict
+
+
+def _database():
+    """Open every database connection of this thread."""
+    for alias in connections:
+        connections[alias].ensure_connection()
+
+
+def _templates():
+    """Load (and so compile) pokedata's templates and their tag libraries."""
+    root = os.path.join(apps.get_app_config('pokedata').path, 'templates')
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name.endswith('.html'):
+                get_template(os.path.relpath(os.path.join(directory, name), root))
+
+
+def _indexes():
+    """Load the in-memory replicas of the Pokemon table."""
+    from .encoders import row_encoder
+    from .search import name_index
+    from .similar import similar_index
+    from .stats import get_snapshot
+
+    get_snapshot()
+    name_index.current()
+    similar_index.current()
+    row_encoder()
+
+
+STEPS = (
+    ('urls',      _urls),
+    ('database',  _database),
+    ('templates', _templates),
+    ('indexes',   _indexes),
+)
+
+
+def warm_up():
+    """
+    Run STEPS once per process (settings.POKEDATA_WARM_UP), timing each.
+    A failed step is logged and leaves the process not ready until a
+    later call gets through them all (/healthz/ready calls again while
+    there is an error); requests are still served, paying for whatever
+    was not warmed.
+    """
+    with _lock:
+        if state['ready']:
+            return state
+        if not getattr(settings, 'POKEDATA_WARM_UP', True):
+            state['ready'] = True
+            return state
+        state.update(error=None, steps={})
+        for name, step in STEPS:
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as exc:
+                logger.exception('warm-up step %s failed', name)
+                state['error'] = f'{name}: {exc}'
+                return state
+            state['steps'][name] = round((time.perf_counter() - start) * 1000, 1)
+        state['ready'] = True
+        logger.info('worker %d warmed up: %s', os.getpid(), state['steps'])
+        return state
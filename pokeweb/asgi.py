@@ -1,5 +1,5 @@
 """
-ASGI config for bioweb project.
+ASGI config for pokeweb project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
@@ -9,8 +9,18 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pokeweb.settings')
+# serve the read API from pokedata.asyncviews
+os.environ.setdefault('POKEDATA_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+# get_asgi_application(), with a handler that streams off the event loop
+from pokedata.asyncviews import ASGIHandler  # noqa: E402 (needs the app registry)
+application = ASGIHandler()
+
+# uvicorn imports this module in each worker before serving
+from pokedata.warmup import warm_up  # noqa: E402 (needs the app registry)
+warm_up()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -51,10 +52,18 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'pokedata.streaming.NDJSONRenderer',
+    ],
 }
 
 MIDDLEWARE = [
+    # first, so their timings cover the rest of the stack
+    'pokedata.middleware.MetricsMiddleware',
+    'pokedata.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,7 +77,8 @@ ROOT_URLCONF = 'pokeweb.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, timing renders per request (Server-Timing: render)
+        'BACKEND': 'pokedata.rendering.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,17 +92,148 @@ TEMPLATES = [
     },
 ]
 
+# Compile each template once per process (the cached loader). Off by
+# default while DEBUG is on, so that template edits show up without a
+# restart; production sets POKEDATA_CACHED_TEMPLATES=1.
+if os.environ.get('POKEDATA_CACHED_TEMPLATES', '0' if DEBUG else '1') == '1':
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'pokeweb.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+POKEDATA_DB_PATH = os.environ.get('POKEDATA_DB_PATH', BASE_DIR / "db.sqlite3")
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / "db.sqlite3",
+        'NAME': POKEDATA_DB_PATH,
+    }
+}
+
+# POKEDATA_DB_MODE=production: several gunicorn workers on the one SQLite
+# file. WAL lets readers and the writer work side by side; each process
+# keeps one writing connection (`default`) and one read-only one
+# (`replica`, see pokedata/routers.py), both persistent.
+POKEDATA_DB_MODE = os.environ.get('POKEDATA_DB_MODE', 'default')
+
+if POKEDATA_DB_MODE == 'production':
+    SQLITE_PRAGMAS = {
+        'synchronous':  'NORMAL',       # durable at checkpoints; safe with WAL
+        'mmap_size':    268435456,      # 256 MiB read through the page cache
+        'cache_size':   -65536,         # 64 MiB per connection
+        'temp_store':   'MEMORY',
+    }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'pokedata.sqlite',
+            'NAME': POKEDATA_DB_PATH,
+            'CONN_MAX_AGE': None,
+            'OPTIONS': {
+                # seconds a writer waits for the lock before "database is locked"
+                'timeout': 20,
+                'immediate': True,
+                'pragmas': {'journal_mode': 'WAL', **SQLITE_PRAGMAS},
+            },
+        },
+        'replica': {
+            'ENGINE': 'pokedata.sqlite',
+            'NAME': POKEDATA_DB_PATH,
+            'CONN_MAX_AGE': None,
+            'OPTIONS': {
+                'timeout': 20,
+                'pragmas': {'query_only': 'ON', **SQLITE_PRAGMAS},
+            },
+            'TEST': {'MIRROR': 'default'},
+        },
     }
+    DATABASE_ROUTERS = ['pokedata.routers.ReadReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+#
+# The cache also holds the dataset version every worker checks for writes
+# (pokedata/cache.py). Local memory is per process, so it only does for a
+# single one; POKEDATA_DB_MODE=production shares a directory between the
+# workers of the host instead (system check pokedata.E001 catches a
+# per-process cache with WEB_CONCURRENCY > 1).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pokedata',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+if POKEDATA_DB_MODE == 'production':
+    CACHES['default'] = {
+        'BACKEND': 'pokedata.filecache.FileBasedCache',
+        'LOCATION': os.environ.get('POKEDATA_CACHE_DIR',
+                                   os.path.join(tempfile.gettempdir(), 'pokedata-cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+# Cache alias and timeout (seconds) for pokedata's API response cache;
+# entries are invalidated on every Pokemon write regardless of timeout.
+POKEDATA_CACHE_ALIAS = 'default'
+POKEDATA_CACHE_TIMEOUT = 3600
+# Cache-Control max-age (seconds) of cached API responses; 0 makes
+# clients and front caches revalidate with If-None-Match every time
+POKEDATA_HTTP_MAX_AGE = 0
+# ETag/Last-Modified on cached API responses, and 304s for them. They
+# come from the dataset version kept in POKEDATA_CACHE_ALIAS, so with
+# the per-process LocMemCache above each worker would issue its own;
+# None: on only when that cache is shared (Redis, Memcached, database)
+POKEDATA_HTTP_VALIDATORS = None
+
+# Days compaction keeps tombstones in the change log for; clients that
+# poll /api/pokemon/changes less often than this have to resync
+POKEDATA_CHANGES_RETENTION = 30
+
+# SQL instrumentation (pokedata.middleware): statements slower than this
+# many ms, or run this many times in one request, are logged to sql.log
+POKEDATA_SLOW_QUERY_MS = 100
+POKEDATA_REPEATED_QUERY_LIMIT = 10
+
+# Directory the gunicorn workers share /metrics through; unset for a
+# single process. Empty it whenever the server is restarted.
+POKEDATA_METRICS_DIR = os.environ.get('POKEDATA_METRICS_DIR')
+
+# Route the read API to pokedata.asyncviews (set by pokeweb/asgi.py), and
+# the number of threads those views run their database work in.
+POKEDATA_ASYNC_VIEWS = os.environ.get('POKEDATA_ASYNC_VIEWS', '') == '1'
+POKEDATA_ASYNC_DB_THREADS = int(os.environ.get('POKEDATA_ASYNC_DB_THREADS', 16))
+
+# Warm each server worker up before it takes requests (pokedata.warmup)
+POKEDATA_WARM_UP = os.environ.get('POKEDATA_WARM_UP', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'timestamped': {'format': '%(asctime)s %(levelname)s %(message)s'},
+    },
+    'handlers': {
+        'sql_log': {
+            'class': 'logging.FileHandler',
+            'filename': BASE_DIR / 'sql.log',
+            'formatter': 'timestamped',
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'pokedata.sql': {'handlers': ['sql_log'], 'level': 'WARNING', 'propagate': False},
+    },
 }
 
 
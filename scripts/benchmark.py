@@ -0,0 +1,1188 @@
+#!/usr/bin/env python
+"""
+Performance benchmarks for the pokedata app.
+
+Every benchmark runs against a throw-away test database seeded with
+random Pokémon, so db.sqlite3 is never touched.
+
+    python scripts/benchmark.py                          # all, 10k rows
+    python scripts/benchmark.py pagination --rows 1M
+    python scripts/benchmark.py endpoints --rows 100k --json results.json
+    python scripts/benchmark.py endpoints --rows 100k --compare results.json
+    python scripts/benchmark.py concurrency sqlite_modes --rows 100k
+    python scripts/benchmark.py conditional --rows 100k
+    python scripts/benchmark.py export --rows 1M
+
+Benchmarks that return metrics (see `endpoints`) can be written out as
+JSON with --json and checked against such a file with --compare, which
+exits with status 1 when any query count grew or any p50 latency got
+slower than --tolerance allows.
+"""
+import argparse
+import asyncio
+import csv
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import re
+import shutil
+import signal
+import socket
+import sqlite3
+import subprocess
+import tempfile
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+
+SCRIPT_DIR   = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.append(PROJECT_ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pokeweb.settings')
+
+import django
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import Client
+from django.test.testcases import LiveServerThread, _StaticFilesHandler
+from django.test.utils import setup_test_environment
+
+from pokedata import urls
+from pokedata.cache import bump_dataset_version, cache_stats
+from pokedata.models import Pokemon, PokemonType
+from pokedata.pagination import KeysetPagination
+from pokedata.serializers import PokemonSerializer
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def make_pokemon(i, rng=random):
+    stats = [rng.randint(1, 255) for _ in range(6)]
+    types = [t for t, _ in PokemonType.choices]
+    return Pokemon(
+        pokemon_name    = f"Pokemon{i:07d}",
+        pokemon_type1   = rng.choice(types),
+        pokemon_type2   = rng.choice([None] + types),
+        total_stats     = sum(stats),
+        pokemon_HP      = stats[0],
+        attack          = stats[1],
+        defense         = stats[2],
+        special_attack  = stats[3],
+        special_defense = stats[4],
+        speed           = stats[5],
+        generation      = rng.randint(1, 6),
+        legendary       = rng.random() < 0.05,
+    )
+
+
+def seed(rows, batch_size=10_000):
+    """Fill the (empty) Pokemon table with `rows` random entries."""
+    rng = random.Random(42)
+    Pokemon.objects.all().delete()
+    for start in range(0, rows, batch_size):
+        stop = min(start + batch_size, rows)
+        Pokemon.objects.bulk_create(
+            [make_pokemon(i, rng) for i in range(start, stop)],
+            batch_size=batch_size,
+        )
+
+
+def timed(fn, repeat=20):
+    """Run fn `repeat` times, return the per-call latencies in seconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summary(samples):
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50 {statistics.median(ordered) * 1000:8.2f} ms   p99 {p99 * 1000:8.2f} ms"
+
+
+@benchmark('pagination')
+def bench_pagination(client, rows):
+    """Keyset page 1 vs a deep page, against the equivalent OFFSET query."""
+    limit = 100
+    paginator = KeysetPagination()
+    ordered = Pokemon.objects.order_by(*paginator.key_fields)
+    last_page = max(1, rows // limit)
+
+    for page_no in sorted({1, min(10_000, last_page)}):
+        offset = (page_no - 1) * limit
+        if offset:
+            anchor = ordered.values_list(*paginator.key_fields)[offset - 1]
+            cursor = paginator.encode_cursor(list(anchor), reverse=False)
+            url = f'/api/pokemon/?limit={limit}&cursor={cursor}'
+        else:
+            url = f'/api/pokemon/?limit={limit}'
+
+        keyset = timed(lambda: client.get(url))
+        offset_qs = timed(lambda: list(ordered[offset:offset + limit]))
+        print(f"  page {page_no:>6}  keyset  {summary(keyset)}")
+        print(f"  page {page_no:>6}  OFFSET  {summary(offset_qs)}")
+
+
+def traced(fn):
+    """Run fn once, return (seconds, peak traced Python allocation in bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        fn()
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@benchmark('streaming')
+def bench_streaming(client, rows):
+    """Peak memory and time-to-first-byte: buffered list vs ?stream=1."""
+    def first_chunk():
+        next(iter(client.get('/api/pokemon/?stream=1').streaming_content))
+
+    def consume_stream():
+        for _ in client.get('/api/pokemon/?stream=1').streaming_content:
+            pass
+
+    ttfb = timed(first_chunk, repeat=5)
+    print(f"  stream    first chunk   {summary(ttfb)}")
+    seconds, peak = traced(consume_stream)
+    print(f"  stream    total {seconds:7.2f} s   peak {peak / 2**20:8.1f} MiB")
+    seconds, peak = traced(lambda: client.get('/api/pokemon/').content)
+    print(f"  buffered  total {seconds:7.2f} s   peak {peak / 2**20:8.1f} MiB")
+
+
+def rate(samples):
+    return f"{len(samples) / sum(samples):10.1f} req/s"
+
+
+@benchmark('response_cache')
+def bench_response_cache(client, rows):
+    """Requests/second for cache hits vs the uncached (invalidated) path."""
+    urls = [
+        '/api/pokemon/?limit=100',
+        '/api/pokemon/gen/3/',
+        '/api/pokemon/legendary/',
+        '/api/pokemon/type/Fire/',
+    ]
+    for url in urls:
+        def uncached():
+            bump_dataset_version()
+            client.get(url)
+        client.get(url)
+        cold = timed(uncached, repeat=10)
+        warm = timed(lambda: client.get(url), repeat=200)
+        print(f"  {url:<28} uncached {rate(cold)}   cached {rate(warm)}")
+    print(f"  counters {cache_stats()}")
+
+
+def export_csv(path):
+    """Write the current table out in the Pokemon_Data.csv layout."""
+    header = ['#', 'Name', 'Type 1', 'Type 2', 'Total', 'HP', 'Attack', 'Defense',
+              'Sp. Atk', 'Sp. Def', 'Speed', 'Generation', 'Legendary']
+    columns = ['id', 'pokemon_name', 'pokemon_type1', 'pokemon_type2', 'total_stats',
+               'pokemon_HP', 'attack', 'defense', 'special_attack', 'special_defense',
+               'speed', 'generation', 'legendary']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in Pokemon.objects.values_list(*columns).iterator(chunk_size=10_000):
+            writer.writerow(['' if v is None else v for v in row])
+
+
+@benchmark('import')
+def bench_import(client, rows):
+    """scripts/populate_pokemonDB.py vs `manage.py import_pokemon`, rows/second."""
+    import scripts.populate_pokemonDB as pop_mod
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'pokemon.csv')
+        export_csv(path)
+
+        Pokemon.objects.all().delete()
+        start = time.perf_counter()
+        pop_mod.run(path)
+        script = time.perf_counter() - start
+
+        Pokemon.objects.all().delete()
+        start = time.perf_counter()
+        call_command('import_pokemon', path, progress=0, stdout=io.StringIO())
+        command = time.perf_counter() - start
+    finally:
+        shutil.rmtree(tmpdir)
+
+    print(f"  populate_pokemonDB.py  {script:8.2f} s  {rows / script:12,.0f} rows/s")
+    print(f"  import_pokemon         {command:8.2f} s  {rows / command:12,.0f} rows/s")
+
+
+@benchmark('bulk_writes')
+def bench_bulk_writes(client, rows, items=2000):
+    """Rows/second: one request per row vs a single /api/pokemon/bulk/ call."""
+    from pokedata.serializers import PokemonSerializer
+
+    rng = random.Random(7)
+    payload = [
+        {k: v for k, v in PokemonSerializer(make_pokemon(rows + i, rng)).data.items() if k != 'id'}
+        for i in range(items)
+    ]
+
+    def report(label, seconds):
+        print(f"  {label:<22} {seconds:8.2f} s  {items / seconds:10,.0f} rows/s")
+
+    start = time.perf_counter()
+    created = [client.post('/api/create_pokemon/', item, content_type='application/json').json()
+               for item in payload]
+    report('create, single-row', time.perf_counter() - start)
+    start = time.perf_counter()
+    for item in created:
+        client.put(f"/api/pokemon/{item['id']}/", item, content_type='application/json')
+    report('update, single-row', time.perf_counter() - start)
+    start = time.perf_counter()
+    for item in created:
+        client.delete(f"/api/pokemon/{item['id']}/")
+    report('delete, single-row', time.perf_counter() - start)
+
+    start = time.perf_counter()
+    created = client.post('/api/pokemon/bulk/', payload, content_type='application/json').json()
+    report('create, bulk', time.perf_counter() - start)
+    start = time.perf_counter()
+    client.put('/api/pokemon/bulk/', created, content_type='application/json')
+    report('update, bulk', time.perf_counter() - start)
+    start = time.perf_counter()
+    client.delete('/api/pokemon/bulk/', [item['id'] for item in created],
+                  content_type='application/json')
+    report('delete, bulk', time.perf_counter() - start)
+
+
+def micro(samples):
+    ordered = sorted(samples)
+    return f"p50 {statistics.median(ordered) * 1e6:10.1f} us"
+
+
+@benchmark('stats')
+def bench_stats(client, rows):
+    """NumPy snapshot build time and per-query latency vs the ORM equivalent."""
+    import numpy as np
+    from django.db.models import Avg, F
+    from pokedata import stats
+
+    start = time.perf_counter()
+    snapshot = stats.StatsSnapshot.load(0)
+    print(f"  snapshot build          {time.perf_counter() - start:10.3f} s")
+
+    everything = snapshot.mask()
+    weights = np.array([0, 1, 0, 1, 0, 0.5, 0])
+    cases = [
+        ('percentiles(speed)', lambda: stats.percentiles(snapshot, 'speed', [25, 50, 75], everything),
+         lambda: list(Pokemon.objects.order_by('speed').values_list('speed', flat=True))),
+        ('summary(generation)', lambda: stats.summary(snapshot, 'generation', everything),
+         lambda: list(Pokemon.objects.values('generation').annotate(Avg('speed'), Avg('attack')))),
+        ('top-10 weighted', lambda: stats.top(snapshot, snapshot.stats @ weights, 10, everything),
+         lambda: list(Pokemon.objects.order_by(
+             -(F('attack') + F('special_attack') + F('speed') * 0.5))[:10])),
+    ]
+    for label, vectorized, orm in cases:
+        print(f"  {label:<22} numpy {micro(timed(vectorized))}   ORM {micro(timed(orm, repeat=3))}")
+
+
+@benchmark('fieldsets')
+def bench_fieldsets(client, rows):
+    """Full rows vs ?fields=id,pokemon_name on the list endpoint."""
+    # a distinct throwaway parameter per call keeps the response cache out
+    n = iter(range(10**9))
+    for label, params in [('all fields', {}), ('id,pokemon_name', {'fields': 'id,pokemon_name'})]:
+        get = lambda: client.get('/api/pokemon/', {**params, 'nocache': next(n)})
+        size = len(get().content)
+        samples = timed(get, repeat=5)
+        print(f"  {label:<22} {summary(samples)}   {size / 1e6:7.2f} MB   {rows / statistics.median(samples):9,.0f} rows/s")
+
+
+@benchmark('serialization')
+def bench_serialization(client, rows):
+    """
+    PokemonSerializer + JSONRenderer vs PokemonRowEncoder over the same
+    rows, then the endpoint end to end (which uses the encoder).
+    """
+    from django.db.models import Q
+    from rest_framework.renderers import JSONRenderer
+    from pokedata.encoders import row_encoder
+    from pokedata.serializers import PokemonSerializer
+
+    encoder = row_encoder(None)
+    endpoints = [
+        ('/api/pokemon/',           Pokemon.objects.all()),
+        ('/api/pokemon/gen/3/',     Pokemon.objects.filter(generation=3)),
+        ('/api/pokemon/legendary/', Pokemon.objects.filter(legendary=True)),
+        ('/api/pokemon/type/Fire/', Pokemon.objects.filter(Q(pokemon_type1='Fire') | Q(pokemon_type2='Fire')).distinct()),
+    ]
+    n = iter(range(10**9))
+    for url, qs in endpoints:
+        count = qs.count()
+        serializer = lambda: JSONRenderer().render(PokemonSerializer(qs, many=True).data)
+        fast = lambda: encoder.encode_list(qs.values_list(*encoder.fields)).encode('utf-8')
+        same = serializer() == fast()
+        print(f"  {url}  ({count:,} rows, identical bytes: {same})")
+        repeat = 3 if count > 10_000 else 10
+        for label, fn in [
+            ('serializer', serializer),
+            ('row encoder', fast),
+            # a distinct throwaway parameter per call keeps the response cache out
+            ('HTTP', lambda: client.get(url, {'nocache': next(n)})),
+        ]:
+            samples = timed(fn, repeat=repeat)
+            print(f"    {label:<14} {summary(samples)}   {count / statistics.median(samples):10,.0f} rows/s")
+
+
+@benchmark('instrumentation')
+def bench_instrumentation(client, rows):
+    """QueryInstrumentationMiddleware's cost: the same requests without and with it."""
+    from django.test import modify_settings
+
+    middleware = 'pokedata.middleware.QueryInstrumentationMiddleware'
+    pk = Pokemon.objects.order_by('id').values_list('id', flat=True)[rows // 2]
+    urls = ['/api/pokemon/?limit=100', '/api/pokemon/gen/3/', '/pokemon/', f'/api/pokemon/{pk}/similar/']
+    n = iter(range(10**9))
+    # interleaved rounds, so drift affects both sides alike
+    totals = {'without': [], 'with': []}
+    for _ in range(5):
+        for label, change in [('without', {'remove': middleware}), ('with', {})]:
+            with modify_settings(MIDDLEWARE=change):
+                # a distinct throwaway parameter per call keeps the response cache out
+                totals[label] += timed(lambda: [client.get(url, {'nocache': next(n)}) for url in urls], repeat=10)
+    without, with_ = statistics.median(totals['without']), statistics.median(totals['with'])
+    print(f"  without  {summary(totals['without'])}")
+    print(f"  with     {summary(totals['with'])}")
+    print(f"  overhead {(with_ / without - 1) * 100:+.2f}% ({(with_ - without) * 1e6 / len(urls):+.0f} µs/request)")
+
+
+def server_timing(response):
+    """{'db': ms, 'render': ms, 'app': ms} from the Server-Timing header."""
+    return {name: float(ms) for name, ms in re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing'])}
+
+
+@benchmark('templates')
+def bench_templates(client, rows, repeat=5):
+    """
+    Render and DB time of the HTML list pages (the biggest generation,
+    legendary, a type), from Server-Timing: with every fragment cold,
+    with the page fragment cold but the row fragments warm (after a
+    write to other rows) and warm; with and without the cached template
+    loader.
+    """
+    import copy
+    from django.conf import settings
+    from django.db.models import Count
+    from django.test import override_settings
+
+    gen = Pokemon.objects.values('generation').annotate(n=Count('id')).order_by('-n')[0]['generation']
+    pages = [f'/pokemon/gen/{gen}/', '/pokemon/legendary/', '/pokemon/type/Fire/']
+    cached = copy.deepcopy(settings.TEMPLATES)
+    cached[0]['APP_DIRS'] = False
+    cached[0]['OPTIONS']['loaders'] = [('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ])]
+
+    def cold(path):
+        bump_dataset_version(known=False)
+        return client.get(path)
+
+    def rows_warm(path):
+        bump_dataset_version()
+        return client.get(path)
+
+    states = [('cold', cold), ('rows warm', rows_warm), ('warm', client.get)]
+    results = {}
+    print(f"  {'':<36} {'render p50':>12} {'db p50':>10} {'total p50':>10}")
+    for loader, templates in [('loader', settings.TEMPLATES), ('cached loader', cached)]:
+        with override_settings(TEMPLATES=templates):
+            for path in pages:
+                client.get(path)
+                for state, get in states:
+                    timings = [server_timing(get(path)) for _ in range(repeat)]
+                    render = statistics.median(t.get('render', 0.0) for t in timings)
+                    db = statistics.median(t['db'] for t in timings)
+                    total = statistics.median(t['app'] for t in timings)
+                    label = f'{loader} {path} {state}'
+                    results[label] = {'p50_ms': total, 'render_ms': render, 'db_ms': db}
+                    print(f"  {label[:36]:<36} {render:9.2f} ms {db:7.2f} ms {total:7.2f} ms")
+    return results
+
+
+@benchmark('matchups')
+def bench_matchups(client, rows):
+    """Vectorized counters over the whole table, alone and through HTTP."""
+    from pokedata import stats, typechart
+
+    snapshot = stats.get_snapshot()
+    opponent = [(snapshot.type1[0], snapshot.type2[0])]
+    print(f"  matchups() x1 opponent  {micro(timed(lambda: typechart.matchups(snapshot, opponent)))}")
+    print(f"  matchups() x6 opponents {micro(timed(lambda: typechart.matchups(snapshot, opponent * 6)))}")
+
+    pk = int(snapshot.ids[0])
+    url = f'/api/pokemon/{pk}/counters/'
+    # a new n each time keeps the response cache out of the measurement
+    ns = iter(range(1, 10_000))
+    print(f"  GET {url:<20}{summary(timed(lambda: client.get(url, {'n': next(ns)})))}")
+
+
+@benchmark('similar')
+def bench_similar(client, rows):
+    """KD-tree build, k-NN latency (plain and filtered), write and compaction cost."""
+    from pokedata.similar import SimilarIndex
+
+    index = SimilarIndex()
+    start = time.perf_counter()
+    index.load()
+    print(f"  index build             {time.perf_counter() - start:10.3f} s")
+
+    rng = random.Random(3)
+    pks = [int(pk) for pk in rng.sample(list(index.ids), min(200, len(index.ids)))]
+    queries = iter(pks * 100)
+    print(f"  similar(k=10)           {micro(timed(lambda: index.similar(next(queries)), repeat=200))}")
+    print(f"  similar(k=10, type)     "
+          f"{micro(timed(lambda: index.similar(next(queries), type='Fire'), repeat=200))}")
+    print(f"  similar(k=10, gen+type) "
+          f"{micro(timed(lambda: index.similar(next(queries), generation=3, type='Fire'), repeat=200))}")
+
+    objs = list(Pokemon.objects.filter(pk__in=pks[:100]))
+    start = time.perf_counter()
+    for obj in objs:
+        obj.speed = rng.randint(1, 255)
+        index.apply([obj], [])
+    print(f"  apply() per write       {(time.perf_counter() - start) / len(objs) * 1e6:10.1f} us")
+    print(f"  similar(), 100 pending  {micro(timed(lambda: index.similar(next(queries)), repeat=200))}")
+    start = time.perf_counter()
+    index.compact()
+    print(f"  compact                 {time.perf_counter() - start:10.3f} s")
+
+
+@benchmark('search')
+def bench_search(client, rows, threads=8):
+    """Name index build time and query latency, alone and under concurrency."""
+    from concurrent.futures import ThreadPoolExecutor
+    from pokedata.search import NameIndex
+
+    start = time.perf_counter()
+    index = NameIndex()
+    index.load()
+    print(f"  index build             {time.perf_counter() - start:10.3f} s")
+
+    names = list(Pokemon.objects.values_list('pokemon_name', flat=True)[:200])
+    queries = {
+        'prefix':    [n[:3] for n in names],
+        'substring': [n[2:6] for n in names],
+        'fuzzy':     [n[:-2] + 'xq' for n in names],
+    }
+    for label, qs in queries.items():
+        samples = timed(lambda: [index.search(q) for q in qs], repeat=5)
+        per_query = [s / len(qs) for s in samples]
+        print(f"  {label:<22} {micro(per_query)}")
+
+    qs = queries['prefix'] * 5
+    with ThreadPoolExecutor(threads) as pool:
+        start = time.perf_counter()
+        list(pool.map(lambda q: client.get('/api/pokemon/search/', {'q': q}), qs))
+        elapsed = time.perf_counter() - start
+    print(f"  HTTP x{threads} threads         {len(qs) / elapsed:10.0f} req/s")
+
+
+# ---------------------------------------------------------------------------
+# Every URL in pokedata/urls.py, through the test client and a live server
+# ---------------------------------------------------------------------------
+
+# values for the URL parameters; "pk" is filled in with a seeded row
+URL_ARGS = {'gen': 3, 'type': 'Fire', 'type1': 'Fire', 'type2': 'Flying'}
+# requests to make instead of a plain GET, by URL name
+URL_REQUESTS = {
+    'api_pokemon-list-api':  [('GET', {}), ('GET', {'limit': 100}), ('GET', {'fields': 'id,pokemon_name'})],
+    'pokemon_list':          [('GET', {}), ('GET', {'page': 50})],
+    'api_pokemon-search':    [('GET', {'q': 'pokemon00012'}), ('GET', {'q': 'pokemno'})],
+    'api_pokemon_matchups':  [('GET', {'attacker': 'Fire'})],
+    'api_pokemon_stats_percentiles': [('GET', {'stat': 'attack'})],
+    'api_pokemon-bulk':      [('POST', 'bulk')],
+    'api_create-pokemon':    [('POST', 'one')],
+}
+ENDPOINT_REPEAT = 20
+# per endpoint and transport; slow endpoints stop early, after 3 samples
+ENDPOINT_SECONDS = 10
+
+
+def endpoint_requests(pk):
+    """[(label, method, path, query or JSON body)] covering every URL pattern."""
+    requests, seen = [], set()
+    for pattern in urls.urlpatterns:
+        route = str(pattern.pattern)
+        if route in seen:
+            continue
+        seen.add(route)
+        path = '/' + re.sub(
+            r'<(?:\w+:)?(\w+)>',
+            lambda m: str(pk if m.group(1) == 'pk' else URL_ARGS[m.group(1)]),
+            route,
+        )
+        for method, params in URL_REQUESTS.get(pattern.name, [('GET', {})]):
+            if params == 'one':
+                params = _payload(1)[0]
+            elif params == 'bulk':
+                params = _payload(100)
+            query = '?' + urllib.parse.urlencode(params) if method == 'GET' and params else ''
+            requests.append((f'{method} {path}{query}', method, path, params))
+    return requests
+
+
+def _payload(n):
+    rng = random.Random(n)
+    return [
+        {k: v for k, v in PokemonSerializer(make_pokemon(i, rng)).data.items() if k != 'id'}
+        for i in range(n)
+    ]
+
+
+def _measure(request_fn):
+    """Latencies of request_fn(nonce), with a fresh nonce per call."""
+    samples, deadline = [], time.perf_counter() + ENDPOINT_SECONDS
+    while len(samples) < ENDPOINT_REPEAT and (len(samples) < 3 or time.perf_counter() < deadline):
+        nonce = next(_nonces)
+        start = time.perf_counter()
+        request_fn(nonce)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+# a throwaway query parameter makes every GET miss the response cache
+# (emptying the cache instead would also drop the dataset version, and
+# with it every in-memory replica)
+_nonces = iter(range(10**12))
+
+
+class QueryCounter:
+    """Counts SQL statements run on `connection`, from any thread."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _metrics(samples, **extra):
+    ordered = sorted(samples)
+    return {
+        'p50_ms': round(statistics.median(ordered) * 1000, 3),
+        'p99_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3),
+        'rps':    round(len(ordered) / sum(ordered), 2),
+        'samples': len(ordered),
+        **extra,
+    }
+
+
+def _client_call(client, method, path, params, nonce):
+    if method == 'GET':
+        response = client.get(path, {**params, 'nocache': nonce})
+    else:
+        response = client.generic(method, path, json.dumps(params), content_type='application/json')
+    if response.streaming:
+        # the rows are only read as the body is
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _http_call(base, method, path, params, nonce):
+    if method == 'GET':
+        url = base + path + '?' + urllib.parse.urlencode({**params, 'nocache': nonce})
+        data, headers = None, {}
+    else:
+        url = base + path
+        data, headers = json.dumps(params).encode('utf-8'), {'Content-Type': 'application/json'}
+    request = urllib.request.Request(url, data=data, method=method, headers=headers)
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+
+
+class LiveServer:
+    """Django's threaded WSGI test server, sharing the test database."""
+
+    def __enter__(self):
+        overrides = {}
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # an in-memory database only exists on this connection
+            conn = connections[connection.alias]
+            conn.inc_thread_sharing()
+            overrides[connection.alias] = conn
+        self.thread = LiveServerThread('localhost', _StaticFilesHandler, overrides)
+        self.thread.daemon = True
+        self.thread.start()
+        self.thread.is_ready.wait()
+        if self.thread.error:
+            raise self.thread.error
+        return f'http://localhost:{self.thread.port}'
+
+    def __exit__(self, *exc):
+        self.thread.terminate()
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            connection.dec_thread_sharing()
+
+
+@benchmark('endpoints')
+def bench_endpoints(client, rows):
+    """
+    p50/p99 latency, throughput and SQL queries of every URL in
+    pokedata/urls.py, through the test client and a real WSGI server.
+    Every GET misses the response cache, so these are the uncached
+    costs; the in-memory replicas stay warm.
+    """
+    pk = Pokemon.objects.order_by('id').values_list('id', flat=True)[rows // 2]
+    requests = endpoint_requests(pk)
+    results = {}
+
+    print(f"  {'':<58} {'client p50 / p99, queries':>31} {'wsgi p50 / p99, throughput':>31}")
+    with LiveServer() as base:
+        for label, method, path, params in requests:
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                status = _client_call(client, method, path, params, next(_nonces)).status_code
+            results[f'client {label}'] = _metrics(
+                _measure(lambda nonce: _client_call(client, method, path, params, nonce)),
+                queries=counter.count, status=status,
+            )
+            results[f'wsgi {label}'] = _metrics(
+                _measure(lambda nonce: _http_call(base, method, path, params, nonce)),
+                status=_http_call(base, method, path, params, next(_nonces)),
+            )
+            client_m, wsgi_m = results[f'client {label}'], results[f'wsgi {label}']
+            print(f"  {label[:54]:<54} {status:3d} {client_m['p50_ms']:8.2f} / {client_m['p99_ms']:8.2f} ms"
+                  f" {counter.count:3d} q  {wsgi_m['p50_ms']:8.2f} / {wsgi_m['p99_ms']:8.2f} ms"
+                  f" {wsgi_m['rps']:7.1f}/s")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Real servers in subprocesses, under concurrent clients
+# ---------------------------------------------------------------------------
+
+CONCURRENCY = (10, 100, 1000)
+# per server and concurrency level
+CONCURRENCY_SECONDS = 5
+SERVER_WORKERS = 2
+GTHREAD_THREADS = 8
+# a mix of cheap and heavier reads; {pk} is a seeded row
+CONCURRENCY_PATHS = (
+    '/api/pokemon/{pk}/',
+    '/api/pokemon/?limit=100',
+    '/api/pokemon/gen/3/?limit=100',
+    '/api/pokemon/stats/summary/',
+)
+SERVERS = {
+    'gunicorn sync':    ['gunicorn', '--workers', str(SERVER_WORKERS), '--worker-class', 'sync',
+                         '--backlog', '2048', 'pokeweb.wsgi:application'],
+    'gunicorn gthread': ['gunicorn', '--workers', str(SERVER_WORKERS), '--worker-class', 'gthread',
+                         '--threads', str(GTHREAD_THREADS), '--backlog', '2048',
+                         'pokeweb.wsgi:application'],
+    'uvicorn asgi':     ['uvicorn', '--workers', str(SERVER_WORKERS), '--backlog', '2048',
+                         '--no-access-log', 'pokeweb.asgi:application'],
+}
+
+
+class Server:
+    """One of SERVERS in a subprocess, serving the database file `db_path`."""
+
+    def __init__(self, name, db_path, workers=SERVER_WORKERS, **env):
+        self.name = name
+        self.workers = workers
+        self.env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'pokeweb.settings',
+            'POKEDATA_DB_PATH': db_path,
+            'POKEDATA_ASYNC_VIEWS': '1' if 'asgi' in name else '0',
+            **env,
+        }
+        self.env.pop('POKEDATA_METRICS_DIR', None)
+
+    def __enter__(self):
+        with socket.socket() as s:
+            s.bind(('127.0.0.1', 0))
+            self.port = s.getsockname()[1]
+        command = [sys.executable, '-m', *SERVERS[self.name]]
+        command[3:3] = ['--bind', f'127.0.0.1:{self.port}'] if 'gunicorn' in self.name else \
+                       ['--host', '127.0.0.1', '--port', str(self.port)]
+        command[command.index('--workers') + 1] = str(self.workers)
+        self.process = subprocess.Popen(
+            command, cwd=PROJECT_ROOT, env=self.env, start_new_session=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.perf_counter() + 30
+        while time.perf_counter() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'{self.name} exited with status {self.process.returncode}')
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{self.port}/healthz/ready').read()
+                return self.port
+            except OSError:
+                time.sleep(0.05)
+        self.__exit__()
+        raise RuntimeError(f'{self.name} did not start')
+
+    def __exit__(self, *exc):
+        # the workers too
+        os.killpg(self.process.pid, signal.SIGTERM)
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.process.pid, signal.SIGKILL)
+            self.process.wait()
+
+
+async def _request(port, method, path, body=None):
+    """One request over a fresh connection; the status code."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        payload = b'' if body is None else json.dumps(body).encode('utf-8')
+        head = f'{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n'
+        if body is not None:
+            head += f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n'
+        writer.write(head.encode() + b'\r\n' + payload)
+        await writer.drain()
+        data = await reader.read()
+    finally:
+        writer.close()
+    return int(data.split(b' ', 2)[1])
+
+
+async def _load(port, requests, clients, seconds):
+    """
+    `clients` clients each sending requests() → (kind, method, path, body)
+    back to back for `seconds`; ({kind: latencies}, {kind: errors}, elapsed).
+    GETs get a nonce, so they miss the response cache.
+    """
+    samples, errors = {}, Counter()
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        while time.perf_counter() < deadline:
+            kind, method, path, body = requests()
+            if method == 'GET':
+                path += ('&' if '?' in path else '?') + f'nocache={next(_nonces)}'
+            start = time.perf_counter()
+            try:
+                status = await _request(port, method, path, body)
+            except (OSError, IndexError, ValueError):
+                status = None
+            if status is not None and status < 400:
+                samples.setdefault(kind, []).append(time.perf_counter() - start)
+            else:
+                errors[kind] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return samples, errors, time.perf_counter() - start
+
+
+def _database_copy(directory):
+    """A file copy of the test database, for servers in other processes."""
+    path = os.path.join(directory, 'db.sqlite3')
+    connection.ensure_connection()
+    target = sqlite3.connect(path)
+    connection.connection.backup(target)
+    target.close()
+    return path
+
+
+def _load_metrics(label, port, requests, clients, seconds):
+    samples, errors, elapsed = asyncio.run(_load(port, requests, clients, seconds))
+    results = {}
+    for kind in sorted(set(samples) | set(errors)):
+        if not samples.get(kind):
+            print(f"  {label:<28} {kind:<6} {'':>9} {'':>10} {'':>10} {errors[kind]:7d}")
+            continue
+        metrics = _metrics(samples[kind], errors=errors[kind], clients=clients)
+        metrics['rps'] = round(len(samples[kind]) / elapsed, 2)
+        print(f"  {label:<28} {kind:<6} {metrics['rps']:9.1f} {metrics['p50_ms']:7.1f} ms"
+              f" {metrics['p99_ms']:7.1f} ms {errors[kind]:7d}")
+        results[f'{label} {kind}'] = metrics
+    return results
+
+
+@benchmark('concurrency')
+def bench_concurrency(client, rows):
+    """
+    Throughput and latency of uncached reads with 10, 100 and 1000
+    concurrent clients against gunicorn (sync and gthread workers) and
+    uvicorn (pokedata.asyncviews), each with SERVER_WORKERS processes.
+    Every request opens its own connection. The load generator runs in
+    this process, so on a small machine it competes with the servers.
+    """
+    pk = Pokemon.objects.order_by('id').values_list('id', flat=True)[rows // 2]
+    paths = itertools.cycle([p.format(pk=pk) for p in CONCURRENCY_PATHS])
+    requests = lambda: ('read', 'GET', next(paths), None)
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        db_path = _database_copy(directory)
+        print(f"  {'':<28} {'':<6} {'req/s':>9} {'p50':>10} {'p99':>10} {'errors':>7}")
+        for name in SERVERS:
+            try:
+                with Server(name, db_path) as port:
+                    for clients in CONCURRENCY:
+                        results.update(_load_metrics(
+                            f'{name} x{clients}', port, requests, clients, CONCURRENCY_SECONDS))
+            except (OSError, RuntimeError) as exc:
+                print(f"  {name:<28} skipped: {exc}")
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+# share of requests in `sqlite_modes` that write
+WRITE_SHARE = 0.2
+MIXED_CLIENTS = 50
+MIXED_SECONDS = 10
+
+
+@benchmark('sqlite_modes')
+def bench_sqlite_modes(client, rows):
+    """
+    Mixed reads and writes (WRITE_SHARE of requests: a PUT of one row or
+    a bulk POST of 20) from MIXED_CLIENTS clients against gunicorn
+    gthread, with the default SQLite settings and with
+    POKEDATA_DB_MODE=production. Errors are mostly "database is locked"
+    (HTTP 500).
+    """
+    rng = random.Random(7)
+    pks = list(Pokemon.objects.values_list('id', flat=True)[:1000])
+    rows_by_pk = {p['id']: p for p in PokemonSerializer(Pokemon.objects.filter(id__in=pks), many=True).data}
+    bulk = _payload(20)
+
+    def requests():
+        pk = rng.choice(pks)
+        if rng.random() >= WRITE_SHARE:
+            return rng.choice([
+                ('read', 'GET', f'/api/pokemon/{pk}/', None),
+                ('read', 'GET', '/api/pokemon/?limit=100', None),
+                ('read', 'GET', '/api/pokemon/stats/summary/', None),
+            ])
+        if rng.random() < 0.8:
+            return 'write', 'PUT', f'/api/pokemon/{pk}/', {**rows_by_pk[pk], 'attack': rng.randint(1, 255)}
+        return 'write', 'POST', '/api/pokemon/bulk/', bulk
+
+    results = {}
+    print(f"  {'':<28} {'':<6} {'req/s':>9} {'p50':>10} {'p99':>10} {'errors':>7}")
+    for mode in ('default', 'production'):
+        directory = tempfile.mkdtemp()
+        try:
+            db_path = _database_copy(directory)
+            with Server('gunicorn gthread', db_path, POKEDATA_DB_MODE=mode) as port:
+                results.update(_load_metrics(mode, port, requests, MIXED_CLIENTS, MIXED_SECONDS))
+        except (OSError, RuntimeError) as exc:
+            print(f"  {mode:<28} skipped: {exc}")
+        finally:
+            shutil.rmtree(directory)
+    return results
+
+
+# the first requests a freshly booted worker answers; {pk} is a seeded row
+WARMUP_PATHS = (
+    '/',
+    '/pokemon/',
+    '/pokemon/{pk}/',
+    '/api/pokemon/{pk}/',
+    '/api/pokemon/?limit=100',
+    '/api/pokemon/search/?q=pokemon00012',
+    '/api/pokemon/{pk}/similar/',
+    '/api/pokemon/{pk}/counters/',
+    '/api/pokemon/stats/summary/',
+    '/api/pokemon/stats/percentiles/?stat=attack',
+)
+WARMUP_STEADY_REPEAT = 10
+
+
+@benchmark('warmup')
+def bench_warmup(client, rows):
+    """
+    Latency of the first request to each of WARMUP_PATHS after a single
+    gunicorn worker boots, with and without POKEDATA_WARM_UP, against the
+    steady state (the median of WARMUP_STEADY_REPEAT later requests).
+    The server counts as up once /healthz/ready answers 200.
+    """
+    pk = Pokemon.objects.order_by('id').values_list('id', flat=True)[rows // 2]
+    paths = [p.format(pk=pk) for p in WARMUP_PATHS]
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        db_path = _database_copy(directory)
+        print(f"  {'':<44} {'cold first':>10} {'warm first':>10} {'steady':>10}")
+        first = {}
+        for warm in ('0', '1'):
+            start = time.perf_counter()
+            with Server('gunicorn sync', db_path, workers=1, POKEDATA_WARM_UP=warm) as port:
+                boot = time.perf_counter() - start
+                base = f'http://127.0.0.1:{port}'
+                first[warm] = {'boot': boot}
+                for path in paths:
+                    start = time.perf_counter()
+                    urllib.request.urlopen(base + path).read()
+                    first[warm][path] = time.perf_counter() - start
+                if warm == '1':
+                    steady = {
+                        path: statistics.median(timed(
+                            lambda: urllib.request.urlopen(
+                                f'{base}{path}{"&" if "?" in path else "?"}nocache={next(_nonces)}').read(),
+                            repeat=WARMUP_STEADY_REPEAT))
+                        for path in paths
+                    }
+        for path in paths:
+            cold, warm, ss = first['0'][path], first['1'][path], steady[path]
+            results[path] = {'p50_ms': round(warm * 1000, 3), 'cold_ms': round(cold * 1000, 3),
+                             'steady_ms': round(ss * 1000, 3)}
+            print(f"  {path[:44]:<44} {cold * 1000:7.1f} ms {warm * 1000:7.1f} ms {ss * 1000:7.1f} ms")
+        print(f"  {'boot until ready':<44} {first['0']['boot']:8.2f} s {first['1']['boot']:8.2f} s")
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+@benchmark('conditional')
+def bench_conditional(client, rows):
+    """
+    Bytes on the wire and latency of a client polling cached API reads:
+    the full body, gzip or brotli compressed, and a revalidation that
+    gets a 304 with If-None-Match.
+    """
+    from django.test import override_settings
+    from pokedata.cache import COMPRESSORS
+
+    paths = ['/api/pokemon/?limit=1000', '/api/pokemon/type/Fire/']
+    variants = [('identity', {})] + [
+        (coding, {'HTTP_ACCEPT_ENCODING': coding}) for coding in COMPRESSORS
+    ]
+    results = {}
+    # one process: the local cache's validators hold
+    with override_settings(POKEDATA_HTTP_VALIDATORS=True):
+        for path in paths:
+            for coding, headers in variants:
+                client.get(path, **headers)
+                response = client.get(path, **headers)
+                cases = [(f'{path} {coding} 200', headers, response),
+                         (f'{path} {coding} 304', {**headers, 'HTTP_IF_NONE_MATCH': response['ETag']}, None)]
+                for label, request_headers, response in cases:
+                    response = client.get(path, **request_headers)
+                    samples = timed(lambda: client.get(path, **request_headers), repeat=200)
+                    size = len(response.content)
+                    results[label] = _metrics(samples, bytes=size, status=response.status_code)
+                    print(f"  {label:<42} {response.status_code} {size:>10,} B   {micro(samples)}")
+    return results
+
+
+@benchmark('changes')
+def bench_changes(client, rows):
+    """
+    What a client mirroring the table transfers to catch up on one edit:
+    refetching the whole list vs the change feed since its last sync;
+    and what logging the change adds to a single-row save().
+    """
+    from pokedata.models import PokemonChange
+
+    # seed() writes through bulk_create(), so the log holds every row
+    head = PokemonChange.objects.order_by('-seq').values_list('seq', flat=True).first() or 0
+    pokemon = Pokemon.objects.order_by('?').first()
+
+    def edit():
+        pokemon.speed = pokemon.speed % 200 + 1
+        pokemon.save()
+
+    results = {}
+    for label, path, params in [
+        ('full list', '/api/pokemon/', {}),
+        ('changes since last sync', '/api/pokemon/changes', {'since': head}),
+    ]:
+        def poll():
+            edit()
+            return client.get(path, params)
+        size = len(poll().content)
+        samples = timed(poll, repeat=10)
+        results[label] = _metrics(samples, bytes=size)
+        print(f"  {label:<26} {size:>12,} B   {summary(samples)}")
+
+    save = timed(edit, repeat=200)
+    PokemonChange.objects.compact()
+    print(f"  save() with logging        {micro(save)}   log entries {PokemonChange.objects.count():,}")
+    return results
+
+
+def _rss_kib(field):
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+
+
+def peak_rss(fn):
+    """
+    Run fn once; return (seconds, resident set size before it, peak
+    resident set size while it ran), in bytes. Linux only: the peak is
+    VmHWM, reset beforehand through /proc/self/clear_refs.
+    """
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    before = _rss_kib('VmRSS')
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start, before * 1024, _rss_kib('VmHWM') * 1024
+
+
+@benchmark('export')
+def bench_export(client, rows):
+    """
+    Throughput and peak RSS of streaming the whole table out of
+    /api/pokemon/export, per format, plain and gzipped, against the
+    buffered JSON list.
+    """
+    results = {}
+    cases = [
+        (f'{fmt}{" gzip" if gzipped else ""}', '/api/pokemon/export', {'format': fmt},
+         {'HTTP_ACCEPT_ENCODING': 'gzip'} if gzipped else {})
+        for fmt in ('csv', 'ndjson', 'columnar') for gzipped in (False, True)
+    ] + [('buffered JSON list', '/api/pokemon/', {}, {})]
+    print(f"  {'':<20} {'MB':>9} {'MB/s':>8} {'rows/s':>11} {'RSS peak':>10} {'growth':>9}")
+    for label, path, params, headers in cases:
+        size = 0
+
+        def download():
+            nonlocal size
+            response = client.get(path, params, **headers)
+            chunks = response.streaming_content if response.streaming else [response.content]
+            size = sum(len(chunk) for chunk in chunks)
+
+        seconds, before, peak = peak_rss(download)
+        results[label] = {'p50_ms': round(seconds * 1000, 3), 'bytes': size,
+                          'mb_per_s': round(size / 1e6 / seconds, 2), 'peak_rss': peak}
+        print(f"  {label:<20} {size / 1e6:9.1f} {size / 1e6 / seconds:8.1f} {rows / seconds:11,.0f} "
+              f"{peak / 2**20:7.0f} MiB {(peak - before) / 2**20:5.0f} MiB")
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Results files
+# ---------------------------------------------------------------------------
+
+# differences under this many ms are noise, whatever the percentage
+NOISE_MS = 3.0
+
+
+def compare(baseline, current, tolerance):
+    """
+    Regression lines between two results files: any increase in SQL
+    queries, or a p50 slower than baseline * (1 + tolerance).
+    """
+    regressions = []
+    for bench, metrics in current['results'].items():
+        before = baseline['results'].get(bench, {})
+        for key, now in metrics.items():
+            then = before.get(key)
+            if then is None:
+                continue
+            if now.get('queries', 0) > then.get('queries', now.get('queries', 0)):
+                regressions.append(f"{bench}: {key}: {then['queries']} → {now['queries']} queries")
+            if (now['p50_ms'] > then['p50_ms'] * (1 + tolerance)
+                    and now['p50_ms'] - then['p50_ms'] > NOISE_MS):
+                regressions.append(
+                    f"{bench}: {key}: p50 {then['p50_ms']:.2f} → {now['p50_ms']:.2f} ms "
+                    f"(+{(now['p50_ms'] / then['p50_ms'] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def row_count(value):
+    """--rows: 1000, 100k or 1M."""
+    match = re.fullmatch(r'(\d+)([kKmM]?)', value)
+    if not match:
+        raise argparse.ArgumentTypeError(f'not a row count: {value!r}')
+    return int(match.group(1)) * {'': 1, 'k': 1_000, 'm': 1_000_000}[match.group(2).lower()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    # a default outside `choices` is rejected, hence the `all` choice
+    parser.add_argument('names', nargs='*', choices=['all', *sorted(BENCHMARKS)], default='all',
+                        help='benchmarks to run (default: all)')
+    parser.add_argument('--rows', type=row_count, default=10_000,
+                        help='number of Pokémon to seed, e.g. 1k, 100k, 1M (default: 10k)')
+    parser.add_argument('--json', metavar='PATH',
+                        help='write the collected metrics to PATH')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='flag regressions against a file written by --json')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p50 slowdown for --compare (default: 0.25)')
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        start = time.perf_counter()
+        seed(args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        client = Client()
+        results = {}
+        for name in sorted(BENCHMARKS) if 'all' in args.names else args.names:
+            print(f"[{name}]")
+            metrics = BENCHMARKS[name](client, args.rows)
+            if metrics:
+                results[name] = metrics
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    current = {
+        'rows': args.rows,
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+        print(f"wrote {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('rows') != args.rows:
+            print(f"warning: baseline has {baseline.get('rows')} rows, this run {args.rows}")
+        regressions = compare(baseline, current, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regression(s) against {args.compare}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -22,8 +22,8 @@ django.setup()
 # 5) Import your model
 from pokedata.models import Pokemon
 
-def run():
-    csv_path = os.path.join(SCRIPT_DIR, 'Pokemon_Data.csv')
+def run(csv_path=None):
+    csv_path = csv_path or os.path.join(SCRIPT_DIR, 'Pokemon_Data.csv')
     if not os.path.exists(csv_path):
         print(f"ERROR: CSV not found at {csv_path}")
         return